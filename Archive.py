@@ -0,0 +1,288 @@
+"""
+    External archive of the non-dominated individuals seen during a run
+
+    rank_filtering can crowd first-front individuals out of P_t, the archive keeps every
+    individual no other one seen so far dominates. Points are kept in minimization form:
+        ParetoArchive2D     2 objectives, a staircase sorted on the first objective, one
+                            bisect finds the only point that can dominate a new one
+        NDTreeArchive       any number of objectives, an ND-tree: nodes bound their points by
+                            an ideal and a nadir point, so whole subtrees are skipped, rejected
+                            or removed at once
+    Beyond max_size, the most crowded points are pruned (crowding distance, as in NSGA-II).
+
+    Penalized objectives are archived as they were when seen. The penalty only lowers the
+    genetic compatibility of infeasible individuals below CONSTRAINT, so an early infeasible
+    entry can never dominate a feasible one.
+"""
+
+import bisect
+import operator
+from functools import partial
+
+import numpy as np
+
+import Sorting
+from Evaluate import crowding_distances
+from Population import Population, get_column
+from RunConfig import resolve_config
+from Survivor import largest_crowding_distances
+
+# Points per ND-tree leaf before it splits, and the children it splits into
+NDTREE_LEAF_SIZE = 20
+NDTREE_CHILDREN = 6
+
+
+def snapshot_row(front, i):
+    """ Immutable copy of individual i of a front, for lists of Sperm and Populations alike """
+    if isinstance(front, Population):
+        return front.view(i).to_sperm().snapshot()
+
+    return front[i].snapshot()
+
+def weakly_dominates(a, b):
+    """ Minimization: a is nowhere worse than b """
+    return all(map(operator.le, a, b))
+
+class ParetoArchive:
+    """
+        Archive of mutually non-dominated points with the individuals they came from
+        Subclasses store the points: add, entries and clear
+    """
+    def __init__(self, max_size=None, is_minimization=None):
+        self.max_size = max_size
+        self.is_minimization = is_minimization
+
+    def add(self, point, make_item):
+        """
+            Insert a minimization point unless an archived one weakly dominates it, removing those it dominates
+            make_item() builds the archived item, it is only called for an accepted point
+            Returns whether the point was accepted
+        """
+        raise NotImplementedError
+
+    def entries(self):
+        """ (point, item) pairs """
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def update(self, front):
+        """ Offer every individual of a front (list of Sperm or Population), returns the number accepted """
+        points = Sorting.to_minimization(np.asarray(get_column(front, "objectives"), dtype=float).reshape(len(front), -1),
+                                         self.is_minimization)
+        accepted = 0
+        for i, point in enumerate(points.tolist()):
+            accepted += self.add(tuple(point), partial(snapshot_row, front, i))
+
+        if self.max_size is not None and len(self) > self.max_size:
+            self.prune(self.max_size)
+
+        return accepted
+
+    def prune(self, size):
+        """ Keep the size least crowded points, ties go to the smaller points whatever the storage order """
+        entries = sorted(self.entries(), key=lambda entry: entry[0])
+        points = np.array([point for point, _ in entries], dtype=float)
+
+        crowding_distance = np.zeros(len(points))
+        crowding_distances(points, [np.arange(len(points))], points.min(axis=0), points.max(axis=0), crowding_distance)
+        kept = np.sort(largest_crowding_distances(crowding_distance, size))
+
+        self.clear()
+        for i in kept.tolist():
+            point, item = entries[i]
+            self.add(point, lambda item=item: item)
+
+    def restore(self, individuals):
+        """ Start over from archived individuals, as individuals() returned them (e.g. from a checkpoint) """
+        self.clear()
+        points = Sorting.to_minimization(np.array([item.objectives for item in individuals], dtype=float).reshape(len(individuals), -1),
+                                         self.is_minimization)
+        for point, item in zip(points.tolist(), individuals):
+            self.add(tuple(point), lambda item=item: item)
+
+    def individuals(self):
+        """ The archived individuals (SpermSnapshot) """
+        return [item for _, item in self.entries()]
+
+    def objectives(self):
+        """ Objective values of the archived individuals, as an (n, m) matrix """
+        return np.array([item.objectives for item in self.individuals()], dtype=float)
+
+class ParetoArchive2D(ParetoArchive):
+    """
+        2 objectives: points sorted by the first objective, the second one then strictly decreases
+        The point with the largest first objective not above a new point's is the only one that can
+        dominate it, and the points it dominates follow its insertion position
+
+        O(log n) search per insertion, plus moving the list tails
+    """
+    def __init__(self, max_size=None, is_minimization=None):
+        super().__init__(max_size, is_minimization)
+        self.clear()
+
+    def __len__(self):
+        return len(self.xs)
+
+    def clear(self):
+        self.xs, self.ys, self.items = [], [], []
+
+    def add(self, point, make_item):
+        x, y = point
+        j = bisect.bisect_right(self.xs, x) - 1
+        if j >= 0 and self.ys[j] <= y:
+            return False
+
+        # The dominated points are the run from the insertion position with a second objective >= y
+        start = bisect.bisect_left(self.xs, x)
+        end = start
+        while end < len(self.ys) and self.ys[end] >= y:
+            end += 1
+
+        self.xs[start:end] = [x]
+        self.ys[start:end] = [y]
+        self.items[start:end] = [make_item()]
+        return True
+
+    def entries(self):
+        return list(zip(zip(self.xs, self.ys), self.items))
+
+class _Node:
+    __slots__ = ("ideal", "nadir", "children", "points", "items")
+
+    def __init__(self, point):
+        self.ideal = list(point)
+        self.nadir = list(point)
+        self.children = None
+        self.points = []
+        self.items = []
+
+    def extend_bounds(self, point):
+        for k, value in enumerate(point):
+            if value < self.ideal[k]:
+                self.ideal[k] = value
+            elif value > self.nadir[k]:
+                self.nadir[k] = value
+
+class NDTreeArchive(ParetoArchive):
+    """
+        Any number of objectives: ND-tree (Jaszkiewicz & Lust, 2018)
+        A node whose nadir weakly dominates a new point rejects it, a node whose ideal point the new
+        point weakly dominates is removed whole, and nodes it is incomparable with are never entered
+        Bounds are not tightened on removal, they stay valid (if loose) bounds
+    """
+    def __init__(self, max_size=None, is_minimization=None, leaf_size=NDTREE_LEAF_SIZE, children=NDTREE_CHILDREN):
+        super().__init__(max_size, is_minimization)
+        self.leaf_size = leaf_size
+        self.children = children
+        self.clear()
+
+    def __len__(self):
+        return self.size
+
+    def clear(self):
+        self.root = None
+        self.size = 0
+
+    def add(self, point, make_item):
+        if self.root is not None:
+            if self._is_dominated(self.root, point):
+                return False
+            if self._remove_dominated(self.root, point):
+                self.root = None
+
+        if self.root is None:
+            self.root = _Node(point)
+        self._insert(self.root, point, make_item())
+        self.size += 1
+        return True
+
+    def _is_dominated(self, node, point):
+        if weakly_dominates(node.nadir, point):
+            return True
+        if not weakly_dominates(node.ideal, point):
+            return False
+        if node.children is None:
+            return any(weakly_dominates(other, point) for other in node.points)
+
+        return any(self._is_dominated(child, point) for child in node.children)
+
+    def _remove_dominated(self, node, point):
+        """ Remove the points of node that point dominates, returns whether node is left empty """
+        if not weakly_dominates(point, node.nadir):
+            return False
+        if weakly_dominates(point, node.ideal):
+            self.size -= self._count(node)
+            return True
+
+        if node.children is None:
+            kept = [k for k, other in enumerate(node.points) if not weakly_dominates(point, other)]
+            self.size -= len(node.points) - len(kept)
+            node.points = [node.points[k] for k in kept]
+            node.items = [node.items[k] for k in kept]
+            return len(kept) == 0
+
+        node.children = [child for child in node.children if not self._remove_dominated(child, point)]
+        return len(node.children) == 0
+
+    def _count(self, node):
+        if node.children is None:
+            return len(node.points)
+
+        return sum(self._count(child) for child in node.children)
+
+    def _insert(self, node, point, item):
+        node.extend_bounds(point)
+        while node.children is not None:
+            # The child whose bounding box centre is closest
+            node = min(node.children, key=lambda child: sum((2 * value - low - high) ** 2
+                                                            for value, low, high in zip(point, child.ideal, child.nadir)))
+            node.extend_bounds(point)
+
+        node.points.append(point)
+        node.items.append(item)
+        if len(node.points) > self.leaf_size:
+            self._split(node)
+
+    def _split(self, node):
+        """ Leaf into children of consecutive points along its widest objective """
+        k = max(range(len(node.ideal)), key=lambda k: node.nadir[k] - node.ideal[k])
+        order = sorted(range(len(node.points)), key=lambda i: node.points[i][k])
+
+        node.children = []
+        for group in np.array_split(order, self.children):
+            if len(group) == 0:
+                continue
+            child = _Node(node.points[group[0]])
+            for i in group.tolist():
+                child.extend_bounds(node.points[i])
+                child.points.append(node.points[i])
+                child.items.append(node.items[i])
+            node.children.append(child)
+        node.points, node.items = [], []
+
+    def entries(self):
+        entries = []
+        stack = [self.root] if self.root is not None else []
+        while stack:
+            node = stack.pop()
+            if node.children is None:
+                entries.extend(zip(node.points, node.items))
+            else:
+                stack.extend(reversed(node.children))
+
+        return entries
+
+def create_archive(objective_num=None, max_size=None, config=None):
+    """ ParetoArchive2D for 2 objectives, NDTreeArchive otherwise, max_size defaults to config.ARCHIVE_MAX_SIZE """
+    config = resolve_config(config)
+    if objective_num is None:
+        objective_num = config.OBJECTIVE_NUM
+    if max_size is None:
+        max_size = config.ARCHIVE_MAX_SIZE
+
+    if objective_num == 2:
+        return ParetoArchive2D(max_size)
+
+    return NDTreeArchive(max_size)
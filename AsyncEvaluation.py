@@ -0,0 +1,133 @@
+"""
+    Evaluation by an external simulator over a socket, with asyncio
+
+    AsyncEvaluator sends every chunk of rows (EVALUATION_CHUNK_SIZE of them) as one request
+    to the simulator at SIMULATOR_ADDRESS, see Simulator.py for the protocol and a local
+    stand-in. The requests of a batch run concurrently on an event loop of the evaluator's
+    own thread:
+        a semaphore keeps at most ASYNC_CONCURRENCY of them in flight, and a chunk only
+        becomes a request once it holds a slot, so a large batch waits instead of piling
+        up connections (back-pressure)
+        every attempt gets ASYNC_TIMEOUT seconds, failed ones are retried ASYNC_RETRIES
+        times after ASYNC_RETRY_DELAY seconds, doubled every time
+    Chunks are seeded as by the other evaluators, so the simulator's results do not depend on
+    the concurrency or on which attempt succeeded.
+
+    The NSGA-II loop calls it like any evaluator: evaluate() blocks until the batch is back,
+    submit() returns a concurrent.futures.Future (steady-state mode) and, from coroutines on
+    any event loop, evaluate_async() is awaited.
+"""
+
+import asyncio
+import json
+import threading
+
+import numpy as np
+
+from Objectives import Evaluator
+from RunConfig import resolve_config
+from Simulator import encode_request
+
+
+class SimulatorError(Exception):
+    """ The simulator answered with an error, or a request failed on every attempt """
+
+
+class AsyncEvaluator(Evaluator):
+    """ Evaluator whose chunks are requests to the simulator, `objective` is the name of its objective function """
+    def __init__(self, egg, objective=None, chunk_size=None, seed=None, address=None, concurrency=None, timeout=None,
+                 retries=None, retry_delay=None, config=None):
+        super().__init__(egg, None, chunk_size, seed, config)
+        config = resolve_config(config)
+        self.objective_name = objective if objective is not None else config.OBJECTIVE_FUNCTION
+        self.address = tuple(address if address is not None else config.SIMULATOR_ADDRESS)
+        self.workers = concurrency if concurrency is not None else config.ASYNC_CONCURRENCY
+        self.timeout = timeout if timeout is not None else config.ASYNC_TIMEOUT
+        self.retries = retries if retries is not None else config.ASYNC_RETRIES
+        self.retry_delay = retry_delay if retry_delay is not None else config.ASYNC_RETRY_DELAY
+
+        # Requests sent, attempts that failed and were retried
+        self.requests = 0
+        self.retried = 0
+
+        self.semaphore = asyncio.Semaphore(self.workers)
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+
+    def map_chunks(self, tasks):
+        return self.run_coroutine(self.map_chunks_async(tasks)).result()
+
+    def submit(self, population):
+        return self.run_coroutine(self.evaluate_chunks(self.chunk_tasks(population)))
+
+    async def evaluate_async(self, population):
+        """ Raw objectives of every row of a Population, awaitable from any event loop """
+        if len(population) == 0:
+            return np.zeros((0, population.objectives.shape[1]))
+
+        return await asyncio.wrap_future(self.submit(population))
+
+    def run_coroutine(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+    # ==============================================================================================================================
+
+    async def evaluate_chunks(self, tasks):
+        return np.concatenate(await self.map_chunks_async(tasks))
+
+    async def map_chunks_async(self, tasks):
+        requests = []
+        for rows, seed in tasks:
+            # Back-pressure: the next request is only created once a slot is free, request() releases it
+            await self.semaphore.acquire()
+            requests.append(asyncio.ensure_future(self.request(rows, seed)))
+
+        try:
+            return await asyncio.gather(*requests)
+        except BaseException:
+            for request in requests:
+                request.cancel()
+            await asyncio.gather(*requests, return_exceptions=True)
+            raise
+
+    async def request(self, rows, seed):
+        """ Objectives of one chunk, retried with exponential backoff, releases its semaphore slot """
+        try:
+            message = encode_request(rows, self.egg, self.objective_name, seed)
+            for attempt in range(self.retries + 1):
+                try:
+                    self.requests += 1
+                    return await asyncio.wait_for(self.exchange(message), self.timeout)
+                except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError) as error:
+                    if attempt == self.retries:
+                        raise SimulatorError(f"Simulator at {self.address} failed, {attempt + 1} attempts: "
+                                             f"{type(error).__name__}: {error}") from error
+                    self.retried += 1
+                    await asyncio.sleep(self.retry_delay * 2 ** attempt)
+        finally:
+            self.semaphore.release()
+
+    async def exchange(self, message):
+        """ One attempt: a connection, one request line and its reply """
+        reader, writer = await asyncio.open_connection(*self.address)
+        try:
+            writer.write(message)
+            await writer.drain()
+            line = await reader.readline()
+        finally:
+            writer.close()
+
+        if not line:
+            raise ConnectionError("connection closed before the reply")
+        reply = json.loads(line)
+        if "error" in reply:
+            raise SimulatorError(reply["error"])
+
+        return np.asarray(reply["objectives"], dtype=float)
+
+    def close(self):
+        if self.loop.is_running():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join()
+        self.loop.close()
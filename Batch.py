@@ -0,0 +1,132 @@
+"""
+    Batch optimisation of many egg profiles
+
+    Every line of the input file is one JSON egg profile:
+        {"id": "patient-1", "hla_profile": ["A*01:01", ...], "ideal_ph_range": [7.2, 8.0]}
+    "id" defaults to the line number and "ideal_ph_range" to the Egg default.
+
+    One ga.run per egg is scheduled on a pool of reused worker processes. The final
+    Pareto front of each run is appended to the output file (JSON lines) as soon as
+    the run finishes, failed runs are written with their error.
+
+    python Batch.py eggs.jsonl fronts.jsonl [--workers N] [--generations G]
+"""
+
+import argparse
+import json
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+import Config
+import ga
+from Egg import Egg
+from Objectives import create_evaluator
+from Population import seed_generators
+from RunConfig import resolve_config
+
+GENOME_FIELDS = ("genetic_resources", "biological_resources", "dfi", "motility",
+                 "morphology", "velocity", "ph_tolerance")
+
+
+def read_egg_profiles(path):
+    jobs = []
+    with open(path) as file:
+        for line_number, line in enumerate(file, start=1):
+            if not line.strip():
+                continue
+
+            profile = json.loads(line)
+            profile.setdefault("id", line_number)
+            jobs.append(profile)
+
+    return jobs
+
+def individual_record(individual):
+    record = {name: float(getattr(individual, name)) for name in GENOME_FIELDS}
+    record["hla_profile"] = list(individual.hla_profile)
+    record["objectives"] = [float(value) for value in individual.objectives]
+    return record
+
+def run_job(index, profile, generations, population_size, seed, config=None):
+    """ One optimisation, run in a pool worker. Never raises, failures are part of the result """
+    start = time.perf_counter()
+    result = {"id": profile["id"]}
+    try:
+        seed_generators(np.random.SeedSequence([seed, index]))
+        egg = Egg(profile["hla_profile"], profile.get("ideal_ph_range", (7.2, 8.0)))
+        with create_evaluator(egg, "serial", config) as evaluator:
+            _, fronts = ga.run(egg, generations, population_size, population_size, evaluator, config=config)
+
+        result["status"] = "ok"
+        result["front"] = [individual_record(individual) for individual in fronts[0]]
+    except Exception as error:
+        result["status"] = "failed"
+        result["error"] = f"{type(error).__name__}: {error}"
+        result["traceback"] = traceback.format_exc()
+
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+def run_batch(input_path, output_path, workers=None, generations=None, population_size=None, seed=None, config=None):
+    """
+        Optimise every egg of input_path, streaming the results to output_path
+        The arguments left None come from config (a RunConfig, Config when None), which the runs use
+        Job i is seeded from (seed, i), so its front does not depend on scheduling
+        Returns the results without their fronts, in completion order
+    """
+    resolved = resolve_config(config)
+    if workers is None:
+        workers = resolved.BATCH_WORKERS
+    if generations is None:
+        generations = resolved.NUM_OF_GENERATIONS
+    if population_size is None:
+        population_size = resolved.POPULATION_SIZE
+    if seed is None:
+        seed = resolved.BATCH_SEED
+
+    jobs = read_egg_profiles(input_path)
+    summaries = []
+
+    with ProcessPoolExecutor(max_workers=workers) as executor, open(output_path, "w") as output:
+        futures = [executor.submit(run_job, index, profile, generations, population_size, seed, config)
+                   for index, profile in enumerate(jobs)]
+
+        for future in as_completed(futures):
+            result = future.result()
+            output.write(json.dumps(result) + "\n")
+            output.flush()
+
+            summaries.append({key: value for key, value in result.items() if key not in ("front", "traceback")})
+            print(f"[{len(summaries)}/{len(jobs)}] egg {result['id']}: {result['status']} in {result['seconds']:.2f}s")
+
+    return summaries
+
+def print_report(summaries, wall_seconds):
+    failed = [summary for summary in summaries if summary["status"] != "ok"]
+    seconds = [summary["seconds"] for summary in summaries]
+
+    print(f"\n{len(summaries) - len(failed)} succeeded, {len(failed)} failed, {wall_seconds:.1f}s wall clock")
+    if seconds:
+        print(f"Per egg: mean {np.mean(seconds):.2f}s, max {max(seconds):.2f}s")
+    for summary in failed:
+        print(f"  egg {summary['id']}: {summary['error']}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Optimise a file of egg profiles")
+    parser.add_argument("input", help="egg profiles, one JSON object per line")
+    parser.add_argument("output", help="final Pareto fronts, one JSON object per line")
+    parser.add_argument("--workers", type=int, default=Config.BATCH_WORKERS)
+    parser.add_argument("--generations", type=int, default=Config.NUM_OF_GENERATIONS)
+    parser.add_argument("--population-size", type=int, default=Config.POPULATION_SIZE)
+    parser.add_argument("--seed", type=int, default=Config.BATCH_SEED)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    summaries = run_batch(args.input, args.output, args.workers, args.generations, args.population_size, args.seed)
+    print_report(summaries, time.perf_counter() - start)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,648 @@
+"""
+    Scaling benchmarks
+
+    python Benchmark.py                                     sorting, cloning and variation benchmarks
+    python Benchmark.py stages [--output stages.json]       time every NSGA-II stage, see benchmark_stages
+    python Benchmark.py compare baseline.json current.json  flag the stages that got slower
+    python Benchmark.py startup                             cold-start time of the entry points
+    python Benchmark.py archive [--points 20000]            time insertion into the Pareto archives
+    python Benchmark.py steady_state                        time steady-state insertion against a full sort
+    python Benchmark.py async [--rows 1000]                 throughput of the simulator evaluator against the serial path
+    python Benchmark.py kernels                             time every kernel backend
+"""
+
+import argparse
+import copy
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+import Config
+import Sorting
+import ga
+from Egg import Egg
+from Evaluate import naive_nondominated_sorting, nondominated_sorting, crowding_distance_evaluation, evaluate_population
+from Objectives import create_evaluator
+from Population import Population, seed_generators
+from Selection import crowded_tournament_selection
+from Sperm import Sperm
+from Survivor import rank_filtering
+from Variation import variation, population_variation, batched_variation
+from Archive import ParetoArchive2D, NDTreeArchive
+from RunConfig import RunConfig
+from SteadyState import SteadyStatePopulation
+from Evaluate import population_crowding_distance_evaluation
+from Simulator import BackgroundSimulator
+from Kernels import KERNEL_BACKENDS, get_kernels
+
+SORTING_SIZES = [200, 2_000, 20_000, 200_000]
+
+# Largest population each engine is timed on, the quadratic and cubic ones get slow quickly
+SORTING_MAX_SIZES = {
+    "naive": 2_000,
+    "deb": 20_000,
+    "ens": 200_000,
+    "sweep2d": 200_000,
+}
+
+# Individuals cloned per layout in benchmark_cloning
+CLONE_COUNT = 20_000
+
+# Pairs varied by benchmark_variation, the scalar path is timed on VARIATION_LOOP_PAIRS only
+VARIATION_PAIRS = 100_000
+VARIATION_LOOP_PAIRS = 10_000
+
+# Population sizes and objective counts of benchmark_stages
+STAGE_SIZES = [100, 1_000, 10_000, 100_000, 1_000_000]
+STAGE_OBJECTIVE_NUMS = [2, 3, 5]
+STAGE_BACKENDS = ["objects", "arrays"]
+
+# Largest population per backend, a million Sperm objects take longer to build than the arrays run takes
+STAGE_MAX_SIZES = {
+    "objects": 100_000,
+    "arrays": 1_000_000,
+}
+
+# A stage slower than this (seconds) is not timed on the larger sizes
+STAGE_TIME_LIMIT = 5.0
+
+# A stage is run until its runs add up to STAGE_MIN_SECONDS, at most STAGE_REPEATS times, and the fastest run is kept
+STAGE_MIN_SECONDS = 0.5
+STAGE_REPEATS = 5
+
+# compare_results flags a slowdown or a memory growth over REGRESSION_THRESHOLD (0.2 = 20%)
+# Baselines under REGRESSION_MIN_SECONDS or REGRESSION_MIN_BYTES are too noisy to compare
+REGRESSION_THRESHOLD = 0.2
+REGRESSION_MIN_SECONDS = 0.001
+REGRESSION_MIN_BYTES = 1 << 20
+
+# Commands timed by benchmark_startup, each in a new interpreter
+# The one-generation run includes loading the kernel backend of Config.KERNEL_BACKEND
+STARTUP_COMMANDS = {
+    "import ga": ["-c", "import ga"],
+    "import Batch": ["-c", "import Batch"],
+    "Run.py --help": ["Run.py", "--help"],
+    "ga.run 1 gen": ["-c", "import ga; ga.run(ga.Egg(), 1)"],
+}
+STARTUP_REPEATS = 5
+
+# Points offered to the archives in benchmark_archive, all of them mutually non-dominated
+ARCHIVE_POINTS = 20_000
+ARCHIVE_OBJECTIVE_NUMS = [2, 3, 5]
+
+# Population sizes of benchmark_steady_state, and the insertions timed on each
+STEADY_STATE_SIZES = [100, 1_000, 10_000]
+STEADY_STATE_INSERTIONS = 200
+
+# Rows evaluated by the stand-in simulator in benchmark_async, its latency per request and the
+# (rows per request, requests in flight) cases, the first one being the serial path
+ASYNC_ROWS = 1_000
+ASYNC_LATENCY = 0.002
+ASYNC_CASES = [(1, 1), (64, 1), (1, 8), (16, 8), (16, 32)]
+
+# Population sizes the kernel backends are timed on, ENS-BS sorting with 3 objectives included
+KERNEL_SIZES = [1_000, 10_000]
+
+
+class BenchmarkIndividual:
+    """ Minimal stand-in exposing only what the sorting code reads """
+    def __init__(self, objectives):
+        self.objectives = objectives
+        self.rank = 0
+
+def random_objectives(size, objective_num=Config.OBJECTIVE_NUM, seed=0):
+    """ Objective values shaped like the real ones: in [0, 1] and rounded to 5 decimals """
+    rng = np.random.default_rng(seed)
+    return np.round(rng.random((size, objective_num)), 5)
+
+def time_call(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+def benchmark_sorting(sizes=SORTING_SIZES, objective_num=Config.OBJECTIVE_NUM):
+    """
+        Time every sorting engine on growing populations
+        Speedups are relative to the first engine timed on the same population,
+        tests/test_sorting.py checks that the engines agree
+    """
+    engines = ["naive", "deb", "ens"] + (["sweep2d"] if objective_num == 2 else [])
+    results = []
+
+    print(f"{'size':>10} {'engine':>10} {'seconds':>12} {'fronts':>8} {'speedup':>10}")
+    for size in sizes:
+        objectives = random_objectives(size, objective_num)
+        baseline_seconds = None
+
+        for engine in engines:
+            if size > SORTING_MAX_SIZES[engine]:
+                continue
+
+            if engine == "naive":
+                population = [BenchmarkIndividual(row) for row in objectives.tolist()]
+                seconds, fronts = time_call(naive_nondominated_sorting, population)
+            else:
+                seconds, fronts = time_call(Sorting.sort_fronts, objectives, engine)
+
+            if baseline_seconds is None:
+                baseline_seconds = seconds
+
+            speedup = f"{baseline_seconds / seconds:.1f}x"
+            print(f"{size:>10} {engine:>10} {seconds:>12.4f} {len(fronts):>8} {speedup:>10}")
+            results.append({"size": size, "engine": engine, "seconds": seconds, "fronts": len(fronts)})
+
+    return results
+
+class DictSperm:
+    """ The previous Sperm layout: attributes in a __dict__ and the HLA profile as a list of allele names """
+    def __init__(self, sperm):
+        for name in Sperm.__slots__:
+            setattr(self, name, copy.copy(getattr(sperm, name)))
+        self.hla_profile = sperm.hla_profile
+
+def allocated_bytes(function, count):
+    """ Bytes still allocated after building `count` objects with function(), per object """
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objects = [function() for _ in range(count)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    del objects
+    return (after - before) / count
+
+def benchmark_cloning(count=CLONE_COUNT):
+    """
+        Clone throughput and memory per stored individual
+        dict + deepcopy is the layout Sperm.copy used to work on
+    """
+    sperm = Sperm()
+    legacy = DictSperm(sperm)
+    population = Population.from_sperms([Sperm() for _ in range(count)])
+
+    cases = [
+        ("dict deepcopy", lambda: copy.deepcopy(legacy)),
+        ("slots copy", sperm.copy),
+        ("snapshot", sperm.snapshot),
+    ]
+    results = []
+
+    print(f"{'layout':>14} {'clones/s':>12} {'bytes/object':>14}")
+    for name, clone in cases:
+        seconds, _ = time_call(lambda: [clone() for _ in range(count)])
+        per_object = allocated_bytes(clone, count)
+        print(f"{name:>14} {count / seconds:>12.0f} {per_object:>14.0f}")
+        results.append({"layout": name, "clones_per_second": count / seconds, "bytes_per_object": per_object})
+
+    # A Population row, for comparison with the object layouts
+    seconds, _ = time_call(population.copy)
+    per_row = sum(getattr(population, name).nbytes for name in population.__dict__) / count
+    print(f"{'population row':>14} {count / seconds:>12.0f} {per_row:>14.0f}")
+    results.append({"layout": "population row", "clones_per_second": count / seconds, "bytes_per_object": per_row})
+
+    return results
+
+def benchmark_variation(pairs=VARIATION_PAIRS, loop_pairs=VARIATION_LOOP_PAIRS):
+    """ Offspring generation time of the scalar and the batched variation """
+    loop_seconds, _ = time_call(population_variation, Population.random(2 * loop_pairs))
+    batched_seconds, _ = time_call(batched_variation, Population.random(2 * pairs))
+
+    print(f"scalar  {loop_pairs:>8} pairs {loop_seconds:>8.3f}s")
+    print(f"batched {pairs:>8} pairs {batched_seconds:>8.3f}s")
+    return {"loop_pairs": loop_pairs, "loop_seconds": loop_seconds, "pairs": pairs, "batched_seconds": batched_seconds}
+
+# ==================================================================================================================================
+
+# Stages of one NSGA-II generation, in loop order, and the ones whose cost depends on the objective count
+STAGES = ("generate_population", "evaluate_population", "nondominated_sorting", "crowding_distance_evaluation",
+          "crowded_tournament_selection", "variation", "rank_filtering")
+OBJECTIVE_STAGES = ("nondominated_sorting", "crowding_distance_evaluation", "rank_filtering")
+# Stages whose inputs are built by another stage, skipped together with it
+STAGE_INPUTS = {
+    "crowded_tournament_selection": "crowding_distance_evaluation",
+    "rank_filtering": "crowding_distance_evaluation",
+}
+
+def configured(**values):
+    """ Set Config values for the duration of the block """
+    return RunConfig(**values).applied()
+
+def stage_population(backend, size, objective_num, seed=0):
+    """ Random individuals holding random objective values in objective_num columns """
+    population = Population.random(size, np.random.default_rng(seed))
+    population.objectives = random_objectives(size, objective_num, seed)
+    population.raw_objectives = population.objectives.copy()
+    population.needs_evaluation[:] = False
+
+    return population.to_sperms() if backend == "objects" else population
+
+def unevaluated_copy(population):
+    """ Copy whose objectives have to be computed again """
+    if isinstance(population, Population):
+        population = population.copy()
+        population.needs_evaluation[:] = True
+        return population
+
+    population = [individual.copy() for individual in population]
+    for individual in population:
+        individual.needs_evaluation = True
+    return population
+
+def stage_cases(backend, size, objective_num, egg, evaluator):
+    """
+        stage -> (prepare, run), run(*prepare()) is one timed call of the stage on size individuals
+        Inputs are built on first use and shared by the stages, evaluate_population alone gets a new copy every run
+    """
+    inputs = {}
+
+    def cached(key, build):
+        if key not in inputs:
+            inputs[key] = build()
+        return inputs[key]
+
+    def population(rows=size):
+        return cached(("population", rows), lambda: stage_population(backend, rows, objective_num))
+
+    def ranked(rows=size):
+        # Ranks and crowding distances filled in, and the fronts
+        return cached(("fronts", rows), lambda: crowding_distance_evaluation(population(rows)))
+
+    def mating_pool():
+        ranked()
+        return population()
+
+    return {
+        "generate_population": (lambda: (size,), ga.generate_population),
+        "evaluate_population": (lambda: (unevaluated_copy(population()), egg, 1, evaluator), evaluate_population),
+        "nondominated_sorting": (lambda: (population(),), nondominated_sorting),
+        "crowding_distance_evaluation": (lambda: (population(),), crowding_distance_evaluation),
+        "crowded_tournament_selection": (lambda: (mating_pool(), size), crowded_tournament_selection),
+        "variation": (lambda: (population(), Config.CROSSOVER_RATE, Config.MUTATION_RATE), variation),
+        # Survivors of a combined Q_t + P_t, as in the ga loop
+        "rank_filtering": (lambda: (ranked(2 * size), size), rank_filtering),
+    }
+
+def time_stage(prepare, run, memory=True):
+    """
+        Fastest of repeated run(*prepare()) calls, the number of calls and the peak memory
+        allocated by one more call under tracemalloc (None without memory), prepare is not measured
+    """
+    times = []
+    while len(times) < STAGE_REPEATS and sum(times) < STAGE_MIN_SECONDS:
+        args = prepare()
+        seconds, _ = time_call(run, *args)
+        times.append(seconds)
+
+    peak_bytes = None
+    if memory:
+        args = prepare()
+        tracemalloc.start()
+        run(*args)
+        peak_bytes = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    return min(times), len(times), peak_bytes
+
+def benchmark_stages(sizes=STAGE_SIZES, objective_nums=STAGE_OBJECTIVE_NUMS, backends=STAGE_BACKENDS,
+                     stages=STAGES, memory=True, time_limit=STAGE_TIME_LIMIT, seed=0):
+    """
+        Time every stage of a generation separately on growing populations, per backend
+        A stage taking more than time_limit seconds is not run on the larger sizes
+        The stages in OBJECTIVE_STAGES run on random objective values for every objective count,
+        the others only for Config.OBJECTIVE_NUM, the count the objective functions produce
+        The rest of the configuration (sorting engine, selection and variation modes...) is Config's
+    """
+    seed_generators(seed)
+    egg = Egg()
+    objective_num_used = Config.OBJECTIVE_NUM
+    slow = set()
+    results = []
+
+    print(f"{'backend':>8} {'m':>3} {'size':>9} {'stage':>29} {'seconds':>10} {'runs':>5} {'peak MB':>9}")
+    with create_evaluator(egg) as evaluator:
+        for backend in backends:
+            for objective_num in objective_nums:
+                is_minimization = (list(Config.IS_MINIMIZATION_OBJECTIVE) + [False] * objective_num)[:objective_num]
+                with configured(POPULATION_BACKEND=backend, OBJECTIVE_NUM=objective_num, IS_MINIMIZATION_OBJECTIVE=is_minimization):
+                    for size in sizes:
+                        if size > STAGE_MAX_SIZES[backend]:
+                            continue
+
+                        cases = stage_cases(backend, size, objective_num, egg, evaluator)
+                        for stage in stages:
+                            if objective_num != objective_num_used and stage not in OBJECTIVE_STAGES:
+                                continue
+                            if {(backend, objective_num, stage), (backend, objective_num, STAGE_INPUTS.get(stage))} & slow:
+                                continue
+
+                            seconds, runs, peak_bytes = time_stage(*cases[stage], memory)
+                            peak = f"{peak_bytes / 2 ** 20:.1f}" if peak_bytes is not None else "-"
+                            print(f"{backend:>8} {objective_num:>3} {size:>9} {stage:>29} {seconds:>10.5f} {runs:>5} {peak:>9}")
+                            results.append({"stage": stage, "backend": backend, "objective_num": objective_num, "size": size,
+                                            "seconds": seconds, "runs": runs, "peak_bytes": peak_bytes})
+
+                            if seconds > time_limit:
+                                slow.add((backend, objective_num, stage))
+
+    return results
+
+def write_results(path, results):
+    """ Results of benchmark_stages as JSON, with the settings and machine they were measured on """
+    document = {
+        "config": {name: getattr(Config, name) for name in ("SORTING_ENGINE", "KERNEL_BACKEND", "RANKING_MODE", "EVALUATION_MODE",
+                                                            "SELECTION_MODE", "VARIATION_MODE", "TOURNAMENT_SIZE")},
+        "machine": {"python": platform.python_version(), "numpy": np.__version__,
+                    "platform": platform.platform(), "cpus": os.cpu_count()},
+        "results": results,
+    }
+    with open(path, "w") as file:
+        json.dump(document, file, indent=1)
+
+def read_results(path):
+    with open(path) as file:
+        return json.load(file)
+
+def compare_results(baseline_path, current_path, threshold=REGRESSION_THRESHOLD,
+                    min_seconds=REGRESSION_MIN_SECONDS, min_bytes=REGRESSION_MIN_BYTES):
+    """
+        Compare two benchmark_stages result files case by case (stage, backend, objective count, size)
+        Returns the regressions: cases more than threshold slower, or allocating more than threshold more
+    """
+    baseline, current = read_results(baseline_path), read_results(current_path)
+    for name, value in baseline["config"].items():
+        if current["config"].get(name) != value:
+            print(f"Warning: {name} is {value!r} in the baseline and {current['config'].get(name)!r} now")
+
+    def key(result):
+        return result["stage"], result["backend"], result["objective_num"], result["size"]
+
+    baseline_results = {key(result): result for result in baseline["results"]}
+    regressions = []
+
+    print(f"{'backend':>8} {'m':>3} {'size':>9} {'stage':>29} {'baseline':>10} {'current':>10} {'time':>7} {'memory':>7}")
+    for result in current["results"]:
+        before = baseline_results.get(key(result))
+        if before is None:
+            continue
+
+        time_ratio = result["seconds"] / before["seconds"]
+        memory_ratio = None
+        if before["peak_bytes"] and result["peak_bytes"] is not None:
+            memory_ratio = result["peak_bytes"] / before["peak_bytes"]
+
+        slower = before["seconds"] >= min_seconds and time_ratio > 1 + threshold
+        bigger = memory_ratio is not None and before["peak_bytes"] >= min_bytes and memory_ratio > 1 + threshold
+        if slower or bigger:
+            regressions.append({"stage": result["stage"], "backend": result["backend"], "objective_num": result["objective_num"],
+                                "size": result["size"], "time_ratio": time_ratio, "memory_ratio": memory_ratio})
+
+        memory = f"{memory_ratio:.2f}x" if memory_ratio is not None else "-"
+        flag = " REGRESSION" if slower or bigger else ""
+        print(f"{result['backend']:>8} {result['objective_num']:>3} {result['size']:>9} {result['stage']:>29} "
+              f"{before['seconds']:>10.5f} {result['seconds']:>10.5f} {time_ratio:>6.2f}x {memory:>7}{flag}")
+
+    print(f"\n{len(regressions)} regressions over {threshold:.0%}")
+    return regressions
+
+def benchmark_startup(commands=STARTUP_COMMANDS, repeats=STARTUP_REPEATS):
+    """ Fastest wall-clock time of each command in a new Python process, and whether matplotlib got imported """
+    directory = os.path.dirname(os.path.abspath(__file__))
+
+    def run(arguments):
+        return subprocess.run([sys.executable] + arguments, cwd=directory, capture_output=True, text=True)
+
+    bare_seconds = min(time_call(run, ["-c", "pass"])[0] for _ in range(repeats))
+    results = []
+
+    print(f"{'command':>16} {'seconds':>9} {'matplotlib':>11}")
+    print(f"{'python -c pass':>16} {bare_seconds:>9.3f} {'':>11}")
+    for name, arguments in commands.items():
+        seconds = min(time_call(run, arguments)[0] for _ in range(repeats))
+        # -X importtime lists every imported module on stderr
+        imports = run(["-X", "importtime"] + arguments).stderr
+        loads_matplotlib = "matplotlib" in imports
+
+        print(f"{name:>16} {seconds:>9.3f} {str(loads_matplotlib):>11}")
+        results.append({"command": name, "seconds": seconds, "matplotlib": loads_matplotlib})
+
+    return results
+
+def archive_class(objective_num):
+    return ParetoArchive2D if objective_num == 2 else NDTreeArchive
+
+def benchmark_archive(points=ARCHIVE_POINTS, objective_nums=ARCHIVE_OBJECTIVE_NUMS, seed=0):
+    """ Insertion time per point with points on the unit sphere, every insertion grows the archive """
+    generator = np.random.default_rng(seed)
+    results = []
+
+    print(f"{'objectives':>10} {'archive':>16} {'points':>8} {'us/insert':>10}")
+    for objective_num in objective_nums:
+        sample = generator.random((points, objective_num))
+        sample = (sample / np.linalg.norm(sample, axis=1)[:, None]).tolist()
+        archive = archive_class(objective_num)()
+
+        def insert_all():
+            for point in sample:
+                archive.add(tuple(point), lambda: None)
+
+        seconds, _ = time_call(insert_all)
+        microseconds = seconds / points * 1e6
+        print(f"{objective_num:>10} {type(archive).__name__:>16} {len(archive):>8} {microseconds:>10.1f}")
+        results.append({"objective_num": objective_num, "archive": type(archive).__name__, "points": points,
+                        "seconds": seconds})
+
+    return results
+
+def objective_population(objectives):
+    """ Population holding only the given objectives, evaluated """
+    population = Population(len(objectives), objectives.shape[1])
+    population.objectives[:] = objectives
+    population.raw_objectives[:] = objectives
+    population.needs_evaluation[:] = False
+    return population
+
+def benchmark_steady_state(sizes=STEADY_STATE_SIZES, insertions=STEADY_STATE_INSERTIONS, seed=0):
+    """ Time per insertion against one full population_crowding_distance_evaluation """
+    results = []
+
+    print(f"{'size':>8} {'us/insert':>10} {'us/full sort':>13}")
+    for size in sizes:
+        population = objective_population(random_objectives(size, seed=seed))
+        state = SteadyStatePopulation(population)
+        offspring = [objective_population(objectives[np.newaxis])
+                     for objectives in random_objectives(insertions, seed=seed + 1)]
+
+        def insert_all():
+            for individual in offspring:
+                state.insert(individual)
+
+        seconds, _ = time_call(insert_all)
+        full_seconds, _ = time_call(population_crowding_distance_evaluation, population.copy())
+        print(f"{size:>8} {seconds / insertions * 1e6:>10.1f} {full_seconds * 1e6:>13.1f}")
+        results.append({"size": size, "insertions": insertions, "seconds": seconds, "full_sort_seconds": full_seconds})
+
+    return results
+
+def benchmark_async(rows=ASYNC_ROWS, latency=ASYNC_LATENCY, cases=ASYNC_CASES, seed=0):
+    """
+        Rows per second of the simulator evaluator, one row per request one at a time being the serial path
+        tests/test_async_evaluation.py checks that it returns what a SerialEvaluator computes in process
+    """
+    seed_generators(seed)
+    egg = Egg()
+    population = Population.random(rows)
+    results = []
+
+    print(f"{'rows/request':>12} {'in flight':>9} {'rows/s':>9} {'speedup':>8} {'retries':>7}")
+    with BackgroundSimulator(latency=latency, row_latency=0.0) as simulator:
+        for chunk_size, concurrency in cases:
+            with create_evaluator(egg, "async", chunk_size=chunk_size, address=simulator.address,
+                                  concurrency=concurrency) as evaluator:
+                seconds, _ = time_call(evaluator.evaluate, population)
+
+            if not results:
+                serial_seconds = seconds
+            print(f"{chunk_size:>12} {concurrency:>9} {rows / seconds:>9.0f} {serial_seconds / seconds:>7.1f}x "
+                  f"{evaluator.retried:>7}")
+            results.append({"chunk_size": chunk_size, "concurrency": concurrency, "rows": rows, "seconds": seconds})
+
+    return results
+
+def available_kernels():
+    """ The backends that load here, numba is skipped when it is not installed """
+    backends = {}
+    for name in KERNEL_BACKENDS:
+        try:
+            backends[name] = get_kernels(name)
+        except ImportError as error:
+            print(f"kernel backend {name} unavailable: {error}")
+
+    return backends
+
+def kernel_cases(backend, size, objective_num, seed):
+    """ (name, kernel call) pairs on rounded random inputs with many ties, every call returns fresh arrays """
+    generator = np.random.default_rng(seed)
+    objectives = np.round(generator.random((size, objective_num)), 2)
+    fronts = Sorting.sort_fronts(objectives, "ens", [True] * objective_num)
+    if seed % 2:
+        # A constant objective has no range, its distances are skipped
+        objectives[:, -1] = objectives[0, -1]
+    obj_mins, obj_maxes = objectives.min(axis=0), objectives.max(axis=0)
+    candidates = objectives[fronts[len(fronts) // 2]]
+    values = generator.uniform(10, 90, size)
+    draws, r = generator.random(size), generator.random(size)
+
+    def crowding():
+        crowding_distance = np.full(size, -1.0)
+        reordered = backend.crowding_distances(objectives, fronts, obj_mins, obj_maxes, crowding_distance)
+        return crowding_distance, np.concatenate(reordered)
+
+    return [
+        ("any_dominates", lambda: backend.any_dominates(objectives, candidates)),
+        ("is_dominated", lambda: np.array([backend.is_dominated(point, candidates) for point in objectives], dtype=bool)),
+        ("crowding_distances", crowding),
+        ("mutate_values", lambda: backend.mutate_values(values, draws, r, 10, 90, Config.delta, 0.3)),
+    ]
+
+def benchmark_kernels(sizes=KERNEL_SIZES, objective_num=3, repeats=STAGE_REPEATS):
+    """ Best of repeats per kernel and backend, after a first call that compiles or loads the kernel """
+    backends = available_kernels()
+    results = []
+
+    print(f"{'kernel':>20} {'size':>7} " + " ".join(f"{name:>12}" for name in backends))
+    with configured(OBJECTIVE_NUM=objective_num):
+        for size in sizes:
+            objectives = np.round(np.random.default_rng(0).random((size, objective_num)), 2)
+            timings = {}
+            for name, backend in backends.items():
+                cases = kernel_cases(backend, size, objective_num, seed=0)
+                cases.append(("ens_sort", lambda: Sorting.efficient_nondominated_sort(objectives)))
+                with configured(KERNEL_BACKEND=name):
+                    for kernel, run in cases:
+                        run()
+                        timings.setdefault(kernel, {})[name] = min(time_call(run)[0] for _ in range(repeats))
+
+            for kernel, by_backend in timings.items():
+                print(f"{kernel:>20} {size:>7} " + " ".join(f"{seconds * 1e3:>10.2f}ms" for seconds in by_backend.values()))
+                results.append({"kernel": kernel, "size": size, "seconds": by_backend})
+
+    return results
+
+def benchmark_kernel_startup(repeats=2):
+    """ Fresh processes loading every numba kernel, only the first one after a change compiles them """
+    if "numba" not in available_kernels():
+        return []
+
+    code = ("import numpy as np, Kernels; k = Kernels.get_kernels('numba'); x = np.zeros((3, 2)); "
+            "k.any_dominates(x, x); k.is_dominated(x[0], x); k.crowding_distances(x, [np.arange(3)], x[0], x[0], np.zeros(3)); "
+            "k.mutate_values(x[0], x[0], x[0], 0, 1, 1, 0.5)")
+    command = [sys.executable, "-c", code]
+    results = []
+    for run in range(repeats):
+        seconds, _ = time_call(lambda: subprocess.run(command, check=True, cwd=os.path.dirname(os.path.abspath(__file__))))
+        print(f"numba kernels loaded in a fresh process in {seconds:.2f}s (run {run + 1})")
+        results.append(seconds)
+
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="NSGA-II benchmarks")
+    commands = parser.add_subparsers(dest="command")
+
+    stages = commands.add_parser("stages", help="time every stage of a generation")
+    stages.add_argument("--output", default="stages.json", help="JSON results, for compare")
+    stages.add_argument("--sizes", type=int, nargs="+", default=STAGE_SIZES)
+    stages.add_argument("--objectives", type=int, nargs="+", default=STAGE_OBJECTIVE_NUMS)
+    stages.add_argument("--backends", nargs="+", default=STAGE_BACKENDS, choices=STAGE_BACKENDS)
+    stages.add_argument("--stages", nargs="+", default=list(STAGES), choices=STAGES)
+    stages.add_argument("--no-memory", action="store_true", help="skip the tracemalloc run")
+
+    compare = commands.add_parser("compare", help="flag the stages that got slower")
+    compare.add_argument("baseline")
+    compare.add_argument("current")
+    compare.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD)
+
+    commands.add_parser("startup", help="cold-start time of the entry points")
+
+    archive = commands.add_parser("archive", help="time the Pareto archives")
+    archive.add_argument("--points", type=int, default=ARCHIVE_POINTS)
+
+    commands.add_parser("steady_state", help="time steady-state insertion")
+
+    asynchronous = commands.add_parser("async", help="throughput of the simulator evaluator")
+    asynchronous.add_argument("--rows", type=int, default=ASYNC_ROWS)
+    asynchronous.add_argument("--latency", type=float, default=ASYNC_LATENCY, help="seconds per request")
+
+    commands.add_parser("kernels", help="time the kernel backends")
+
+    args = parser.parse_args()
+    if args.command == "stages":
+        results = benchmark_stages(args.sizes, args.objectives, args.backends, args.stages, not args.no_memory)
+        write_results(args.output, results)
+    elif args.command == "compare":
+        # A non-zero exit status lets scripts fail on regressions
+        sys.exit(1 if compare_results(args.baseline, args.current, args.threshold) else 0)
+    elif args.command == "startup":
+        benchmark_startup()
+    elif args.command == "archive":
+        benchmark_archive(args.points)
+    elif args.command == "steady_state":
+        benchmark_steady_state()
+    elif args.command == "async":
+        benchmark_async(args.rows, args.latency)
+    elif args.command == "kernels":
+        benchmark_kernels()
+        benchmark_kernel_startup()
+    else:
+        benchmark_sorting()
+        benchmark_cloning()
+        benchmark_variation()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""
+    Checkpoints of the ga loop state in one .npz file
+
+    A checkpoint holds P_t, the fronts of the last generation, the Egg, the generation
+    counter, the states of random, of the shared numpy generator and of the evaluator,
+    the saved history of ga.main, its archive and the front quality records of its
+    stopping rule.
+    Populations are stored column by column, several populations of a group (fronts,
+    history) are concatenated with an offsets array.
+    Everything is plain arrays, so loading never unpickles.
+"""
+
+import json
+import os
+from collections import namedtuple
+
+import numpy as np
+
+from Egg import Egg
+from Population import Population, COLUMNS, generator_states, set_generator_states
+
+Checkpoint = namedtuple("Checkpoint", ("egg", "generation", "population", "fronts", "history",
+                                       "generator_states", "evaluator_batch", "quality", "archive"))
+
+
+def _as_population(population):
+    return population if isinstance(population, Population) else Population.from_sperms(population)
+
+def _save_group(arrays, prefix, parts, is_list):
+    """ Columns of the populations in parts under prefix, concatenated """
+    joined = Population.concatenate(parts) if parts else Population(0)
+
+    for name in COLUMNS:
+        arrays[f"{prefix}.{name}"] = getattr(joined, name)
+    arrays[f"{prefix}.offsets"] = np.cumsum([0] + [len(part) for part in parts])
+    arrays[f"{prefix}.is_list"] = np.array(is_list, dtype=bool)
+
+def _load_group(arrays, prefix, as_snapshots=False):
+    joined = Population.__new__(Population)
+    for name in COLUMNS:
+        setattr(joined, name, arrays[f"{prefix}.{name}"])
+
+    offsets = arrays[f"{prefix}.offsets"].tolist()
+    populations = []
+    for start, end, is_list in zip(offsets, offsets[1:], arrays[f"{prefix}.is_list"].tolist()):
+        part = joined.take(slice(start, end))
+        if is_list:
+            part = part.to_sperms()
+            if as_snapshots:
+                part = [sperm.snapshot() for sperm in part]
+        populations.append(part)
+
+    return populations
+
+class CheckpointWriter:
+    """
+        Writes checkpoints of one run to path
+        Saved history snapshots never change, so each one is converted to columns once
+    """
+    def __init__(self, path):
+        self.path = path
+        # id of a saved snapshot -> (snapshot, its columns)
+        self.history_columns = {}
+
+    def save(self, egg, generation, P_t, fronts, evaluator=None, history=None, quality=None, archive=None):
+        """
+            Write the loop state after `generation`
+            history is the (saved_populations, pareto_front_history, generation_numbers) of ga.main
+            quality is the (records, front objectives) of a Metrics.FrontQuality, see FrontQuality.state
+            archive is the list of individuals of an Archive.ParetoArchive, see ParetoArchive.restore
+            The file is written next to path and then renamed over it, so path always holds a whole checkpoint
+        """
+        random_state, numpy_state = generator_states()
+        version, internal_state, gauss_next = random_state
+
+        arrays = {
+            "generation": np.array(generation),
+            "egg.hla_profile": np.array(egg.hla_profile),
+            "egg.ideal_ph_range": np.array(egg.ideal_ph_range, dtype=float),
+            "random.version": np.array(version),
+            "random.state": np.array(internal_state, dtype=np.uint32),
+            "random.gauss_next": np.array([] if gauss_next is None else [gauss_next], dtype=float),
+            "numpy.state": np.array(json.dumps(numpy_state)),
+            "evaluator.batch": np.array(evaluator.batch if evaluator is not None else 0),
+        }
+        _save_group(arrays, "P_t", [_as_population(P_t)], [not isinstance(P_t, Population)])
+        _save_group(arrays, "fronts", [_as_population(front) for front in fronts],
+                    [not isinstance(front, Population) for front in fronts])
+
+        if history is not None:
+            saved_populations, pareto_front_history, generation_numbers = history
+            history_columns = {}
+            for prefix, populations in (("history.populations", saved_populations), ("history.fronts", pareto_front_history)):
+                for population in populations:
+                    cached = self.history_columns.get(id(population))
+                    if cached is None or cached[0] is not population:
+                        cached = (population, _as_population(population))
+                    history_columns[id(population)] = cached
+
+                _save_group(arrays, prefix, [history_columns[id(population)][1] for population in populations],
+                            [not isinstance(population, Population) for population in populations])
+            arrays["history.generation_numbers"] = np.array(generation_numbers, dtype=np.int64)
+            self.history_columns = history_columns
+
+        if archive is not None:
+            _save_group(arrays, "archive", [_as_population(archive)], [True])
+
+        if quality is not None:
+            records, objectives = quality
+            arrays["quality.records"] = np.array(json.dumps(records))
+            if objectives is not None:
+                arrays["quality.objectives"] = objectives
+
+        temporary_path = f"{self.path}.tmp"
+        with open(temporary_path, "wb") as file:
+            np.savez(file, **arrays)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary_path, self.path)
+
+def save_checkpoint(path, egg, generation, P_t, fronts, evaluator=None, history=None, quality=None, archive=None):
+    """ One-off CheckpointWriter(path).save """
+    CheckpointWriter(path).save(egg, generation, P_t, fronts, evaluator, history, quality, archive)
+
+def load_checkpoint(path):
+    """ Read a checkpoint written by save_checkpoint, see restore_generators to continue the run """
+    with np.load(path) as arrays:
+        egg = Egg(arrays["egg.hla_profile"].tolist(), arrays["egg.ideal_ph_range"].tolist())
+
+        gauss_next = arrays["random.gauss_next"].tolist()
+        random_state = (int(arrays["random.version"]), tuple(arrays["random.state"].tolist()),
+                        gauss_next[0] if gauss_next else None)
+        numpy_state = json.loads(str(arrays["numpy.state"]))
+
+        history = None
+        if "history.generation_numbers" in arrays:
+            history = (_load_group(arrays, "history.populations", as_snapshots=True),
+                       _load_group(arrays, "history.fronts", as_snapshots=True),
+                       arrays["history.generation_numbers"].tolist())
+
+        quality = None
+        if "quality.records" in arrays:
+            quality = (json.loads(str(arrays["quality.records"])),
+                       arrays["quality.objectives"] if "quality.objectives" in arrays else None)
+
+        return Checkpoint(egg=egg,
+                          generation=int(arrays["generation"]),
+                          population=_load_group(arrays, "P_t")[0],
+                          fronts=_load_group(arrays, "fronts"),
+                          history=history,
+                          generator_states=(random_state, numpy_state),
+                          evaluator_batch=int(arrays["evaluator.batch"]),
+                          quality=quality,
+                          archive=_load_group(arrays, "archive", as_snapshots=True)[0] if "archive.offsets" in arrays else None)
+
+def restore_generators(checkpoint, evaluator=None):
+    """ Put random, the shared numpy generator and the evaluator back where the checkpoint left them """
+    set_generator_states(checkpoint.generator_states)
+    if evaluator is not None:
+        evaluator.batch = checkpoint.evaluator_batch
@@ -8,11 +8,139 @@ HLA_ALLELES = [
 OBJECTIVE_NUM = 2
 IS_MINIMIZATION_OBJECTIVE = [False, False]
 
+# "auto", "naive", "deb", "sweep2d" (2 objectives only) or "ens"
+SORTING_ENGINE = "auto"
+
+# Inner loops of dominance, crowding distances and mutation: "numpy", "numba" or "auto" (numba when installed)
+# Loading numba adds about 0.7s to every process, set "numba" for large populations (--set KERNEL_BACKEND='"numba"')
+KERNEL_BACKEND = "numpy"
+
+# "objects" (list of Sperm) or "arrays" (structure-of-arrays Population)
+POPULATION_BACKEND = "objects"
+
+# "full" re-sorts Q_t + P_t every generation, "incremental" merges Q_t into the fronts of P_t
+RANKING_MODE = "full"
+
+# "generational" breeds and ranks POPULATION_SIZE offspring at once, "steady_state" inserts them
+# into the ranked population as they are evaluated, removing the worst individual each time (SteadyState.py).
+# Steady state keeps slow or remote evaluators busy, with cheap objectives it is slower per generation
+LOOP_MODE = "generational"
+
+# Offspring bred and evaluated together in steady-state mode, 1 for (mu + 1)
+STEADY_STATE_BATCH = 1
+
+# Batches evaluated at once in steady-state mode, the evaluator's worker count (1 in process) when None
+STEADY_STATE_IN_FLIGHT = None
+
+# Raw objective functions, a name registered in Objectives.OBJECTIVE_FUNCTIONS
+OBJECTIVE_FUNCTION = "sperm"
+
+# "serial", "processes" (EVALUATION_WORKERS processes, None for one per CPU) or "async" (the simulator below)
+EVALUATION_MODE = "serial"
+EVALUATION_WORKERS = None
+# Individuals per evaluation task, each task draws from its own RNG seeded with EVALUATION_SEED
+EVALUATION_CHUNK_SIZE = 64
+EVALUATION_SEED = 0
+
+# "async" evaluation sends every chunk to the simulator at SIMULATOR_ADDRESS (AsyncEvaluation.py): at most
+# ASYNC_CONCURRENCY requests in flight, each given ASYNC_TIMEOUT seconds and retried up to ASYNC_RETRIES times
+SIMULATOR_ADDRESS = ("127.0.0.1", 8765)
+ASYNC_CONCURRENCY = 8
+ASYNC_TIMEOUT = 10.0
+ASYNC_RETRIES = 3
+# Seconds before the first retry, doubled for every next one
+ASYNC_RETRY_DELAY = 0.05
+
+# Simulator.py stand-in: seconds per request and per row, share of the requests dropped or stalled
+SIMULATOR_LATENCY = 0.01
+SIMULATOR_ROW_LATENCY = 0.0002
+SIMULATOR_FAILURE_RATE = 0.0
+
+# Evaluators keep the raw objectives of every genotype evaluated in a run and reuse them when variation
+# creates it again (Genotype.py), which needs deterministic objective functions. Children copied unchanged
+# keep their parent's objectives anyway, and the built-in variation rarely recreates an evaluated genotype
+# (SBX redraws the biological parameters), so this pays off for expensive objective functions or custom
+# variation operators only.
+# At most GENOTYPE_CACHE_SIZE genotypes are kept, the oldest are dropped first, None for no limit
+GENOTYPE_CACHE = False
+GENOTYPE_CACHE_SIZE = 100_000
+
+# Offspring duplicating a parent or an earlier offspring: "keep" them, "remove" them before sorting
+# or "reseed" them, replaced by random individuals
+DUPLICATES = "keep"
+
+# "loop" (one random.randint tournament at a time) or "batched" (all tournaments drawn at once with numpy)
+SELECTION_MODE = "loop"
+# Contestants per tournament, 2 for binary tournaments
+TOURNAMENT_SIZE = 2
+
+# "loop" (pair by pair on single individuals) or "batched" (the whole mating pool as array operations)
+VARIATION_MODE = "loop"
+
 NUM_OF_GENERATIONS = 500
 SAVE_EACH_N_GENERATION = 10
+
+# Generations ga.main saves to the history, the initial population always is:
+# "legacy" every SAVE_EACH_N_GENERATION and generations 2, 4, 6, 8, 15, 25, 35, 45
+# "every" every SAVE_EACH_N_GENERATION, "last" the same keeping only the last HISTORY_LAST_K
+# "log" the generations int(HISTORY_LOG_BASE ** k)
+HISTORY_RETENTION = "legacy"
+HISTORY_LAST_K = 20
+HISTORY_LOG_BASE = 1.25
+# Directory for an on-disk, memory-mapped history (History.HistoryWriter), None keeps it in memory
+HISTORY_PATH = None
+
+# ga.main writes a checkpoint to CHECKPOINT_PATH (None disables) every CHECKPOINT_EVERY generations
+CHECKPOINT_PATH = None
+CHECKPOINT_EVERY = 10
+# Path of a checkpoint for ga.main to continue from, up to NUM_OF_GENERATIONS
+RESUME_FROM = None
+
+# Early stop of ga.main (Metrics.HypervolumeStop), opt-in: None runs all NUM_OF_GENERATIONS. Otherwise, after at least STOP_MIN_GENERATIONS,
+# stop once the best front 0 hypervolume of the last STOP_WINDOW generations is less than STOP_EPSILON (relative) above the best before
+# (1e-3 is a reasonable start)
+STOP_EPSILON = None
+STOP_WINDOW = 50
+STOP_MIN_GENERATIONS = 100
+# Hypervolume reference point in objective space, None for the origin (every objective is maximized)
+HYPERVOLUME_REFERENCE = None
+# Text file of reference front objective vectors, one per line, for the IGD of front 0 (Metrics.igd), None skips IGD
+# Setting it tracks hypervolume, spread and IGD in the telemetry records and RunResult.quality, with or without early stopping
+IGD_REFERENCE_FRONT = None
+
+# ga.main keeps every non-dominated individual seen in an external archive (Archive.py), the final answer of the run,
+# pruned down to the ARCHIVE_MAX_SIZE least crowded ones (None for no limit)
+ARCHIVE = True
+ARCHIVE_MAX_SIZE = 1000
+
+# ga.main run telemetry (Telemetry.py): None (off), "memory" (records kept in memory) or
+# "jsonl" (a JSON line per generation to TELEMETRY_PATH, stderr when None, written at most every TELEMETRY_INTERVAL seconds)
+TELEMETRY = "jsonl"
+TELEMETRY_PATH = None
+TELEMETRY_INTERVAL = 1.0
+
 POPULATION_SIZE = 100
 MATING_POOL_SIZE = POPULATION_SIZE
 
+# Island model (Islands.py): ISLAND_NUM populations of ISLAND_POPULATION_SIZE, one process each
+ISLAND_NUM = 4
+ISLAND_POPULATION_SIZE = POPULATION_SIZE
+# Every MIGRATION_INTERVAL generations, MIGRATION_SIZE first front individuals leave each island
+MIGRATION_INTERVAL = 10
+MIGRATION_SIZE = 5
+# "ring" (to the next island) or "full" (to every other island)
+MIGRATION_TOPOLOGY = "ring"
+ISLAND_SEED = 0
+
+# Batch.py: worker processes (None for one per CPU), job i is seeded with (BATCH_SEED, i)
+BATCH_WORKERS = None
+BATCH_SEED = 0
+
+# Sweep.py: worker processes (None for one per CPU), every cell runs SWEEP_REPEATS times, run r seeded with (SWEEP_SEED, r)
+SWEEP_WORKERS = None
+SWEEP_REPEATS = 3
+SWEEP_SEED = 0
+
 CROSSOVER_RATE = 0.9
 MUTATION_RATE = 0.1
 eta = 5
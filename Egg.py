@@ -1,11 +1,60 @@
 import random
 
+import numpy as np
+
 import Config
+import Hla
 
 class Egg:
-    def __init__(self):
-        # Fixed  HLA profile (6 alel)
-        self.hla_profile = random.sample(Config.HLA_ALLELES, 6)
+    __slots__ = ("hla_profile", "hla_mask", "ideal_ph_range", "evaluator")
+
+    def __init__(self, hla_profile=None, ideal_ph_range=(7.2, 8.0)):
+        # Fixed  HLA profile (6 random alel unless given)
+        if hla_profile is None:
+            hla_profile = random.sample(Config.HLA_ALLELES, 6)
+        unknown = [allele for allele in hla_profile if allele not in Hla.ALLELE_BITS]
+        if unknown or len(hla_profile) == 0:
+            raise ValueError(f"Invalid egg HLA profile: {hla_profile}")
+        self.hla_profile = list(hla_profile)
+        self.hla_mask = Hla.profile_to_mask(self.hla_profile)
 
         # Ideal pH range
-        self.ideal_ph_range = (7.2, 8.0)
+        self.ideal_ph_range = tuple(ideal_ph_range)
+
+        # The egg never changes during a run, so its scoring is compiled once
+        self.evaluator = EggEvaluator(self)
+
+    def copy(self):
+        clone = Egg.__new__(Egg)
+        clone.hla_profile = list(self.hla_profile)
+        clone.hla_mask = self.hla_mask
+        clone.ideal_ph_range = self.ideal_ph_range
+        clone.evaluator = self.evaluator   # Read-only tables, safe to share
+        return clone
+
+class EggEvaluator:
+    """
+        Precompiled compatibility scoring against one Egg
+        The HLA match of every possible sperm HLA mask is tabulated up front
+    """
+    __slots__ = ("hla_match_table", "hla_match", "ph_low", "ph_high")
+
+    def __init__(self, egg):
+        all_masks = np.arange(Hla.FULL_MASK + 1)
+        self.hla_match_table = Hla.POPCOUNT[all_masks & egg.hla_mask] / len(egg.hla_profile)
+        self.hla_match = self.hla_match_table.tolist()   # Python floats for the per-individual path
+
+        self.ph_low, self.ph_high = egg.ideal_ph_range
+
+    def ph_score(self, ph_tolerance):
+        if self.ph_low <= ph_tolerance <= self.ph_high:
+            return 1.0
+
+        dist = min(abs(ph_tolerance - self.ph_low), abs(ph_tolerance - self.ph_high))
+        return max(0.0, 1 - dist)
+
+    def ph_scores(self, ph_tolerances):
+        """ Vectorized ph_score """
+        dist = np.minimum(np.abs(ph_tolerances - self.ph_low), np.abs(ph_tolerances - self.ph_high))
+        in_range = (self.ph_low <= ph_tolerances) & (ph_tolerances <= self.ph_high)
+        return np.where(in_range, 1.0, np.maximum(0.0, 1 - dist))
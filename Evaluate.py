@@ -1,6 +1,13 @@
+import numpy as np
+
 import Config
+import Sorting
+from Kernels import get_kernels
 from Sperm import Sperm
 from Egg import Egg
+from Population import Population, apply_dynamic_penalty, get_column
+from Telemetry import NULL_TELEMETRY
+from RunConfig import resolve_config
 
 def dominates(individual_1, individual_2):
     """ Check if individual_1 dominates individual_2 """
@@ -55,13 +62,52 @@ def get_nondominated_set(population, rank, hashset=set()):
 
     return nondominated_set, indexes
 
-def nondominated_sorting(population):
+def nondominated_sorting(population, config=None):
     """
         This function performs non-dominated sorting
         Ranks are assigned to each individual within the population
         Based on the ranks, fronts are seperated
         It returns the seperated fronts
 
+        The engine is selected with config.SORTING_ENGINE (Config when None), see Sorting.py
+        All engines produce the same fronts and ranks
+    """
+    config = resolve_config(config)
+    if isinstance(population, Population):
+        return [population.take(indexes) for indexes in population_front_indexes(population, config)]
+
+    if config.SORTING_ENGINE == "naive":
+        return naive_nondominated_sorting(population)
+
+    fronts = []
+    for rank, indexes in enumerate(Sorting.sort_fronts(Sorting.objective_matrix(population), config.SORTING_ENGINE), start=1):
+        front = [population[i] for i in indexes]
+        for individual in front:
+            individual.rank = rank
+        fronts.append(front)
+
+    return fronts
+
+def population_front_indexes(population, config=None):
+    """
+        Non-dominated sorting of a Population
+        The rank column is filled in and the fronts are returned as row index arrays
+    """
+    engine = resolve_config(config).SORTING_ENGINE
+    if engine == "naive":
+        fronts = [np.array([view.index for view in front], dtype=np.int64) for front in naive_nondominated_sorting(list(population))]
+    else:
+        fronts = Sorting.sort_fronts(population.objectives, engine)
+
+    for rank, indexes in enumerate(fronts, start=1):
+        population.rank[indexes] = rank
+
+    return fronts
+
+def naive_nondominated_sorting(population):
+    """
+        Front peeling with repeated get_nondominated_set calls
+
         O(n) space, n=population size
         O(n^3 * m) time, n=pop_size  m=# of objcetives
     """
@@ -77,54 +123,185 @@ def nondominated_sorting(population):
 
     return fronts
 
-def crowding_distance_evaluation(population):
+def crowding_distance_evaluation(population, config=None):
     """
         O(n) space, n=population size
-        O(n^3 * m) time, n=pop_size  m=# of objcetives
+        O(n log n * m) time with the default sorting engine, n=pop_size  m=# of objcetives
+
+        All fronts go through one crowding_distances call on the objective matrix,
+        for a list of Sperm the resulting ranks and distances are then written back
     """
-    # Divide the population into different fronts
-    fronts = nondominated_sorting(population)
+    if isinstance(population, Population):
+        return population_crowding_distance_evaluation(population, config)
 
-    # Get the max and min values for all the objectives
-    obj_maxes = []
-    obj_mins = []
-    for i in range(Config.OBJECTIVE_NUM):
-        obj_maxes.append(max(individual.objectives[i] for individual in population))
-        obj_mins.append(min(individual.objectives[i] for individual in population))
-
-    # For each front, calculate crowding distances
-    for front in fronts:
-        # If there are less than 3 individuals in the front, all of their crowding distance is infinite
-        if len(front) < 3:
-            for individual in front:
-                individual.crowding_distance = float('inf')
-            continue
+    objectives = Sorting.objective_matrix(population)
+    fronts = list_front_indexes(population, objectives, config)
 
-        # Initialize crowding distances to 0
-        for individual in front:
-            individual.crowding_distance = 0.0
+    obj_maxes = objectives.max(axis=0) if len(population) > 0 else []
+    obj_mins = objectives.min(axis=0) if len(population) > 0 else []
 
-        for i in range(Config.OBJECTIVE_NUM):
-            # Sort the front based on the corresponding objective
-            front.sort(key=lambda individual: individual.objectives[i])
+    crowding_distance = np.zeros(len(population))
+    fronts = crowding_distances(objectives, fronts, obj_mins, obj_maxes, crowding_distance)
 
-            # First and last elements have infinite crowding distance
-            front[0].crowding_distance = float('inf')
-            front[-1].crowding_distance = float('inf')
+    ranks = np.zeros(len(population), dtype=np.int64)
+    for rank, front in enumerate(fronts, start=1):
+        ranks[front] = rank
 
-            for k in range (1, len(front) - 1):
-                if obj_maxes[i] != obj_mins[i]:
-                    front[k].crowding_distance += ((front[k+1].objectives[i] - front[k-1].objectives[i]) / (obj_maxes[i] - obj_mins[i]))
+    for individual, rank, distance in zip(population, ranks.tolist(), crowding_distance.tolist()):
+        individual.rank = rank
+        individual.crowding_distance = distance
 
-    return fronts
+    return [[population[i] for i in front.tolist()] for front in fronts]
+
+def list_front_indexes(population, objectives, config=None):
+    """ Non-dominated sorting of a list of Sperm, with the fronts returned as index arrays """
+    engine = resolve_config(config).SORTING_ENGINE
+    if engine == "naive":
+        index_of = {id(individual): i for i, individual in enumerate(population)}
+        return [np.array([index_of[id(individual)] for individual in front], dtype=np.int64)
+                for front in naive_nondominated_sorting(population)]
+
+    return Sorting.sort_fronts(objectives, engine)
+
+
+def population_crowding_distance_evaluation(population, config=None):
+    """
+        crowding_distance_evaluation over the columns of a Population
+        The fronts are returned as Populations sharing the columns of one reordered copy
+    """
+    fronts = population_front_indexes(population, config)
+    objectives = population.objectives
 
+    obj_maxes = objectives.max(axis=0) if len(population) > 0 else []
+    obj_mins = objectives.min(axis=0) if len(population) > 0 else []
 
+    fronts = crowding_distances(objectives, fronts, obj_mins, obj_maxes, population.crowding_distance)
+    if len(fronts) == 0:
+        return []
+
+    ordered = population.take(np.concatenate(fronts))
+    ends = np.cumsum([len(front) for front in fronts]).tolist()
+    return [ordered.rows(start, end) for start, end in zip([0] + ends, ends)]
+
+def crowding_distances(objectives, fronts, obj_mins, obj_maxes, crowding_distance):
+    """
+        Crowding distances of the fronts (row indexes into objectives), written into crowding_distance
+        Returns the fronts reordered the way the per-front list sorts leave them
+        Runs the kernel of Config.KERNEL_BACKEND, see Kernels.crowding_distances
+    """
+    return get_kernels().crowding_distances(objectives, fronts, obj_mins, obj_maxes, crowding_distance)
+
+
+def evaluate_population_objectives(population, egg: Egg, generation_number=1, evaluator=None, config=None):
+    """
+        Only individuals whose genome changed run the objective functions,
+        the generation dependent penalty is then re-applied to everyone at once
+        With an Objectives.Evaluator, the objective functions run through it
+        The penalty parameters come from config (a RunConfig), Config when None
+        Returns the number of individuals evaluated
+    """
+    config = resolve_config(config)
+    penalty = (config.DYNAMIC_PENALTY_FACTOR_C, config.DYNAMIC_PENALTY_FACTOR_ALPHA, config.DYNAMIC_PENALTY_FACTOR_BETA,
+               config.CONSTRAINT)
+
+    evaluated = 0
+    if evaluator is not None:
+        evaluated = evaluator.evaluate_raw_objectives(population)
+
+    if isinstance(population, Population):
+        return evaluated + population.evaluate_objectives(egg, generation_number, *penalty)
 
-def evaluate_population(population, egg: Egg, generation_number=1):
     for individual in population:
-        individual.evaluate_objectives(egg, generation_number)
+        if individual.needs_evaluation:
+            individual.evaluate_raw_objectives(egg)
+            evaluated += 1
+
+    if len(population) > 0:
+        raw_objectives = np.array([individual.raw_objectives for individual in population], dtype=float)
+        objectives = apply_dynamic_penalty(raw_objectives, generation_number, *penalty)
+        for individual, values in zip(population, objectives.tolist()):
+            individual.objectives = values
+
+    return evaluated
+
+def evaluate_population(population, egg: Egg, generation_number=1, evaluator=None, config=None):
+    evaluate_population_objectives(population, egg, generation_number, evaluator, config)
+
+    return crowding_distance_evaluation(population, config)
+
+
+class IncrementalRanking:
+    """
+        Ranking for Config.RANKING_MODE == "incremental"
+
+        The survivors P_t returned by rank_filtering are already split into fronts. Instead of
+        sorting Q_t + P_t from scratch, the offspring (and the parents whose penalized objectives
+        moved) are merged into the parents' fronts with Sorting.incremental_sort. Crowding
+        distances are recomputed only for the fronts that gained or lost members, or for all of
+        them when the objective bounds of the combined population move.
+    """
+    def __init__(self):
+        # Objective bounds used for the crowding distances of the previous generation
+        self.obj_mins = None
+        self.obj_maxes = None
+
+    def evaluate(self, offspring, parents, egg: Egg, generation_number=1, evaluator=None, telemetry=NULL_TELEMETRY,
+                 config=None):
+        """
+            Same fronts as evaluate_population(offspring + parents, egg, generation_number)
+            parents must be ranked, as the output of rank_filtering (or evaluate_population) is
+        """
+        is_population = isinstance(parents, Population)
+        previous_objectives = parents.objectives.copy() if is_population else Sorting.objective_matrix(parents)
+        previous_ranks = np.asarray(get_column(parents, "rank"), dtype=np.int64)
+
+        R_t = offspring + parents
+        with telemetry.stage("evaluation"):
+            telemetry.count("evaluations", evaluate_population_objectives(R_t, egg, generation_number, evaluator, config))
+
+        with telemetry.stage("sorting"):
+            return self.rank(R_t, len(offspring), previous_objectives, previous_ranks)
+
+    def rank(self, R_t, offspring_num, previous_objectives, previous_ranks):
+        """ Fronts of the evaluated R_t = offspring + parents, from the parents' objectives and ranks before evaluation """
+        is_population = isinstance(R_t, Population)
+        objectives = R_t.objectives if is_population else Sorting.objective_matrix(R_t)
+
+        # Offspring and parents whose objectives moved have no valid rank yet
+        changed = np.flatnonzero(np.any(objectives[offspring_num:] != previous_objectives, axis=1))
+        inserted = np.concatenate((np.arange(offspring_num), offspring_num + changed))
+        ranks = np.concatenate((np.zeros(offspring_num, dtype=np.int64), previous_ranks))
+
+        fronts, touched = Sorting.incremental_sort(Sorting.to_minimization(objectives), ranks, inserted,
+                                                   Sorting.to_minimization(previous_objectives[changed]))
+        touched.update((previous_ranks[changed] - 1).tolist())
+        if len(previous_ranks) > 0:
+            # rank_filtering may have cut the last front of the parents
+            touched.add(int(previous_ranks.max()) - 1)
+
+        obj_maxes = objectives.max(axis=0) if len(R_t) > 0 else []
+        obj_mins = objectives.min(axis=0) if len(R_t) > 0 else []
+        if self.obj_mins is None or not (np.array_equal(obj_mins, self.obj_mins) and np.array_equal(obj_maxes, self.obj_maxes)):
+            touched = set(range(len(fronts)))
+        self.obj_mins, self.obj_maxes = obj_mins, obj_maxes
+
+        # Untouched fronts only hold parents that keep their rank and crowding distance
+        crowding_distance = np.array(get_column(R_t, "crowding_distance"), dtype=float)
+        touched = sorted(k for k in touched if k < len(fronts))
+        reordered = crowding_distances(objectives, [fronts[k] for k in touched], obj_mins, obj_maxes, crowding_distance)
+        for k, front in zip(touched, reordered):
+            fronts[k] = front
 
-    return crowding_distance_evaluation(population)
+        if is_population:
+            for rank, front in enumerate(fronts, start=1):
+                R_t.rank[front] = rank
+            R_t.crowding_distance[:] = crowding_distance
+            return [R_t.take(front) for front in fronts]
 
+        crowding_distance = crowding_distance.tolist()
+        for k in touched:
+            for i in fronts[k].tolist():
+                R_t[i].rank = k + 1
+                R_t[i].crowding_distance = crowding_distance[i]
 
-    
\ No newline at end of file
+        return [[R_t[i] for i in front.tolist()] for front in fronts]
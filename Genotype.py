@@ -0,0 +1,169 @@
+"""
+    Genotype keys and the per-run index of evaluated genotypes
+
+    Some pairs skip crossover and mutation often leaves a gene alone, so a converged population
+    holds many exact copies. Those keep their parent's objectives anyway: a stale row repeats a
+    known genotype only when a genotype-changing operator lands on one already evaluated (SBX
+    keeps the resources and pH of near-identical parents but redraws the biological parameters,
+    an HLA mutation can give a clone the alleles another clone got earlier). The key of an
+    individual is the bytes of its genes (resources, biological parameters, pH tolerance, with
+    -0.0 taken as 0.0) followed by its HLA set as a mask, equal exactly for equal genotypes.
+
+    GenotypeIndex remembers the raw objectives of every genotype evaluated in a run, the
+    evaluators fill stale rows of a known genotype from it (Config.GENOTYPE_CACHE), and only
+    one row of each unknown genotype runs the objective functions. handle_duplicates removes
+    or re-seeds offspring duplicating a parent or each other (Config.DUPLICATES).
+"""
+
+import itertools
+
+import numpy as np
+
+import Config
+from Population import Population, get_column
+from RunConfig import resolve_config
+from Sperm import Sperm
+
+GENE_COLUMNS = ("genetic_resources", "biological_resources", "dfi", "motility", "morphology", "velocity", "ph_tolerance")
+
+DUPLICATE_MODES = ("keep", "remove", "reseed")
+
+
+def genotype_keys(population, rows=None):
+    """ Key (bytes) of every row of a Population or list of Sperm, or of the given rows only """
+    if rows is None:
+        rows = np.arange(len(population))
+
+    genes = np.empty((len(rows), len(GENE_COLUMNS) + 1), dtype=np.float64)
+    for j, name in enumerate(GENE_COLUMNS):
+        genes[:, j] = get_column(population, name)[rows]
+    genes[:, :-1] += 0.0
+
+    # The HLA mask goes in the last 8 bytes as an integer, the float columns as their bit patterns
+    keys = genes.view(np.int64)
+    keys[:, -1] = get_column(population, "hla_mask")[rows]
+    return keys.view(np.dtype((np.void, keys.shape[1] * 8))).ravel().tolist()
+
+def set_raw_objectives(population, rows, values):
+    """ Write evaluated raw objectives into the rows of a Population or list of Sperm """
+    if isinstance(population, Population):
+        population.raw_objectives[rows] = values
+        population.needs_evaluation[rows] = False
+        return
+
+    for i, row_values in zip(rows.tolist(), np.asarray(values).tolist()):
+        population[i].raw_objectives = row_values
+        population[i].needs_evaluation = False
+
+def stale_rows(population):
+    return np.flatnonzero(get_column(population, "needs_evaluation"))
+
+
+class GenotypeIndex:
+    """
+        Raw objectives by genotype key, at most max_size of them (the oldest are dropped first)
+        saved counts the stale rows filled from the index instead of being evaluated
+    """
+    def __init__(self, max_size=None):
+        self.max_size = max_size
+        self.objectives = {}
+        self.saved = 0
+
+    def __len__(self):
+        return len(self.objectives)
+
+    def reuse(self, population):
+        """ Fill the stale rows of known genotypes, returns the first stale row of every unknown genotype """
+        stale = stale_rows(population)
+        if len(stale) == 0:
+            return stale
+
+        known, unknown = [], {}
+        for row, key in zip(stale.tolist(), genotype_keys(population, stale)):
+            values = self.objectives.get(key)
+            if values is not None:
+                known.append((row, values))
+            else:
+                unknown.setdefault(key, row)
+
+        if known:
+            rows, values = zip(*known)
+            set_raw_objectives(population, np.array(rows), np.array(values))
+            self.saved += len(known)
+
+        return np.fromiter(unknown.values(), dtype=np.int64, count=len(unknown))
+
+    def add(self, population, rows):
+        """ Remember the raw objectives of evaluated rows """
+        raw_objectives = np.asarray(get_column(population, "raw_objectives")[rows], dtype=float).reshape(len(rows), -1)
+        for key, values in zip(genotype_keys(population, rows), raw_objectives):
+            self.objectives[key] = values
+
+        if self.max_size is not None and len(self.objectives) > self.max_size:
+            # Dicts keep insertion order, the oldest keys come first
+            excess = len(self.objectives) - self.max_size
+            for key in list(itertools.islice(iter(self.objectives), excess)):
+                del self.objectives[key]
+
+    def evaluate(self, population, evaluate_rows):
+        """
+            Raw objectives of the stale rows, evaluate_rows(population, rows) running only on one row of every
+            unknown genotype, returns the number of rows evaluated
+        """
+        unknown = self.reuse(population)
+        if len(unknown) == 0:
+            return 0
+
+        evaluate_rows(population, unknown)
+        self.add(population, unknown)
+
+        # Duplicates of the rows just evaluated, anything left over (an index smaller than the batch) is evaluated
+        self.reuse(population)
+        rest = stale_rows(population)
+        if len(rest) > 0:
+            evaluate_rows(population, rest)
+
+        return len(unknown) + len(rest)
+
+def create_genotype_index(config=None):
+    config = resolve_config(config)
+    return GenotypeIndex(config.GENOTYPE_CACHE_SIZE) if config.GENOTYPE_CACHE else None
+
+# ==================================================================================================================================
+
+def duplicate_offspring(offspring, parents):
+    """ Mask of the offspring whose genotype is a parent's or an earlier offspring's """
+    seen = set(genotype_keys(parents))
+    mask = np.zeros(len(offspring), dtype=bool)
+    for i, key in enumerate(genotype_keys(offspring)):
+        mask[i] = key in seen
+        seen.add(key)
+
+    return mask
+
+def handle_duplicates(offspring, parents, mode=None):
+    """
+        Offspring with the duplicates left in ("keep"), taken out ("remove") or replaced by random individuals
+        appended at the end ("reseed"), and the number of duplicates
+    """
+    if mode is None:
+        mode = Config.DUPLICATES
+    if mode not in DUPLICATE_MODES:
+        raise ValueError(f"Unknown duplicates mode: {mode}")
+
+    is_duplicate = duplicate_offspring(offspring, parents)
+    duplicates = int(is_duplicate.sum())
+    if mode == "keep" or duplicates == 0:
+        return offspring, duplicates
+
+    kept = np.flatnonzero(~is_duplicate)
+    if isinstance(offspring, Population):
+        offspring = offspring.take(kept)
+        if mode == "reseed":
+            offspring = offspring + Population.random(duplicates)
+    else:
+        offspring = [offspring[i] for i in kept.tolist()]
+        if mode == "reseed":
+            offspring += [Sperm() for _ in range(duplicates)]
+
+    return offspring, duplicates
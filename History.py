@@ -0,0 +1,253 @@
+"""
+    Saved generation history of ga.main
+
+    MemoryHistory keeps snapshots in lists. HistoryWriter appends every saved generation
+    to one raw binary file per column under a directory, with an index of generation
+    numbers and row offsets. HistoryReader memory-maps those files, so a saved population
+    is only read from disk when it is used. The retention policy decides which
+    generations are saved and how many are kept.
+"""
+
+import json
+import os
+
+import numpy as np
+
+from Population import Population, COLUMNS
+from RunConfig import resolve_config
+
+HISTORY_GROUPS = ("populations", "fronts")
+
+# Generations the original save schedule added to every SAVE_EACH_N_GENERATION
+LEGACY_GENERATIONS = (2, 4, 6, 8, 15, 25, 35, 45)
+
+
+def snapshot(population):
+    """ Copy of a population (list of Sperm or Population) that later generations cannot modify """
+    if isinstance(population, Population):
+        return population.copy()
+
+    return [individual.snapshot() for individual in population]
+
+def is_log_generation(t, base):
+    """ True for the generations int(base ** k), k = 0, 1, 2, ... """
+    k, generation = 0, 1
+    while generation < t:
+        k += 1
+        generation = int(base ** k)
+
+    return generation == t
+
+def is_saved_generation(t, retention=None, config=None):
+    """ Whether generation t goes to the history, the initial population (t=0) always does """
+    config = resolve_config(config)
+    if retention is None:
+        retention = config.HISTORY_RETENTION
+
+    if t == 0:
+        return True
+    if retention == "legacy":
+        return t % config.SAVE_EACH_N_GENERATION == 0 or t in LEGACY_GENERATIONS
+    if retention in ("every", "last"):
+        return t % config.SAVE_EACH_N_GENERATION == 0
+    if retention == "log":
+        return is_log_generation(t, config.HISTORY_LOG_BASE)
+
+    raise ValueError(f"Unknown history retention: {retention}")
+
+def retained_count(retention=None, config=None):
+    """ Number of saved generations kept, None for all of them """
+    config = resolve_config(config)
+    if retention is None:
+        retention = config.HISTORY_RETENTION
+
+    return config.HISTORY_LAST_K if retention == "last" else None
+
+# ==================================================================================================================================
+
+class MemoryHistory:
+    def __init__(self, keep_last=None, populations=None, fronts=None, generation_numbers=None):
+        self.keep_last = keep_last
+        self.populations = populations if populations is not None else []
+        self.fronts = fronts if fronts is not None else []
+        self.generation_numbers = generation_numbers if generation_numbers is not None else []
+
+    def append(self, generation, population, front):
+        self.populations.append(snapshot(population))
+        self.fronts.append(snapshot(front))
+        self.generation_numbers.append(generation)
+
+        if self.keep_last is not None and len(self.generation_numbers) > self.keep_last:
+            del self.populations[0], self.fronts[0], self.generation_numbers[0]
+
+    def as_tuple(self):
+        return self.populations, self.fronts, self.generation_numbers
+
+    def read(self):
+        return self
+
+    def close(self):
+        pass
+
+def _column_path(directory, group, name):
+    return os.path.join(directory, f"{group}.{name}.bin")
+
+def _write_atomically(path, write):
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, "wb") as file:
+        write(file)
+    os.replace(temporary_path, path)
+
+class HistoryWriter:
+    """
+        Appends saved generations to the column files under directory
+
+        keep_last drops the oldest generations from the index, their rows are removed from
+        the files once they outnumber the kept ones. resume_after reopens an existing history
+        and drops what was saved after that generation, for a run resumed from a checkpoint.
+    """
+    def __init__(self, directory, keep_last=None, resume_after=None, objective_num=None, config=None):
+        if objective_num is None:
+            objective_num = resolve_config(config).OBJECTIVE_NUM
+        self.directory = directory
+        self.keep_last = keep_last
+        os.makedirs(directory, exist_ok=True)
+
+        prototype = Population(1, objective_num)
+        self.row_bytes = {name: getattr(prototype, name).nbytes for name in COLUMNS}
+
+        # Rows of generation k: index[k, 1 + 2g] to index[k, 2 + 2g] in group g
+        self.index = np.zeros((0, 1 + 2 * len(HISTORY_GROUPS)), dtype=np.int64)
+        if resume_after is None:
+            with open(os.path.join(directory, "meta.json"), "w") as file:
+                json.dump({"objective_num": objective_num}, file)
+            for group in HISTORY_GROUPS:
+                for name in COLUMNS:
+                    open(_column_path(directory, group, name), "wb").close()
+        else:
+            index = np.load(os.path.join(directory, "index.npy"))
+            self.index = index[index[:, 0] <= resume_after]
+
+        self.files = {}
+        for g, group in enumerate(HISTORY_GROUPS):
+            rows = int(self.index[-1, 2 + 2 * g]) if len(self.index) > 0 else 0
+            for name in COLUMNS:
+                file = open(_column_path(directory, group, name), "ab")
+                file.truncate(rows * self.row_bytes[name])
+                self.files[group, name] = file
+        self.write_index()
+
+    def write_index(self):
+        _write_atomically(os.path.join(self.directory, "index.npy"), lambda file: np.save(file, self.index))
+
+    def append(self, generation, population, front):
+        entry = [generation]
+        for g, (group, rows) in enumerate(zip(HISTORY_GROUPS, (population, front))):
+            if not isinstance(rows, Population):
+                rows = Population.from_sperms(rows)
+
+            start = int(self.index[-1, 2 + 2 * g]) if len(self.index) > 0 else 0
+            for name in COLUMNS:
+                file = self.files[group, name]
+                np.ascontiguousarray(getattr(rows, name)).tofile(file)
+                file.flush()
+            entry += [start, start + len(rows)]
+
+        # The index is written last, a generation is only visible once all of its rows are on disk
+        self.index = np.vstack((self.index, np.array([entry], dtype=np.int64)))
+        if self.keep_last is not None and len(self.index) > self.keep_last:
+            self.index = self.index[-self.keep_last:]
+            if self.index[0, 1] > self.index[-1, 2] - self.index[0, 1]:
+                self.compact()
+        self.write_index()
+
+    def compact(self):
+        """ Remove the rows before the first kept generation from the files """
+        for g, group in enumerate(HISTORY_GROUPS):
+            dropped = int(self.index[0, 1 + 2 * g])
+            for name in COLUMNS:
+                path = _column_path(self.directory, group, name)
+                self.files[group, name].close()
+                with open(path, "rb") as file:
+                    file.seek(dropped * self.row_bytes[name])
+                    kept = file.read()
+                _write_atomically(path, lambda file: file.write(kept))
+                self.files[group, name] = open(path, "ab")
+
+            self.index[:, 1 + 2 * g: 3 + 2 * g] -= dropped
+
+    def read(self):
+        self.close()
+        return HistoryReader(self.directory)
+
+    def close(self):
+        for file in self.files.values():
+            file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class HistoryGroup:
+    """ Lazy sequence of the saved populations (or fronts) of a HistoryReader """
+    def __init__(self, reader, group):
+        self.reader = reader
+        self.group = group
+
+    def __len__(self):
+        return len(self.reader.generation_numbers)
+
+    def __getitem__(self, k):
+        return self.reader.load(self.group, k)
+
+    def __iter__(self):
+        for k in range(len(self)):
+            yield self.reader.load(self.group, k)
+
+class HistoryReader:
+    """
+        Memory-mapped view of a history written by HistoryWriter
+        populations and fronts are lazy sequences of read-only Populations
+    """
+    def __init__(self, directory):
+        with open(os.path.join(directory, "meta.json")) as file:
+            objective_num = json.load(file)["objective_num"]
+
+        self.index = np.load(os.path.join(directory, "index.npy"))
+        self.generation_numbers = self.index[:, 0].tolist()
+
+        prototype = Population(0, objective_num)
+        self.columns = {}
+        for g, group in enumerate(HISTORY_GROUPS):
+            rows = int(self.index[-1, 2 + 2 * g]) if len(self.index) > 0 else 0
+            for name in COLUMNS:
+                column = getattr(prototype, name)
+                shape = (rows,) + column.shape[1:]
+                if rows == 0:
+                    self.columns[group, name] = np.zeros(shape, dtype=column.dtype)
+                else:
+                    self.columns[group, name] = np.memmap(_column_path(directory, group, name),
+                                                          dtype=column.dtype, mode="r", shape=shape)
+
+        self.populations = HistoryGroup(self, "populations")
+        self.fronts = HistoryGroup(self, "fronts")
+
+    def __len__(self):
+        return len(self.generation_numbers)
+
+    def load(self, group, k):
+        g = HISTORY_GROUPS.index(group)
+        start, end = self.index[k, 1 + 2 * g], self.index[k, 2 + 2 * g]
+
+        population = Population.__new__(Population)
+        for name in COLUMNS:
+            setattr(population, name, self.columns[group, name][start:end])
+
+        return population
+
+    def __iter__(self):
+        """ (generation number, population, front) of every saved generation """
+        for k, generation in enumerate(self.generation_numbers):
+            yield generation, self.load("populations", k), self.load("fronts", k)
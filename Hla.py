@@ -0,0 +1,56 @@
+"""
+    HLA profiles as integer bitmasks
+
+    Bit i of a mask is set when the profile contains Config.HLA_ALLELES[i]
+"""
+
+import random
+
+import numpy as np
+
+import Config
+
+ALLELE_BITS = {allele: 1 << i for i, allele in enumerate(Config.HLA_ALLELES)}
+ALLELE_NUM = len(Config.HLA_ALLELES)
+FULL_MASK = (1 << ALLELE_NUM) - 1
+MASK_DTYPE = np.min_scalar_type(FULL_MASK)
+
+# Single-allele bits contained in every possible mask, for random.choice / random.sample
+MASK_BITS = [tuple(1 << i for i in range(ALLELE_NUM) if mask >> i & 1) for mask in range(FULL_MASK + 1)]
+
+# Number of alleles in every possible mask
+POPCOUNT = np.array([len(bits) for bits in MASK_BITS], dtype=np.int64)
+
+
+def profile_to_mask(hla_profile):
+    mask = 0
+    for allele in hla_profile:
+        mask |= ALLELE_BITS[allele]
+
+    return mask
+
+def mask_to_profile(mask):
+    """ The alleles of a mask in HLA_ALLELES order, as a tuple: the profile is a copy, changing it would change nothing """
+    return tuple(allele for i, allele in enumerate(Config.HLA_ALLELES) if mask >> i & 1)
+
+def random_subset(mask, size):
+    """ mask(random.sample(profile(mask), size)) without building the profile """
+    return sum(random.sample(MASK_BITS[mask], size))
+
+def sample_masks(pools, sizes, rng):
+    """
+        For every row, pick sizes[row] random alleles out of pools[row]
+        Vectorized equivalent of mask(random.sample(profile(pool), size))
+    """
+    pools = np.asarray(pools, dtype=np.int64)
+    sizes = np.asarray(sizes, dtype=np.int64)
+    shifts = np.arange(ALLELE_NUM, dtype=np.int64)
+
+    in_pool = (pools[:, None] >> shifts) & 1 == 1
+    keys = rng.random((len(pools), ALLELE_NUM))
+    keys[~in_pool] = 2.0   # Alleles outside the pool are never picked
+
+    # The alleles with the sizes[row] smallest keys, one argsort instead of ranking the keys
+    order = np.argsort(keys, axis=1)
+    picked = shifts < np.minimum(sizes, POPCOUNT[pools])[:, None]
+    return ((np.int64(1) << order) * picked).sum(axis=1).astype(MASK_DTYPE)
@@ -0,0 +1,153 @@
+"""
+    Island model NSGA-II
+
+    ISLAND_NUM populations evolve side by side on a process pool. A run is split into
+    epochs of MIGRATION_INTERVAL generations, each island running one epoch as one pool
+    task. Between epochs, the least crowded individuals of every island's first front
+    migrate along the topology and join the populations of the receiving islands.
+    Each task is seeded from (ISLAND_SEED, island, epoch), so a run is reproducible
+    whatever the number of worker processes.
+
+    python Islands.py
+"""
+
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import Config
+import ga
+from Egg import Egg
+from Evaluate import evaluate_population, IncrementalRanking
+from Objectives import create_evaluator
+from Population import Population, get_column, seed_generators
+from RunConfig import resolve_config
+from Survivor import rank_filtering
+
+def migration_targets(island, island_num, topology=None):
+    if topology is None:
+        topology = Config.MIGRATION_TOPOLOGY
+
+    if topology == "ring":
+        return [(island + 1) % island_num] if island_num > 1 else []
+    if topology == "full":
+        return [other for other in range(island_num) if other != island]
+
+    raise ValueError(f"Unknown migration topology: {topology}")
+
+def join_populations(parts):
+    if isinstance(parts[0], Population):
+        return Population.concatenate(parts)
+
+    return [individual for part in parts for individual in part]
+
+def select_migrants(population, migration_size):
+    """ Up to migration_size individuals of the first front, the least crowded first """
+    ranks = get_column(population, "rank")
+    first_front = np.flatnonzero(ranks == ranks.min())
+    crowding_distance = get_column(population, "crowding_distance")[first_front]
+    migrants = first_front[np.argsort(-crowding_distance, kind='stable')][:migration_size]
+
+    if isinstance(population, Population):
+        return population.take(migrants)
+
+    return [population[i] for i in migrants]
+
+def migrate(populations, migration_size, topology=None):
+    """ The immigrants of every island, None for islands receiving nobody """
+    arriving = [[] for _ in populations]
+    for island, population in enumerate(populations):
+        migrants = select_migrants(population, migration_size)
+        for target in migration_targets(island, len(populations), topology):
+            arriving[target].append(migrants)
+
+    return [join_populations(parts) if parts else None for parts in arriving]
+
+# ==================================================================================================================================
+
+# The Egg of a worker process, sent once by the pool initializer
+_worker_egg = None
+
+def _init_worker(egg):
+    global _worker_egg
+    _worker_egg = egg
+
+def run_island_epoch(population, immigrants, first_generation, last_generation, population_size, seed, config=None):
+    """
+        Evolve one island through generations first_generation..last_generation
+        population is None on the first epoch, the island then starts from a random population
+    """
+    config = resolve_config(config)
+    egg = _worker_egg
+    seed_generators(seed)
+    evaluator = create_evaluator(egg, "serial", config, seed=int(seed.generate_state(1)[0]))
+
+    if population is None:
+        population = ga.generate_population(population_size, config)
+        evaluate_population(population, egg, evaluator=evaluator, config=config)
+    elif immigrants is not None:
+        fronts = evaluate_population(population + immigrants, egg, first_generation - 1, evaluator, config)
+        population = rank_filtering(fronts, population_size)
+
+    ranking = IncrementalRanking() if config.RANKING_MODE == "incremental" else None
+    for t in range(first_generation, last_generation + 1):
+        population, _ = ga.evolve_generation(population, egg, t, population_size, population_size, ranking, evaluator,
+                                             config=config)
+
+    return population
+
+def run_islands(egg=None, generations=None, island_num=None, population_size=None, migration_interval=None,
+                migration_size=None, topology=None, seed=None, workers=None, config=None):
+    """
+        Run the island model and return the fronts of all final island populations combined
+        The arguments left None come from config (a RunConfig, Config when None), which the islands run with
+        workers defaults to one process per island
+    """
+    resolved = resolve_config(config)
+    if generations is None:
+        generations = resolved.NUM_OF_GENERATIONS
+    if island_num is None:
+        island_num = resolved.ISLAND_NUM
+    if population_size is None:
+        population_size = resolved.ISLAND_POPULATION_SIZE
+    if migration_interval is None:
+        migration_interval = resolved.MIGRATION_INTERVAL
+    if migration_size is None:
+        migration_size = resolved.MIGRATION_SIZE
+    if topology is None:
+        topology = resolved.MIGRATION_TOPOLOGY
+    if seed is None:
+        seed = resolved.ISLAND_SEED
+    if egg is None:
+        egg = Egg()
+
+    populations = [None] * island_num
+    immigrants = [None] * island_num
+    epoch_starts = range(1, generations + 1, migration_interval) or [1]
+
+    with ProcessPoolExecutor(max_workers=workers or island_num, initializer=_init_worker, initargs=(egg,)) as executor:
+        for epoch, first_generation in enumerate(epoch_starts):
+            last_generation = min(first_generation + migration_interval - 1, generations)
+            futures = [executor.submit(run_island_epoch, populations[island], immigrants[island],
+                                       first_generation, last_generation, population_size,
+                                       np.random.SeedSequence([seed, island, epoch]), config)
+                       for island in range(island_num)]
+            populations = [future.result() for future in futures]
+
+            if last_generation < generations:
+                immigrants = migrate(populations, migration_size, topology)
+
+    return evaluate_population(join_populations(populations), egg, generations, config=config)
+
+def main():
+    start = time.perf_counter()
+    fronts = run_islands()
+    print(f"{Config.ISLAND_NUM} islands, {Config.NUM_OF_GENERATIONS} generations: {time.perf_counter() - start:.1f}s, "
+          f"{len(fronts[0])} individuals in the combined first front")
+
+    from Visuals import plot_fronts
+    plot_fronts(fronts)
+
+if __name__ == "__main__":
+    main()
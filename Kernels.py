@@ -0,0 +1,140 @@
+"""
+    Kernel backends for the inner loops that do not map cleanly onto NumPy
+
+    A backend provides the same four kernels:
+        any_dominates(points, candidates)       the dominance test of the front-peeling loops
+        is_dominated(point, candidates)         the same test for a single point, as ENS-BS runs it
+        crowding_distances(...)                 crowding-distance accumulation over all fronts
+        mutate_values(values, draws, ...)       the per-individual branching of the mutation
+    "numpy" is always there. "numba" (NumbaKernels.py) compiles the same loops with numba.njit,
+    cached on disk, so only the first run after a change pays for the compilation. Every
+    backend returns exactly the values of the numpy one, and the random draws stay outside
+    the kernels, so runs do not depend on the backend.
+
+    Config.KERNEL_BACKEND is "numpy" by default: importing numba costs every process (each
+    sweep or pool worker too) about 0.7s, which only pays off for large populations (ENS-BS
+    sorting of 10000 individuals runs 10x faster). Runs of that size opt in with "numba", or
+    "auto" to fall back to numpy where numba is not installed. numba is only imported once
+    a kernel is first needed.
+"""
+
+import importlib.util
+from collections import namedtuple
+
+import numpy as np
+
+import Config
+
+# Upper bound for the (block x n x m) comparison arrays of any_dominates
+DOMINATION_BLOCK_ELEMENTS = 4_000_000
+
+KernelBackend = namedtuple("KernelBackend", ("name", "any_dominates", "is_dominated", "crowding_distances", "mutate_values"))
+
+
+def any_dominates(points, candidates):
+    """
+        For every row of points, whether at least one candidate row dominates it (minimization)
+
+        O(n * c * m) time, n=# of points  c=# of candidates  m=# of objectives
+    """
+    dominated = np.zeros(len(points), dtype=bool)
+    if len(points) == 0 or len(candidates) == 0:
+        return dominated
+
+    block = max(1, DOMINATION_BLOCK_ELEMENTS // (len(points) * points.shape[1]))
+    for start in range(0, len(candidates), block):
+        rows = candidates[start: start + block][:, None, :]
+        dominated |= np.any(np.all(rows <= points[None, :, :], axis=2) & np.any(rows < points[None, :, :], axis=2), axis=0)
+
+    return dominated
+
+def is_dominated(point, candidates):
+    """ Whether at least one candidate row dominates point (minimization), O(c * m) time """
+    return np.any(np.all(candidates <= point, axis=1) & np.any(candidates != point, axis=1))
+
+def crowding_distances(objectives, fronts, obj_mins, obj_maxes, crowding_distance):
+    """
+        Crowding distances of the fronts (row indexes into objectives), written into crowding_distance
+        Returns the fronts reordered the way the per-front list sorts leave them
+
+        Per objective, one stable lexsort over all fronts keyed on (front, objective) stands in
+        for sorting every front on its own. Fronts of less than 3 keep their order and get
+        infinite distances, the others get infinite distances at their boundaries.
+    """
+    if len(fronts) == 0:
+        return []
+
+    sizes = np.array([len(front) for front in fronts])
+    order = np.concatenate(fronts)
+    front_ids = np.repeat(np.arange(len(fronts)), sizes)
+    is_small = np.repeat(sizes < 3, sizes)
+
+    starts = np.cumsum(sizes) - sizes
+    ends = starts + sizes - 1
+    large_starts, large_ends = starts[sizes >= 3], ends[sizes >= 3]
+    is_interior = ~is_small
+    is_interior[large_starts] = False
+    is_interior[large_ends] = False
+    interior = np.flatnonzero(is_interior)
+
+    crowding_distance[order[is_small]] = float('inf')
+    crowding_distance[order[~is_small]] = 0.0
+
+    for i in range(objectives.shape[1]):
+        # Stable sort on top of the previous order, as list.sort does
+        keys = np.where(is_small, 0.0, objectives[order, i])
+        order = order[np.lexsort((keys, front_ids))]
+
+        crowding_distance[order[large_starts]] = float('inf')
+        crowding_distance[order[large_ends]] = float('inf')
+
+        if obj_maxes[i] != obj_mins[i]:
+            values = objectives[order, i]
+            crowding_distance[order[interior]] += (values[interior + 1] - values[interior - 1]) / (obj_maxes[i] - obj_mins[i])
+
+    return np.split(order, np.cumsum(sizes)[:-1])
+
+def mutate_values(values, draws, r, min_val, max_val, delta, mutation_rate):
+    """ Variation.mutate_value over arrays, draws and r are its two uniform draws for every value """
+    return np.where(draws < mutation_rate, np.clip(values + delta * (r - 0.5), min_val, max_val), values)
+
+NUMPY_KERNELS = KernelBackend("numpy", any_dominates, is_dominated, crowding_distances, mutate_values)
+
+# ==================================================================================================================================
+
+def load_numba_kernels():
+    import NumbaKernels
+    return KernelBackend("numba", NumbaKernels.any_dominates, NumbaKernels.is_dominated, NumbaKernels.crowding_distances,
+                         NumbaKernels.mutate_values)
+
+KERNEL_BACKENDS = {
+    "numpy": lambda: NUMPY_KERNELS,
+    "numba": load_numba_kernels,
+}
+
+# Backends loaded so far, by name
+_loaded = {}
+
+def register_kernel_backend(name, loader):
+    """ loader() returns a KernelBackend, it is called once, when the backend is first used """
+    KERNEL_BACKENDS[name] = loader
+    _loaded.pop(name, None)
+
+def is_numba_available():
+    # find_spec does not import numba, which takes a while
+    return importlib.util.find_spec("numba") is not None
+
+def get_kernels(name=None):
+    """ The backend configured by Config.KERNEL_BACKEND ("auto" picks numba when installed) """
+    if name is None:
+        name = Config.KERNEL_BACKEND
+
+    if name == "auto":
+        name = "numba" if is_numba_available() else "numpy"
+    if name not in KERNEL_BACKENDS:
+        raise ValueError(f"Unknown kernel backend: {name}")
+
+    if name not in _loaded:
+        _loaded[name] = KERNEL_BACKENDS[name]()
+
+    return _loaded[name]
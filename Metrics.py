@@ -0,0 +1,341 @@
+"""
+    Quality metrics of a front and convergence-based early stopping
+
+    Every metric takes an (n, m) objective matrix. Objectives are turned into minimization
+    first, as the sorting engines do, so the reference point of the hypervolume is the
+    worst corner: the origin for this problem's maximized objectives.
+
+    FrontQuality computes them on front 0 every generation, reusing the previous values
+    while front 0 does not change. The 2-objective hypervolume is updated incrementally
+    (Hypervolume2D), by the rectangles of the points that left or joined front 0. Spread and
+    IGD are recomputed whenever front 0 changes: one new point moves the gaps around it and
+    the nearest distances of any reference point, and their cost is that of the sort and of
+    the distance matrix anyway. Above 2 objectives the hypervolume has no cheap exact update
+    and is recomputed as well. HypervolumeStop ends a run once the hypervolume stops
+    improving.
+
+    IGD needs a reference front, Config.IGD_REFERENCE_FRONT, a text file of objective vectors.
+"""
+
+import bisect
+
+import numpy as np
+
+import Config
+import Sorting
+from Population import get_column
+from RunConfig import resolve_config
+
+# Exact hypervolume when n ** (m - 2) 2-D sweeps are at most this many, Monte-Carlo above
+HYPERVOLUME_EXACT_WORK = 10_000
+HYPERVOLUME_SAMPLES = 200_000
+# Upper bound for the (samples or targets x points) matrices built at once
+BLOCK_ELEMENTS = 4_000_000
+
+
+def reference_point(objective_num, reference=None):
+    """ Reference point in objective space, Config.HYPERVOLUME_REFERENCE or the origin """
+    if reference is None:
+        reference = Config.HYPERVOLUME_REFERENCE
+    if reference is None:
+        reference = [0.0] * objective_num
+
+    return np.asarray(reference, dtype=float)
+
+def hypervolume_2d(points, reference):
+    """
+        Area dominated by minimization points and bounded by reference
+        Sweep over the points sorted by the first objective, keeping the best second one so far
+
+        O(n log n) time
+    """
+    points = points[np.all(points < reference, axis=1)]
+    if len(points) == 0:
+        return 0.0
+
+    points = points[np.lexsort((points[:, 1], points[:, 0]))]
+    best_y = np.minimum.accumulate(points[:, 1])
+    widths = np.diff(np.append(points[:, 0], reference[0]))
+    return float(np.sum(widths * (reference[1] - best_y)))
+
+def exact_hypervolume(points, reference):
+    """
+        Hypervolume by slicing along the last objective, every slab is the (m-1)-objective
+        hypervolume of the points below it
+
+        O(n^(m-2) * n log n) time
+    """
+    points = points[np.all(points < reference, axis=1)]
+    if len(points) == 0:
+        return 0.0
+    if points.shape[1] == 1:
+        return float(reference[0] - points[:, 0].min())
+    if points.shape[1] == 2:
+        return hypervolume_2d(points, reference)
+
+    points = points[np.argsort(points[:, -1], kind='stable')]
+    heights = np.diff(np.append(points[:, -1], reference[-1]))
+    volume = 0.0
+    for i in np.flatnonzero(heights > 0):
+        volume += heights[i] * exact_hypervolume(points[:i + 1, :-1], reference[:-1])
+
+    return volume
+
+def monte_carlo_hypervolume(points, reference, samples=HYPERVOLUME_SAMPLES, seed=0):
+    """ Fraction of uniform samples of the box [ideal point, reference] that some point dominates, times its volume """
+    points = points[np.all(points < reference, axis=1)]
+    if len(points) == 0:
+        return 0.0
+
+    ideal = points.min(axis=0)
+    generator = np.random.default_rng(seed)
+    block = max(1, BLOCK_ELEMENTS // len(points))
+
+    dominated = 0
+    for start in range(0, samples, block):
+        sample = ideal + generator.random((min(block, samples - start), points.shape[1])) * (reference - ideal)
+        is_dominated = np.ones((len(sample), len(points)), dtype=bool)
+        for i in range(points.shape[1]):
+            is_dominated &= points[:, i][None, :] <= sample[:, i][:, None]
+        dominated += int(is_dominated.any(axis=1).sum())
+
+    return float(np.prod(reference - ideal) * dominated / samples)
+
+def hypervolume(objectives, reference=None, is_minimization=None):
+    """
+        Hypervolume of an objective matrix, exact for 2 objectives and for small fronts,
+        Monte-Carlo estimated otherwise (see HYPERVOLUME_EXACT_WORK)
+    """
+    objectives = np.asarray(objectives, dtype=float)
+    points = Sorting.to_minimization(objectives, is_minimization)
+    reference = Sorting.to_minimization(reference_point(objectives.shape[1], reference)[None, :], is_minimization)[0]
+
+    if points.shape[1] <= 2 or len(points) ** (points.shape[1] - 2) <= HYPERVOLUME_EXACT_WORK:
+        return exact_hypervolume(points, reference)
+
+    return monte_carlo_hypervolume(points, reference)
+
+def spread(objectives):
+    """
+        Deb's spread (delta) of a front with its own extremes as the boundary, 0 for evenly spaced points
+        Consecutive distances along the first objective for 2 objectives, nearest neighbour distances above
+    """
+    objectives = np.asarray(objectives, dtype=float)
+    if len(objectives) < 3:
+        return 0.0
+
+    if objectives.shape[1] == 2:
+        ordered = objectives[np.lexsort((objectives[:, 1], objectives[:, 0]))]
+        distances = np.linalg.norm(np.diff(ordered, axis=0), axis=1)
+    else:
+        distances = nearest_distances(objectives, objectives, exclude_self=True)
+
+    mean = distances.mean()
+    if mean == 0:
+        return 0.0
+
+    return float(np.abs(distances - mean).sum() / (len(distances) * mean))
+
+def nearest_distances(points, targets, exclude_self=False):
+    """ For every target, the Euclidean distance to its nearest point """
+    block = max(1, BLOCK_ELEMENTS // max(len(points), 1))
+    nearest = np.empty(len(targets))
+    for start in range(0, len(targets), block):
+        squared = ((targets[start: start + block, None, :] - points[None, :, :]) ** 2).sum(axis=2)
+        if exclude_self:
+            rows = np.arange(squared.shape[0])
+            squared[rows, start + rows] = np.inf
+        nearest[start: start + block] = squared.min(axis=1)
+
+    return np.sqrt(nearest)
+
+def igd(objectives, reference_front):
+    """ Inverted generational distance: mean distance from every reference front point to the nearest front point """
+    objectives = np.asarray(objectives, dtype=float)
+    reference_front = np.asarray(reference_front, dtype=float)
+    if len(objectives) == 0:
+        return float("inf")
+
+    return float(nearest_distances(objectives, reference_front).mean())
+
+def load_reference_front(path):
+    """ Reference front for igd, one objective vector per line of a text file (np.loadtxt) """
+    return np.loadtxt(path, dtype=float, ndmin=2)
+
+# ==================================================================================================================================
+
+class Hypervolume2D:
+    """
+        Hypervolume of a set of mutually non-dominated minimization points, kept up to date as points leave and join
+
+        The points are kept sorted by the first objective, the second one then decreases. A point
+        adds the rectangle from itself to its right neighbour's first objective and its left
+        neighbour's second one, so removing or inserting it changes the volume by that rectangle.
+
+        O(k log n + k n) time for k points changed (the list insertions), against O(n log n) for a
+        full sweep. When more points change than stay, the sweep is cheaper and runs instead, which
+        also keeps the rounding of the running sum from building up.
+    """
+    def __init__(self, reference):
+        self.reference = np.asarray(reference, dtype=float)
+        self.xs = []
+        self.ys = []
+        self.volume = 0.0
+
+    def contribution(self, i):
+        right_x = self.xs[i + 1] if i + 1 < len(self.xs) else self.reference[0]
+        left_y = self.ys[i - 1] if i > 0 else self.reference[1]
+        return (right_x - self.xs[i]) * (left_y - self.ys[i])
+
+    def reset(self, points, volume=None):
+        """ Start over from points, with their volume when it is known """
+        points = self.inside(points)
+        self.xs, self.ys = points[:, 0].tolist(), points[:, 1].tolist()
+        self.volume = volume if volume is not None else hypervolume_2d(points, self.reference)
+
+    def inside(self, points):
+        """ The distinct points strictly inside the reference box, sorted, the only ones adding volume """
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        return np.unique(points[np.all(points < self.reference, axis=1)], axis=0)
+
+    def update(self, points):
+        """ Move to a new non-dominated set, returns its hypervolume """
+        current = set(zip(self.xs, self.ys))
+        new = set(map(tuple, self.inside(points).tolist()))
+        removed, added = sorted(current - new), sorted(new - current)
+        if len(removed) + len(added) > len(current & new):
+            self.reset(np.array(sorted(new), dtype=float).reshape(-1, 2))
+            return self.volume
+
+        for x, _ in removed:
+            i = bisect.bisect_left(self.xs, x)
+            self.volume -= self.contribution(i)
+            del self.xs[i], self.ys[i]
+        for x, y in added:
+            i = bisect.bisect_left(self.xs, x)
+            self.xs.insert(i, x)
+            self.ys.insert(i, y)
+            self.volume += self.contribution(i)
+
+        return self.volume
+
+class FrontQuality:
+    """
+        Hypervolume, spread and (given a reference front) IGD of front 0, generation by generation
+        A front 0 equal to the previous one keeps the previous values, see the module docstring
+        for what is updated incrementally
+    """
+    def __init__(self, reference=None, reference_front=None, is_minimization=None):
+        self.reference = reference
+        self.reference_front = reference_front
+        self.is_minimization = is_minimization
+        self.records = []
+        self.objectives = None
+        self.hypervolume_2d = None
+
+    def minimization_reference(self, objective_num):
+        return Sorting.to_minimization(reference_point(objective_num, self.reference)[None, :], self.is_minimization)[0]
+
+    def front_hypervolume(self, objectives):
+        if objectives.shape[1] != 2:
+            return hypervolume(objectives, self.reference, self.is_minimization)
+
+        points = Sorting.to_minimization(objectives, self.is_minimization)
+        if self.hypervolume_2d is None:
+            self.hypervolume_2d = Hypervolume2D(self.minimization_reference(2))
+            self.hypervolume_2d.reset(points)
+            return self.hypervolume_2d.volume
+
+        return self.hypervolume_2d.update(points)
+
+    def update(self, t, front):
+        objectives = np.asarray(get_column(front, "objectives"), dtype=float).reshape(len(front), -1)
+        if self.records and self.objectives is not None and np.array_equal(objectives, self.objectives):
+            record = dict(self.records[-1], generation=t)
+        else:
+            record = {"generation": t,
+                      "hypervolume": float(self.front_hypervolume(objectives)),
+                      "spread": spread(objectives)}
+            if self.reference_front is not None:
+                record["igd"] = igd(objectives, self.reference_front)
+
+        self.objectives = objectives
+        self.records.append(record)
+        return record
+
+    def state(self):
+        """ (records, objectives of the last front 0), all a checkpoint needs to continue the tracking """
+        return self.records, self.objectives
+
+    def restore(self, records, objectives):
+        self.records = [dict(record) for record in records]
+        self.objectives = objectives
+        self.hypervolume_2d = None
+        if objectives is not None and objectives.shape[1] == 2 and self.records:
+            # The running sum goes on from the recorded volume, as it would have without the checkpoint
+            self.hypervolume_2d = Hypervolume2D(self.minimization_reference(2))
+            self.hypervolume_2d.reset(Sorting.to_minimization(objectives, self.is_minimization), self.records[-1]["hypervolume"])
+
+    @property
+    def hypervolumes(self):
+        return [record["hypervolume"] for record in self.records]
+
+class HypervolumeStop:
+    """
+        Early stopping on the hypervolume of front 0
+        The run stops after at least min_generations once the best hypervolume of the last
+        `window` generations is less than epsilon (relative) above the best one before them
+        With epsilon None the rule only tracks the front quality and never stops
+    """
+    def __init__(self, epsilon=None, window=None, min_generations=None, quality=None, config=None):
+        config = resolve_config(config)
+        self.epsilon = epsilon if epsilon is not None else config.STOP_EPSILON
+        self.window = window if window is not None else config.STOP_WINDOW
+        self.min_generations = min_generations if min_generations is not None else config.STOP_MIN_GENERATIONS
+        self.quality = quality if quality is not None else FrontQuality()
+        self.reason = None
+        self.generation = None
+
+    def __call__(self, t, P_t, fronts):
+        """ The reason to stop after generation t, None to go on """
+        self.quality.update(t, fronts[0])
+        hypervolumes = self.quality.hypervolumes
+        if self.epsilon is None or t < self.min_generations or len(hypervolumes) <= self.window:
+            return None
+
+        before = max(hypervolumes[:-self.window])
+        recent = max(hypervolumes[-self.window:])
+        improvement = (recent - before) / abs(before) if before != 0 else recent - before
+        if improvement >= self.epsilon:
+            return None
+
+        self.generation = t
+        self.reason = (f"hypervolume improved by {improvement:.2e} (< {self.epsilon:.0e}) "
+                       f"over the last {self.window} generations, stopped after generation {t}")
+        return self.reason
+
+def create_front_quality(config=None):
+    """ FrontQuality with the hypervolume reference point and the IGD reference front of config """
+    config = resolve_config(config)
+    reference_front = load_reference_front(config.IGD_REFERENCE_FRONT) if config.IGD_REFERENCE_FRONT is not None else None
+    return FrontQuality(config.HYPERVOLUME_REFERENCE, reference_front, config.IS_MINIMIZATION_OBJECTIVE)
+
+def create_stopping_rule(config=None, checkpoint=None):
+    """
+        HypervolumeStop as configured, None when neither config.STOP_EPSILON nor config.IGD_REFERENCE_FRONT is set
+        With IGD_REFERENCE_FRONT only, the rule tracks the front quality without stopping
+        Resuming from a checkpoint (Checkpoint.load_checkpoint), the rule continues with its front quality records
+    """
+    config = resolve_config(config)
+    if config.STOP_EPSILON is None and config.IGD_REFERENCE_FRONT is None:
+        return None
+
+    stopping = HypervolumeStop(quality=create_front_quality(config), config=config)
+    if checkpoint is not None and checkpoint.quality is not None:
+        stopping.quality.restore(*checkpoint.quality)
+        # ga.main writes the checkpoint of generation t before the rule sees generation t
+        records = stopping.quality.records
+        if not records or records[-1]["generation"] < checkpoint.generation:
+            stopping.quality.update(checkpoint.generation, checkpoint.fronts[0])
+
+    return stopping
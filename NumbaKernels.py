@@ -0,0 +1,111 @@
+"""
+    The "numba" kernel backend, see Kernels.py
+
+    The loops are compiled on their first call and cached on disk (cache=True), later runs
+    load the machine code instead of compiling again. Every kernel returns exactly what the
+    numpy one in Kernels.py does: the same comparisons, stable sorts and float operations in
+    the same order. Importing this module requires numba.
+"""
+
+import numba
+import numpy as np
+
+
+@numba.njit(cache=True)
+def _any_dominates(points, candidates):
+    dominated = np.zeros(len(points), dtype=np.bool_)
+    for a in range(len(points)):
+        for b in range(len(candidates)):
+            no_worse, better = True, False
+            for i in range(points.shape[1]):
+                if not candidates[b, i] <= points[a, i]:
+                    no_worse = False
+                    break
+                if candidates[b, i] < points[a, i]:
+                    better = True
+            if no_worse and better:
+                dominated[a] = True
+                break
+
+    return dominated
+
+def any_dominates(points, candidates):
+    """ Kernels.any_dominates, stopping at the first dominating candidate of every point """
+    return _any_dominates(np.ascontiguousarray(points, dtype=np.float64),
+                          np.ascontiguousarray(candidates, dtype=np.float64))
+
+@numba.njit(cache=True)
+def _is_dominated(point, candidates):
+    for b in range(len(candidates)):
+        no_worse, better = True, False
+        for i in range(len(point)):
+            if not candidates[b, i] <= point[i]:
+                no_worse = False
+                break
+            if candidates[b, i] < point[i]:
+                better = True
+        if no_worse and better:
+            return True
+
+    return False
+
+def is_dominated(point, candidates):
+    """ Kernels.is_dominated, stopping at the first dominating candidate """
+    return _is_dominated(point, candidates)
+
+@numba.njit(cache=True)
+def _crowding_distances(objectives, order, sizes, objective_num, obj_mins, obj_maxes, crowding_distance):
+    start = 0
+    for size in sizes:
+        front = order[start: start + size]
+        start += size
+
+        if size < 3:
+            for j in range(size):
+                crowding_distance[front[j]] = np.inf
+            continue
+
+        for j in range(size):
+            crowding_distance[front[j]] = 0.0
+
+        values = np.empty(size)
+        for i in range(objective_num):
+            # Stable sort on top of the previous order, written back into order
+            for j in range(size):
+                values[j] = objectives[front[j], i]
+            front[:] = front[np.argsort(values, kind='mergesort')]
+
+            crowding_distance[front[0]] = np.inf
+            crowding_distance[front[size - 1]] = np.inf
+
+            if obj_maxes[i] != obj_mins[i]:
+                scale = obj_maxes[i] - obj_mins[i]
+                for j in range(1, size - 1):
+                    crowding_distance[front[j]] += (objectives[front[j + 1], i] - objectives[front[j - 1], i]) / scale
+
+def crowding_distances(objectives, fronts, obj_mins, obj_maxes, crowding_distance):
+    """ Kernels.crowding_distances, every front sorted on its own """
+    if len(fronts) == 0:
+        return []
+
+    sizes = np.array([len(front) for front in fronts], dtype=np.int64)
+    order = np.concatenate(fronts).astype(np.int64)
+    objectives = np.ascontiguousarray(objectives, dtype=np.float64)
+    _crowding_distances(objectives, order, sizes, objectives.shape[1],
+                        np.asarray(obj_mins, dtype=np.float64), np.asarray(obj_maxes, dtype=np.float64), crowding_distance)
+
+    return np.split(order, np.cumsum(sizes)[:-1])
+
+@numba.njit(cache=True)
+def _mutate_values(values, draws, r, min_val, max_val, delta, mutation_rate):
+    mutated = values.copy()
+    for j in range(len(values)):
+        if draws[j] < mutation_rate:
+            mutated[j] = min(max(values[j] + delta * (r[j] - 0.5), min_val), max_val)
+
+    return mutated
+
+def mutate_values(values, draws, r, min_val, max_val, delta, mutation_rate):
+    """ Kernels.mutate_values, one branch per value """
+    return _mutate_values(np.asarray(values, dtype=np.float64), draws, r, float(min_val), float(max_val), float(delta),
+                          float(mutation_rate))
@@ -0,0 +1,202 @@
+"""
+    Pluggable objective functions and the evaluators running them
+
+    An ObjectiveFunction maps a Population of genomes to their unpenalized objectives
+    against an Egg. Evaluators split the rows that need evaluation into fixed-size chunks
+    and run them either in this process or in a pool of worker processes. Every chunk
+    gets its own RNG, seeded from (seed, batch, chunk), so the results do not depend on
+    the number of workers or on which worker ran which chunk. Rows of a genotype evaluated
+    before in the run take its objectives from the evaluator's GenotypeIndex instead.
+
+    submit() evaluates one small Population as a single chunk and returns a Future, for
+    the steady-state loop (SteadyState.py) that keeps several evaluations in flight.
+"""
+
+import os
+from concurrent.futures import Future, ProcessPoolExecutor
+
+import numpy as np
+
+import Config
+from Genotype import create_genotype_index, set_raw_objectives, stale_rows
+from Population import Population
+from RunConfig import resolve_config
+
+
+class ObjectiveFunction:
+    """
+        Raw objective functions f(x), before the dynamic penalty
+
+        evaluate() returns an (n, OBJECTIVE_NUM) array for the n rows of population.
+        Stochastic models must draw from rng only, to stay reproducible.
+    """
+    def evaluate(self, population, egg, rng):
+        raise NotImplementedError
+
+class SpermObjectives(ObjectiveFunction):
+    """ The genetic compatibility and biological quality formulas of Sperm """
+    def evaluate(self, population, egg, rng):
+        return np.column_stack((population.genetic_compatibility(egg), population.biological_quality()))
+
+OBJECTIVE_FUNCTIONS = {
+    "sperm": SpermObjectives,
+}
+
+def register_objective_function(name, objective_class):
+    OBJECTIVE_FUNCTIONS[name] = objective_class
+
+def get_objective_function(name=None):
+    if name is None:
+        name = Config.OBJECTIVE_FUNCTION
+
+    if name not in OBJECTIVE_FUNCTIONS:
+        raise ValueError(f"Unknown objective function: {name}")
+
+    return OBJECTIVE_FUNCTIONS[name]()
+
+# ==================================================================================================================================
+
+def evaluate_chunk(objective, egg, rows, seed):
+    return np.asarray(objective.evaluate(rows, egg, np.random.default_rng(seed)), dtype=float)
+
+# The Egg and objective function of a worker process, sent once by the pool initializer
+_worker_egg = None
+_worker_objective = None
+
+def _init_worker(egg, objective):
+    global _worker_egg, _worker_objective
+    _worker_egg = egg
+    _worker_objective = objective
+
+def _evaluate_worker_chunk(task):
+    rows, seed = task
+    return evaluate_chunk(_worker_objective, _worker_egg, rows, seed)
+
+
+class Evaluator:
+    """
+        Evaluates the raw objectives of the rows flagged with needs_evaluation
+        Subclasses only decide where the chunks run, see map_chunks
+    """
+    def __init__(self, egg, objective=None, chunk_size=None, seed=None, config=None):
+        config = resolve_config(config)
+        self.egg = egg
+        self.objective = objective if objective is not None else get_objective_function(config.OBJECTIVE_FUNCTION)
+        self.chunk_size = chunk_size if chunk_size is not None else config.EVALUATION_CHUNK_SIZE
+        self.seed = seed if seed is not None else config.EVALUATION_SEED
+
+        # Raw objectives of the genotypes evaluated so far, see Config.GENOTYPE_CACHE
+        self.genotypes = create_genotype_index(config)
+
+        # Number of evaluate() calls so far, part of every chunk seed
+        self.batch = 0
+
+    def map_chunks(self, tasks):
+        """ Results of the (rows, seed) tasks, in task order """
+        raise NotImplementedError
+
+    def chunk_tasks(self, population):
+        """ The (rows, seed) tasks of one batch """
+        tasks = []
+        for chunk, start in enumerate(range(0, len(population), self.chunk_size)):
+            seed = np.random.SeedSequence([self.seed, self.batch, chunk])
+            tasks.append((population.take(slice(start, start + self.chunk_size)), seed))
+        self.batch += 1
+
+        return tasks
+
+    def evaluate(self, population):
+        """ Raw objectives of every row of a Population, as an (n, m) array """
+        tasks = self.chunk_tasks(population)
+        if len(tasks) == 0:
+            return np.zeros((0, population.objectives.shape[1]))
+
+        return np.concatenate(list(self.map_chunks(tasks)))
+
+    def submit(self, population):
+        """
+            Future of the raw objectives of a (small) Population, evaluated as a single chunk
+            Evaluated right away here, ProcessPoolEvaluator returns before the result is ready
+        """
+        future = Future()
+        future.set_result(evaluate_chunk(self.objective, self.egg, population, self.next_seed()))
+        return future
+
+    def next_seed(self):
+        seed = np.random.SeedSequence([self.seed, self.batch, 0])
+        self.batch += 1
+        return seed
+
+    def evaluate_raw_objectives(self, population):
+        """
+            Fill in raw_objectives of the stale rows of a Population or list of Sperm
+            With a genotype index, known genotypes are reused and duplicates evaluated once
+            Returns the number of rows evaluated
+        """
+        if self.genotypes is not None:
+            return self.genotypes.evaluate(population, self.evaluate_rows)
+
+        stale = stale_rows(population)
+        if len(stale) > 0:
+            self.evaluate_rows(population, stale)
+
+        return len(stale)
+
+    def evaluate_rows(self, population, rows):
+        if isinstance(population, Population):
+            set_raw_objectives(population, rows, self.evaluate(population.take(rows)))
+        else:
+            set_raw_objectives(population, rows, self.evaluate(Population.from_sperms([population[i] for i in rows])))
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class SerialEvaluator(Evaluator):
+    def map_chunks(self, tasks):
+        return [evaluate_chunk(self.objective, self.egg, rows, seed) for rows, seed in tasks]
+
+class ProcessPoolEvaluator(Evaluator):
+    """ Chunks run on a pool of worker processes, each receiving the Egg once when it starts """
+    def __init__(self, egg, objective=None, chunk_size=None, seed=None, workers=None, config=None):
+        super().__init__(egg, objective, chunk_size, seed, config)
+        self.workers = workers or resolve_config(config).EVALUATION_WORKERS or os.cpu_count()
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                            initargs=(self.egg, self.objective))
+
+    def map_chunks(self, tasks):
+        # executor.map yields in submission order whatever order the workers finish in
+        return self.executor.map(_evaluate_worker_chunk, tasks)
+
+    def submit(self, population):
+        return self.executor.submit(_evaluate_worker_chunk, (population, self.next_seed()))
+
+    def close(self):
+        self.executor.shutdown()
+
+def async_evaluator(egg, **options):
+    # asyncio and the socket client are only loaded by runs using the simulator
+    from AsyncEvaluation import AsyncEvaluator
+    return AsyncEvaluator(egg, **options)
+
+EVALUATORS = {
+    "serial": SerialEvaluator,
+    "processes": ProcessPoolEvaluator,
+    "async": async_evaluator,
+}
+
+def create_evaluator(egg, mode=None, config=None, **options):
+    """ Evaluator of config.EVALUATION_MODE, config (a RunConfig, Config when None) supplies the options not given """
+    config = resolve_config(config)
+    if mode is None:
+        mode = config.EVALUATION_MODE
+
+    if mode not in EVALUATORS:
+        raise ValueError(f"Unknown evaluation mode: {mode}")
+
+    return EVALUATORS[mode](egg, config=config, **options)
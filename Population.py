@@ -0,0 +1,314 @@
+"""
+    Structure-of-arrays population
+
+    A Population keeps every genome and state field of its individuals in one contiguous
+    NumPy column, so the NSGA-II stages can work on whole columns instead of walking
+    Sperm objects one attribute at a time. SpermView gives a Sperm-like window on a
+    single row for the code that still reads individuals one by one.
+"""
+
+import random
+
+import numpy as np
+
+from Config import *
+import Hla
+from RunConfig import resolve_config
+from Sperm import Sperm, penalty_parameters
+
+TOTAL_RESOURCES = 100
+
+FLOAT_COLUMNS = ("genetic_resources", "biological_resources", "dfi", "motility",
+                 "morphology", "velocity", "ph_tolerance", "crowding_distance")
+COLUMNS = FLOAT_COLUMNS + ("hla_mask", "objectives", "rank", "raw_objectives", "needs_evaluation")
+
+# Shared generator for the vectorized random draws
+rng = np.random.default_rng()
+
+
+def seed_generators(seed):
+    """ Seed random and the shared numpy generator, seed is an int or a np.random.SeedSequence """
+    global rng
+    if isinstance(seed, np.random.SeedSequence):
+        random.seed(int(seed.generate_state(1)[0]))
+    else:
+        random.seed(seed)
+    rng = np.random.default_rng(seed)
+
+def shared_generator():
+    """ The shared numpy generator, as last seeded by seed_generators """
+    return rng
+
+def generator_states():
+    """ States of random and the shared numpy generator, for set_generator_states """
+    return random.getstate(), rng.bit_generator.state
+
+def set_generator_states(states):
+    random_state, numpy_state = states
+    random.setstate(random_state)
+    rng.bit_generator.state = numpy_state
+
+def python_round(values, ndigits):
+    """
+        np.round returning exactly what round(value, ndigits) returns for every element
+        np.round scales by 10**ndigits first, which can move a value that sits right on
+        a rounding tie to the other side, so those few values are rounded by Python
+    """
+    values = np.asarray(values, dtype=float)
+    rounded = np.round(values, ndigits)
+
+    scaled = values * 10.0 ** ndigits
+    near_tie = np.flatnonzero(np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6)
+    for i in near_tie:
+        rounded.flat[i] = round(float(values.flat[i]), ndigits)
+
+    return rounded
+
+def apply_dynamic_penalty(raw_objectives, generation_number=0, C=None, alpha=None, beta=None, constraint=None):
+    """
+        Vectorized Sperm.apply_penalty over an (n, m) matrix of unpenalized objectives
+        Returns the penalized objectives, the values are identical
+    """
+    C, alpha, beta, constraint = penalty_parameters(C, alpha, beta, constraint)
+    genetic_compat = raw_objectives[:, 0]
+
+    g_violation = np.maximum(0.0, constraint - genetic_compat)
+    penalty = (C * (generation_number ** alpha)) * (g_violation ** beta)
+
+    objectives = raw_objectives.copy()
+    objectives[:, 0] = np.maximum(0.0, genetic_compat - penalty)
+    return objectives
+
+def get_column(population, name):
+    """ Column of a Population, or the same values gathered from a list of Sperm """
+    if isinstance(population, Population):
+        return getattr(population, name)
+
+    return np.array([getattr(individual, name) for individual in population])
+
+
+class Population:
+    def __init__(self, size=0, objective_num=None, config=None):
+        """ size unevaluated rows of zeros, objective_num defaults to config.OBJECTIVE_NUM """
+        if objective_num is None:
+            objective_num = resolve_config(config).OBJECTIVE_NUM
+
+        for name in FLOAT_COLUMNS:
+            setattr(self, name, np.zeros(size, dtype=float))
+        self.hla_mask = np.zeros(size, dtype=Hla.MASK_DTYPE)
+        self.objectives = np.zeros((size, objective_num), dtype=float)
+        self.rank = np.zeros(size, dtype=np.int64)
+
+        # Unpenalized objectives, valid until Variation changes the genome
+        self.raw_objectives = np.zeros((size, objective_num), dtype=float)
+        self.needs_evaluation = np.ones(size, dtype=bool)
+
+    @classmethod
+    def random(cls, size=None, generator=None, config=None):
+        """ Vectorized counterpart of creating `size` Sperm() individuals, size defaults to config.POPULATION_SIZE """
+        config = resolve_config(config)
+        if size is None:
+            size = config.POPULATION_SIZE
+        if generator is None:
+            generator = rng
+
+        population = cls(size, config=config)
+        population.genetic_resources[:] = generator.uniform(10, 90, size)
+        population.biological_resources[:] = TOTAL_RESOURCES - population.genetic_resources
+
+        # HLA profile size depends on genetic resources
+        max_hla = np.minimum(6, np.maximum(2, (population.genetic_resources / 15).astype(np.int64)))
+        hla_sizes = generator.integers(2, max_hla + 1)
+        population.hla_mask[:] = Hla.sample_masks(np.full(size, Hla.FULL_MASK), hla_sizes, generator)
+
+        # Biological parameters depend on biological resources
+        resource_factor = population.biological_resources / 100
+        population.dfi[:] = generator.uniform(0, 50, size) * (2 - resource_factor)
+        population.motility[:] = generator.uniform(30, 100, size) * resource_factor
+        population.morphology[:] = generator.uniform(10, 100, size) * resource_factor
+        population.velocity[:] = generator.uniform(10, 100, size) * resource_factor
+        population.ph_tolerance[:] = generator.uniform(6.5, 8.5, size)
+
+        return population
+
+    @classmethod
+    def from_sperms(cls, sperms):
+        population = cls(len(sperms))
+        for name in FLOAT_COLUMNS + ("rank",):
+            getattr(population, name)[:] = [getattr(sperm, name) for sperm in sperms]
+        population.hla_mask[:] = [sperm.hla_mask for sperm in sperms]
+        population.needs_evaluation[:] = [sperm.needs_evaluation for sperm in sperms]
+        if len(sperms) > 0:
+            population.objectives[:] = [sperm.objectives[:population.objectives.shape[1]] for sperm in sperms]
+            population.raw_objectives[:] = [sperm.raw_objectives[:population.objectives.shape[1]] for sperm in sperms]
+
+        return population
+
+    def to_sperms(self):
+        return [self.view(i).to_sperm() for i in range(len(self))]
+
+    def __len__(self):
+        return len(self.genetic_resources)
+
+    def view(self, index):
+        return SpermView(self, index)
+
+    def __getitem__(self, index):
+        if isinstance(index, (int, np.integer)):
+            return self.view(index)
+
+        return self.take(index)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.view(i)
+
+    def take(self, indexes):
+        """ New population holding copies of the given rows, in the given order """
+        if not isinstance(indexes, slice):
+            indexes = np.asarray(indexes, dtype=np.int64)
+
+        population = Population.__new__(Population)
+        for name in COLUMNS:
+            setattr(population, name, getattr(self, name)[indexes].copy())
+
+        return population
+
+    def copy(self):
+        return self.take(slice(None))
+
+    def rows(self, start, end):
+        """ Population sharing the columns of rows start:end, nothing is copied """
+        population = Population.__new__(Population)
+        for name in COLUMNS:
+            setattr(population, name, getattr(self, name)[start:end])
+
+        return population
+
+    @staticmethod
+    def concatenate(populations):
+        population = Population.__new__(Population)
+        for name in COLUMNS:
+            setattr(population, name, np.concatenate([getattr(part, name) for part in populations]))
+
+        return population
+
+    def __add__(self, other):
+        return Population.concatenate([self, other])
+
+    # ==============================================================================================================================
+
+    def evaluate_objectives(self, egg, generation_number=0, C=None, alpha=None, beta=None, constraint=None):
+        """ Column-wise Sperm.evaluate_objectives, the values are identical, returns the number of rows evaluated """
+        evaluated = self.evaluate_raw_objectives(egg)
+        self.objectives[:] = apply_dynamic_penalty(self.raw_objectives, generation_number, C, alpha, beta, constraint)
+
+        return evaluated
+
+    def evaluate_raw_objectives(self, egg):
+        """
+            Evaluate the objective functions of the rows whose genome changed
+            Returns the number of rows evaluated
+        """
+        stale = np.flatnonzero(self.needs_evaluation)
+        if len(stale) == 0:
+            return 0
+
+        changed = self if len(stale) == len(self) else self.take(stale)
+        self.raw_objectives[stale, 0] = changed.genetic_compatibility(egg)
+        self.raw_objectives[stale, 1] = changed.biological_quality()
+        self.needs_evaluation[stale] = False
+
+        return len(stale)
+
+    def genetic_compatibility(self, egg):
+        hla_match = egg.evaluator.hla_match_table[self.hla_mask]
+
+        resource_factor = self.genetic_resources / 100
+
+        ph_score = egg.evaluator.ph_scores(self.ph_tolerance)
+
+        score = (0.7 * hla_match + 0.3 * ph_score) * (0.3 + 0.7 * resource_factor)
+        return python_round(np.clip(score, 0, 1), 5)
+
+    def biological_quality(self):
+        resource_factor = self.biological_resources / 100
+
+        motility_norm = np.clip(self.motility / 100, 0, 1)
+        morphology_norm = np.clip(self.morphology / 100, 0, 1)
+        velocity_norm = np.clip(self.velocity / 100, 0, 1)
+        dfi_norm = np.clip(1 - self.dfi / 50, 0, 1)
+
+        base_score = (
+            0.3 * motility_norm +
+            0.25 * morphology_norm +
+            0.15 * velocity_norm +
+            0.3 * dfi_norm
+        )
+
+        score = base_score * (0.2 + 0.8 * resource_factor)
+        return python_round(np.clip(score, 0, 1), 5)
+
+
+def _column_property(name):
+    def getter(self):
+        return getattr(self.population, name)[self.index]
+
+    def setter(self, value):
+        getattr(self.population, name)[self.index] = value
+
+    return property(getter, setter)
+
+class SpermView:
+    """
+        Sperm-like access to one row of a Population
+        Reads and writes go straight to the population columns
+    """
+    total_resources = TOTAL_RESOURCES
+
+    def __init__(self, population, index):
+        self.population = population
+        self.index = index
+
+    @property
+    def objectives(self):
+        return self.population.objectives[self.index]
+
+    @objectives.setter
+    def objectives(self, values):
+        self.population.objectives[self.index] = values
+
+    @property
+    def raw_objectives(self):
+        return self.population.raw_objectives[self.index]
+
+    @raw_objectives.setter
+    def raw_objectives(self, values):
+        self.population.raw_objectives[self.index] = values
+
+    @property
+    def hla_profile(self):
+        return Hla.mask_to_profile(int(self.hla_mask))
+
+    @hla_profile.setter
+    def hla_profile(self, hla_profile):
+        self.hla_mask = Hla.profile_to_mask(hla_profile)
+
+    def to_sperm(self):
+        sperm = Sperm.__new__(Sperm)
+        sperm.total_resources = TOTAL_RESOURCES
+        for name in FLOAT_COLUMNS:
+            setattr(sperm, name, float(getattr(self, name)))
+        sperm.hla_mask = int(self.hla_mask)
+        sperm.objectives = self.objectives.tolist()
+        sperm.rank = int(self.rank)
+        sperm.raw_objectives = self.raw_objectives.tolist()
+        sperm.needs_evaluation = bool(self.needs_evaluation)
+
+        return sperm
+
+    def copy(self):
+        return self.to_sperm()
+
+for _name in FLOAT_COLUMNS + ("hla_mask", "rank", "needs_evaluation"):
+    setattr(SpermView, _name, _column_property(_name))
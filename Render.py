@@ -0,0 +1,236 @@
+"""
+    Offline rendering of the evolution and of large fronts
+
+    Everything draws on an Agg canvas of its own, no pyplot and no display are involved.
+    The saved populations are first reduced to per-frame arrays (extract_frames): the
+    objective points and colour column, downsampled to RENDER_MAX_POINTS, or a 2D
+    histogram once a frame holds more than RENDER_DENSITY_POINTS individuals. The axes,
+    labels and colorbar are drawn once, every frame then only redraws its points on top
+    of that background (blitting).
+
+    write_animation writes a GIF (Pillow) or an MP4 (ffmpeg on PATH), write_png_sequence
+    one PNG per frame, optionally on several processes. render_fronts is a plot_fronts
+    for any population size.
+"""
+
+import os
+import shutil
+import subprocess
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.colors import LogNorm, Normalize
+from matplotlib.figure import Figure
+
+from Population import get_column
+
+# Frames with more individuals are drawn as a random sample of this many points
+RENDER_MAX_POINTS = 20_000
+# Frames with more individuals are drawn as a 2D histogram of RENDER_BINS x RENDER_BINS cells
+RENDER_DENSITY_POINTS = 100_000
+RENDER_BINS = 200
+
+RENDER_FPS = 10
+RENDER_SIZE = (8, 8)
+RENDER_DPI = 100
+
+# Marker area for 100 points, smaller for more points down to 1
+MARKER_AREA = 80
+
+# data[k] is the (n, 2) objective points of frame k, or its (bins, bins) counts when density is True
+Frames = namedtuple("Frames", ("data", "colors", "labels", "density", "max_count"))
+
+
+def sample_rows(size, max_points, generator):
+    """ Sorted random subset of max_points row indexes, all of them for smaller sizes """
+    if size <= max_points:
+        return np.arange(size)
+
+    return np.sort(generator.choice(size, max_points, replace=False))
+
+def marker_area(points):
+    return float(np.clip(MARKER_AREA * 100 / max(points, 1), 1, MARKER_AREA))
+
+def extract_frames(populations, generation_numbers, color="genetic_resources", max_points=RENDER_MAX_POINTS,
+                   density_points=RENDER_DENSITY_POINTS, bins=RENDER_BINS, seed=0):
+    """
+        Per-frame arrays of the saved populations (lists of Sperm, snapshots or Populations)
+        Reading the individuals happens here once, the renderers only index arrays
+    """
+    generator = np.random.default_rng(seed)
+    density = any(len(population) > density_points for population in populations)
+
+    data, colors, max_count = [], [], 1
+    for population in populations:
+        points = np.asarray(get_column(population, "objectives"), dtype=float).reshape(len(population), -1)[:, :2]
+        if density:
+            counts, _, _ = np.histogram2d(points[:, 0], points[:, 1], bins=bins, range=[[0, 1], [0, 1]])
+            data.append(counts.T)
+            max_count = max(max_count, int(counts.max()))
+        else:
+            rows = sample_rows(len(points), max_points, generator)
+            data.append(points[rows])
+            colors.append(np.asarray(get_column(population, color), dtype=float)[rows])
+
+    labels = [f"Generation: {generation}" for generation in generation_numbers]
+    return Frames(data, None if density else colors, labels, density, max_count)
+
+def frames_subset(frames, indexes):
+    return Frames([frames.data[k] for k in indexes], None if frames.colors is None else [frames.colors[k] for k in indexes],
+                  [frames.labels[k] for k in indexes], frames.density, frames.max_count)
+
+# ==================================================================================================================================
+
+class FrameRenderer:
+    """
+        Draws frames of a Frames on one Agg figure
+        The static parts are rendered once and restored before every frame
+    """
+    def __init__(self, frames, size=RENDER_SIZE, dpi=RENDER_DPI):
+        self.frames = frames
+        self.figure = Figure(figsize=size, dpi=dpi)
+        self.canvas = FigureCanvasAgg(self.figure)
+        self.axes = self.figure.add_subplot()
+
+        axes = self.axes
+        axes.set_xlim(0, 1)
+        axes.set_ylim(0, 1)
+        axes.set_xlabel("Genetic Compatibility (Objective 1)", fontsize=14)
+        axes.set_ylabel("Biological Quality (Objective 2)", fontsize=14)
+        axes.set_title("Population Evolution in Objective Space", fontsize=16)
+        axes.grid(True, alpha=0.3)
+
+        if frames.density:
+            bins = frames.data[0].shape[0] if frames.data else RENDER_BINS
+            self.artist = axes.imshow(np.zeros((bins, bins)), extent=(0, 1, 0, 1), origin="lower", aspect="auto",
+                                      cmap="viridis", norm=LogNorm(1, frames.max_count), animated=True)
+            colorbar = self.figure.colorbar(self.artist, ax=axes)
+            colorbar.set_label("Individuals", fontsize=12)
+        else:
+            self.artist = axes.scatter(np.zeros(0), np.zeros(0), c=np.zeros(0), cmap="viridis",
+                                       norm=Normalize(10, 90), alpha=0.6, edgecolors="none", animated=True)
+            colorbar = self.figure.colorbar(self.artist, ax=axes)
+            colorbar.set_label("Genetic Resources", fontsize=12)
+
+        self.text = axes.text(0.02, 0.98, "", transform=axes.transAxes, fontsize=14, verticalalignment="top",
+                              bbox=dict(boxstyle="round", facecolor="white", alpha=0.8), animated=True)
+
+        # Animated artists are left out of draw(), the background holds everything else
+        self.canvas.draw()
+        self.background = self.canvas.copy_from_bbox(self.figure.bbox)
+
+    def render(self, k):
+        """ RGBA image of frame k, a view valid until the next render """
+        self.canvas.restore_region(self.background)
+
+        data = self.frames.data[k]
+        if self.frames.density:
+            self.artist.set_data(data)
+        else:
+            self.artist.set_offsets(data)
+            self.artist.set_array(self.frames.colors[k])
+            self.artist.set_sizes([marker_area(len(data))])
+        self.text.set_text(self.frames.labels[k])
+
+        self.axes.draw_artist(self.artist)
+        self.axes.draw_artist(self.text)
+        return np.asarray(self.canvas.buffer_rgba())
+
+def _write_png_chunk(frames, first_index, directory, size, dpi):
+    from matplotlib.image import imsave
+
+    renderer = FrameRenderer(frames, size, dpi)
+    paths = []
+    for k in range(len(frames.data)):
+        path = os.path.join(directory, f"frame_{first_index + k:05d}.png")
+        imsave(path, renderer.render(k))
+        paths.append(path)
+
+    return paths
+
+def write_png_sequence(frames, directory, processes=None, size=RENDER_SIZE, dpi=RENDER_DPI):
+    """ frame_00000.png, frame_00001.png... under directory, split over `processes` worker processes when given """
+    os.makedirs(directory, exist_ok=True)
+    if not processes or processes <= 1:
+        return _write_png_chunk(frames, 0, directory, size, dpi)
+
+    # One contiguous chunk per task, each worker sets its figure up once per chunk
+    chunks = [chunk for chunk in np.array_split(np.arange(len(frames.data)), processes) if len(chunk) > 0]
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        futures = [executor.submit(_write_png_chunk, frames_subset(frames, chunk.tolist()), int(chunk[0]), directory, size, dpi)
+                   for chunk in chunks]
+        return [path for future in futures for path in future.result()]
+
+def write_animation(frames, path, fps=RENDER_FPS, size=RENDER_SIZE, dpi=RENDER_DPI):
+    """ GIF or MP4 by the extension of path, MP4 needs ffmpeg """
+    renderer = FrameRenderer(frames, size, dpi)
+    extension = os.path.splitext(path)[1].lower()
+
+    if extension == ".gif":
+        from PIL import Image
+
+        images = [Image.fromarray(renderer.render(k)[:, :, :3].copy()) for k in range(len(frames.data))]
+        images[0].save(path, save_all=True, append_images=images[1:], duration=1000 / fps, loop=0)
+        return
+
+    if extension == ".mp4":
+        ffmpeg = shutil.which("ffmpeg")
+        if ffmpeg is None:
+            raise RuntimeError("Writing an MP4 needs ffmpeg on PATH, write a .gif or a PNG sequence instead")
+
+        height, width = renderer.render(0).shape[:2] if frames.data else (0, 0)
+        command = [ffmpeg, "-y", "-loglevel", "error", "-f", "rawvideo", "-pix_fmt", "rgba", "-s", f"{width}x{height}",
+                   "-r", str(fps), "-i", "-", "-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2", "-pix_fmt", "yuv420p", path]
+        with subprocess.Popen(command, stdin=subprocess.PIPE) as process:
+            for k in range(len(frames.data)):
+                process.stdin.write(renderer.render(k).tobytes())
+            process.stdin.close()
+        if process.returncode != 0:
+            raise RuntimeError(f"ffmpeg failed writing {path}")
+        return
+
+    raise ValueError(f"Unknown animation format: {extension}, expected .gif or .mp4")
+
+# ==================================================================================================================================
+
+def render_fronts(fronts, path, max_points=RENDER_MAX_POINTS, density_points=RENDER_DENSITY_POINTS,
+                  bins=RENDER_BINS, size=RENDER_SIZE, dpi=RENDER_DPI, seed=0):
+    """
+        plot_fronts written to path, one scatter call for all the fronts coloured by rank
+        Beyond density_points individuals the fronts become a 2D histogram with the first front drawn on top
+    """
+    points = [np.asarray(get_column(front, "objectives"), dtype=float).reshape(len(front), -1)[:, :2] for front in fronts]
+    ranks = np.repeat(np.arange(1, len(fronts) + 1), [len(front) for front in points])
+    points = np.concatenate(points) if points else np.zeros((0, 2))
+
+    figure = Figure(figsize=size, dpi=dpi)
+    FigureCanvasAgg(figure)
+    axes = figure.add_subplot()
+
+    if len(points) > density_points:
+        counts, _, _ = np.histogram2d(points[:, 0], points[:, 1], bins=bins, range=[[0, 1], [0, 1]])
+        image = axes.imshow(counts.T, extent=(0, 1, 0, 1), origin="lower", aspect="auto", cmap="viridis",
+                            norm=LogNorm(1, max(counts.max(), 1)))
+        figure.colorbar(image, ax=axes).set_label("Individuals", fontsize=12)
+
+        first = points[ranks == 1]
+        first = first[np.argsort(first[:, 0], kind="stable")]
+        axes.plot(first[:, 0], first[:, 1], color="red", linewidth=1.5, label="Front 1")
+        axes.legend(fontsize=12)
+    else:
+        rows = sample_rows(len(points), max_points, np.random.default_rng(seed))
+        scatter = axes.scatter(points[rows, 0], points[rows, 1], c=ranks[rows], cmap="nipy_spectral",
+                               s=marker_area(len(rows)), edgecolors="k" if len(rows) <= 1_000 else "none", linewidths=0.5)
+        figure.colorbar(scatter, ax=axes).set_label("Front", fontsize=12)
+
+    axes.set_xlabel("Genetic Compatibility (Objective 1)", fontsize=14)
+    axes.set_ylabel("Biological Quality (Objective 2)", fontsize=14)
+    axes.set_title(f"{len(fronts)} fronts, {len(points)} individuals", fontsize=14)
+    axes.grid(True)
+    axes.set_xlim(-0.05, 1.05)
+    axes.set_ylim(-0.05, 1.05)
+
+    figure.tight_layout()
+    figure.savefig(path)
@@ -0,0 +1,150 @@
+"""
+    Headless command-line run of ga
+
+    python Run.py --output results/ --generations 200 --set SORTING_ENGINE=ens --set VARIATION_MODE=batched
+
+    Flags override Config before any other module of the package is imported. Modules read
+    their defaults from Config when they are called (RunConfig.resolve_config), so they see the overrides.
+    Nothing is plotted unless --plot or --animation is given, matplotlib is not even imported.
+    The output directory receives:
+        result.npz        final population and fronts, a checkpoint (RESUME_FROM can continue it)
+        front.json        the archived non-dominated individuals (the final first front with Config.ARCHIVE off),
+                          genome and objectives of every individual
+        telemetry.jsonl   one record per generation, see Telemetry.py
+        fronts.png        with --plot, the final fronts
+        evolution.gif     with --animation gif (or .mp4 with mp4, frames/ with png), the saved generations
+"""
+
+import argparse
+import ast
+import json
+import os
+import time
+
+import Config
+
+
+def parse_override(text):
+    """ NAME=VALUE to (NAME, value), VALUE is a Python literal or else a plain string """
+    name, separator, value = text.partition("=")
+    if not separator:
+        raise argparse.ArgumentTypeError(f"Expected NAME=VALUE, got {text!r}")
+
+    try:
+        value = ast.literal_eval(value)
+    except (ValueError, SyntaxError):
+        pass
+
+    return name.strip(), value
+
+def apply_overrides(overrides):
+    for name, value in overrides:
+        if name.startswith("_") or not hasattr(Config, name):
+            raise ValueError(f"Unknown Config value: {name}")
+        setattr(Config, name, value)
+
+def read_egg(path):
+    """ Egg profile in the Batch.py format: {"hla_profile": [...], "ideal_ph_range": [7.2, 8.0]} """
+    from Egg import Egg
+
+    with open(path) as file:
+        profile = json.load(file)
+
+    return Egg(profile["hla_profile"], profile.get("ideal_ph_range", (7.2, 8.0)))
+
+def write_results(directory, result):
+    from Batch import individual_record
+    from Checkpoint import save_checkpoint
+
+    egg = result.egg
+    front = result.archive.individuals() if result.archive is not None else result.fronts[0]
+    save_checkpoint(os.path.join(directory, "result.npz"), egg, result.generation, result.population, result.fronts,
+                    result.evaluator)
+    with open(os.path.join(directory, "front.json"), "w") as file:
+        json.dump({"egg": {"hla_profile": list(egg.hla_profile), "ideal_ph_range": list(egg.ideal_ph_range)},
+                   "generation": result.generation,
+                   "stop_reason": result.stop_reason,
+                   "quality": result.quality,
+                   "source": "archive" if result.archive is not None else "front_0",
+                   "front": [individual_record(individual) for individual in front]}, file, indent=1)
+
+def plot_results(directory, fronts):
+    from Render import render_fronts
+
+    render_fronts(fronts, os.path.join(directory, "fronts.png"))
+
+def animate_results(directory, saved, animation_format, processes=None):
+    from Render import extract_frames, write_animation, write_png_sequence
+
+    frames = extract_frames(saved.populations, saved.generation_numbers)
+    if animation_format == "png":
+        write_png_sequence(frames, os.path.join(directory, "frames"), processes)
+    else:
+        write_animation(frames, os.path.join(directory, f"evolution.{animation_format}"))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run NSGA-II without a display, writing the results to files")
+    parser.add_argument("--output", default="results", help="directory for the result files")
+    parser.add_argument("--generations", type=int, help="Config.NUM_OF_GENERATIONS")
+    parser.add_argument("--population-size", type=int, help="Config.POPULATION_SIZE and MATING_POOL_SIZE")
+    parser.add_argument("--backend", choices=("objects", "arrays"), help="Config.POPULATION_BACKEND")
+    parser.add_argument("--seed", type=int, help="seed of random and the shared numpy generator")
+    parser.add_argument("--egg", help="JSON egg profile, a random egg without it")
+    parser.add_argument("--resume", help="checkpoint to continue, Config.RESUME_FROM")
+    parser.add_argument("--set", dest="overrides", type=parse_override, action="append", default=[],
+                        metavar="NAME=VALUE", help="override any Config value, repeatable")
+    parser.add_argument("--plot", action="store_true", help="also write fronts.png")
+    parser.add_argument("--animation", choices=("gif", "mp4", "png"), help="also render the saved generations")
+    parser.add_argument("--frame-processes", type=int, help="processes rendering a png animation")
+    args = parser.parse_args(argv)
+
+    overrides = []
+    if args.generations is not None:
+        overrides.append(("NUM_OF_GENERATIONS", args.generations))
+    if args.population_size is not None:
+        overrides += [("POPULATION_SIZE", args.population_size), ("MATING_POOL_SIZE", args.population_size)]
+    if args.backend is not None:
+        overrides.append(("POPULATION_BACKEND", args.backend))
+    if args.resume is not None:
+        overrides.append(("RESUME_FROM", args.resume))
+    overrides.append(("TELEMETRY_PATH", os.path.join(args.output, "telemetry.jsonl")))
+    try:
+        apply_overrides(overrides + args.overrides)
+    except ValueError as error:
+        parser.error(str(error))
+
+    os.makedirs(args.output, exist_ok=True)
+    telemetry_path = Config.TELEMETRY_PATH
+    if telemetry_path is not None and os.path.exists(telemetry_path) and args.resume is None:
+        os.remove(telemetry_path)
+
+    # Imported only now, with Config final
+    import ga
+    from Population import seed_generators
+
+    if args.seed is not None:
+        seed_generators(args.seed)
+    egg = read_egg(args.egg) if args.egg is not None else None
+
+    if args.resume is not None:
+        print(f"Resuming {args.resume}")
+    start = time.perf_counter()
+    result = ga.run_configured(egg)
+    seconds = time.perf_counter() - start
+
+    write_results(args.output, result)
+    if args.plot:
+        plot_results(args.output, result.fronts)
+    if args.animation is not None:
+        animate_results(args.output, result.history, args.animation, args.frame_processes)
+
+    print(f"{result.generation} generations of {len(result.population)} in {seconds:.2f}s, "
+          f"{len(result.fronts[0])} individuals in the first front"
+          + (f", {len(result.archive)} archived" if result.archive is not None else "")
+          + (f", {result.evaluator.genotypes.saved} evaluations saved" if result.evaluator.genotypes is not None else "")
+          + (f", {result.stop_reason}" if result.stop_reason is not None else "")
+          + (f", IGD {result.quality['igd']:.4g}" if result.quality is not None and "igd" in result.quality else "")
+          + f", results in {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+    Per-run configuration
+
+    A RunConfig is a snapshot of the Config values with overrides, read like Config itself:
+
+        config = RunConfig(MUTATION_RATE=0.2, eta=10)
+        config.MUTATION_RATE, config.CROSSOVER_RATE   # 0.2 and Config.CROSSOVER_RATE
+
+    ga.run takes one and threads it down to selection, variation, evaluation (the evaluator
+    and the dynamic penalty), sorting and survival, and run_configured on to the history,
+    archive, telemetry and early stopping, so runs with different settings can share a
+    process. Wherever config is None, the Config module is read instead, at call time.
+    run_configured also applies the configuration to Config for the duration of the run,
+    for the few settings still read from Config deeper down (objective count and directions,
+    kernel backend).
+"""
+
+import copy
+import json
+import types
+from contextlib import contextmanager
+
+import Config
+
+
+def config_values():
+    """ The current values of Config, by name """
+    return {name: copy.deepcopy(value) for name, value in vars(Config).items()
+            if not name.startswith("_") and not isinstance(value, types.ModuleType) and not callable(value)}
+
+def resolve_config(config=None):
+    """ config, or the Config module when None, either is read the same way """
+    return config if config is not None else Config
+
+class RunConfig:
+    """
+        Immutable snapshot of Config with overrides, see the module docstring
+        base is another RunConfig to start from, the current Config values by default
+        applied() changes the Config module itself, for the whole process: it is not thread-safe,
+        and runs applying different configurations must not overlap in one process
+    """
+    def __init__(self, base=None, **overrides):
+        values = dict(base.values) if base is not None else config_values()
+        for name, value in overrides.items():
+            if name not in values:
+                raise ValueError(f"Unknown Config value: {name}")
+            values[name] = value
+
+        object.__setattr__(self, "values", values)
+
+    def __getattr__(self, name):
+        # Dunder lookups (pickle, copy) must not reach the values, which may not be set yet
+        if name.startswith("__") or name == "values":
+            raise AttributeError(name)
+        try:
+            return self.values[name]
+        except KeyError:
+            raise AttributeError(f"Unknown Config value: {name}") from None
+
+    def __setattr__(self, name, value):
+        raise AttributeError("RunConfig is immutable, use replace()")
+
+    def __repr__(self):
+        overrides = ", ".join(f"{name}={value!r}" for name, value in self.overrides().items())
+        return f"RunConfig({overrides})"
+
+    def replace(self, **overrides):
+        return RunConfig(self, **overrides)
+
+    def overrides(self, base=None):
+        """ The values that differ from base (a RunConfig), the current Config values by default """
+        base_values = base.values if base is not None else config_values()
+        return {name: value for name, value in self.values.items() if base_values.get(name) != value}
+
+    def key(self):
+        """ Canonical JSON of all the values, equal for equal configurations """
+        return json.dumps(self.values, sort_keys=True, default=repr)
+
+    @contextmanager
+    def applied(self):
+        """ Set the Config module to these values, restoring the previous ones on exit (process-global, not thread-safe) """
+        previous = config_values()
+        for name, value in self.values.items():
+            setattr(Config, name, value)
+        try:
+            yield self
+        finally:
+            for name, value in previous.items():
+                setattr(Config, name, value)
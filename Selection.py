@@ -1,18 +1,25 @@
 import random
 
-from Config import *
+import numpy as np
 
-def is_feasible(individual):
-    return individual.objectives[0] >= CONSTRAINT
+import Config
+from Population import Population, get_column, shared_generator
+from RunConfig import resolve_config
 
-def is_individual_1_winning(individual_1, individual_2):
+def is_feasible(individual, constraint=None):
+    if constraint is None:
+        constraint = Config.CONSTRAINT
+
+    return individual.objectives[0] >= constraint
+
+def is_individual_1_winning(individual_1, individual_2, constraint=None):
     """
     Tournament selection with feasibility preference:
     - Feasible individuals are always preferred over infeasible ones.
     - Among feasible ones: use rank and crowding distance.
     """
-    feasible_1 = is_feasible(individual_1)
-    feasible_2 = is_feasible(individual_2)
+    feasible_1 = is_feasible(individual_1, constraint)
+    feasible_2 = is_feasible(individual_2, constraint)
 
     if feasible_1 and not feasible_2:
         return True
@@ -25,20 +32,109 @@ def is_individual_1_winning(individual_1, individual_2):
     return False
 
 
-def crowded_tournament_selection(population, mating_pool_size=MATING_POOL_SIZE):
-    M_t = []
+def crowded_tournament_selection(population, mating_pool_size=None, config=None):
+    """ Mode, tournament size and feasibility constraint from config (a RunConfig), Config when None """
+    config = resolve_config(config)
+    if mating_pool_size is None:
+        mating_pool_size = config.MATING_POOL_SIZE
 
-    while len(M_t) < mating_pool_size:
-        # Randomly select two individuals from the population
-        i1 = random.randint(0, len(population) - 1)
-        i2 = random.randint(0, len(population) - 1)
-        while i2 == i1:
-            i2 = random.randint(0, len(population) - 1)
+    if config.SELECTION_MODE == "batched":
+        winners = batched_tournament_selection(population, mating_pool_size, config.TOURNAMENT_SIZE,
+                                               constraint=config.CONSTRAINT)
+    else:
+        winners = tournament_winners(population, mating_pool_size, config.CONSTRAINT, config.TOURNAMENT_SIZE)
 
-        if is_individual_1_winning(population[i1], population[i2]):
-            M_t.append(population[i1])
-        else:
-            M_t.append(population[i2])
+    if isinstance(population, Population):
+        return population.take(winners)
 
+    M_t = [population[i] for i in winners]
     return M_t
 
+def tournament_winners(population, mating_pool_size=None, constraint=None, tournament_size=None):
+    """
+        Tournaments one at a time with random.randint, returns the winner indexes
+        Every contestant challenges the best one so far and wins ties, as individual_2 does in a binary tournament
+    """
+    if mating_pool_size is None:
+        mating_pool_size = Config.MATING_POOL_SIZE
+    if constraint is None:
+        constraint = Config.CONSTRAINT
+    if tournament_size is None:
+        tournament_size = Config.TOURNAMENT_SIZE
+    if tournament_size > len(population):
+        raise ValueError(f"Tournament size {tournament_size} exceeds the population size {len(population)}")
+
+    winners = []
+
+    while len(winners) < mating_pool_size:
+        # Randomly select tournament_size distinct individuals from the population
+        contestants = [random.randint(0, len(population) - 1)]
+        while len(contestants) < tournament_size:
+            i = random.randint(0, len(population) - 1)
+            while i in contestants:
+                i = random.randint(0, len(population) - 1)
+            contestants.append(i)
+
+        best = contestants[0]
+        for i in contestants[1:]:
+            if not is_individual_1_winning(population[best], population[i], constraint):
+                best = i
+        winners.append(best)
+
+    return winners
+
+def draw_tournaments(population_size, tournament_num, tournament_size, generator):
+    """ tournament_num rows of tournament_size distinct indexes, every row uniformly drawn """
+    if tournament_size > population_size:
+        raise ValueError(f"Tournament size {tournament_size} exceeds the population size {population_size}")
+
+    if 2 * tournament_size > population_size:
+        # Collisions would be frequent, shuffle the whole range instead
+        rows = np.tile(np.arange(population_size), (tournament_num, 1))
+        return generator.permuted(rows, axis=1)[:, :tournament_size]
+
+    contestants = generator.integers(0, population_size, (tournament_num, tournament_size))
+    while True:
+        ordered = np.sort(contestants, axis=1)
+        repeated = np.flatnonzero((ordered[:, 1:] == ordered[:, :-1]).any(axis=1))
+        if len(repeated) == 0:
+            return contestants
+
+        # Redraw whole rows, which keeps them uniform over the distinct tuples
+        contestants[repeated] = generator.integers(0, population_size, (len(repeated), tournament_size))
+
+def batched_tournament_selection(population, mating_pool_size=None, tournament_size=None, generator=None, constraint=None):
+    """
+        All tournaments at once, returns the winner indexes as an array
+
+        Individuals are ordered by (infeasible, rank, -crowding_distance) as is_individual_1_winning
+        compares them, and every tournament is won by its best contestant. Among equally good
+        contestants the last one wins, as individual_2 does in a binary tournament.
+
+        O(n log n + mating_pool_size * tournament_size) time
+    """
+    if mating_pool_size is None:
+        mating_pool_size = Config.MATING_POOL_SIZE
+    if tournament_size is None:
+        tournament_size = Config.TOURNAMENT_SIZE
+    if constraint is None:
+        constraint = Config.CONSTRAINT
+    if generator is None:
+        generator = shared_generator()
+
+    objectives = get_column(population, "objectives")
+    infeasible = objectives[:, 0] < constraint if len(population) > 0 else np.zeros(0, dtype=bool)
+    rank = get_column(population, "rank")
+    crowding_distance = get_column(population, "crowding_distance")
+
+    # Dense position of every individual in that order, equally good individuals share one
+    order = np.lexsort((-crowding_distance, rank, infeasible))
+    keys = np.column_stack((infeasible, rank, -crowding_distance))[order]
+    is_new = np.ones(len(order), dtype=bool)
+    is_new[1:] = np.any(keys[1:] != keys[:-1], axis=1)
+    position = np.empty(len(order), dtype=np.int64)
+    position[order] = np.cumsum(is_new) - 1
+
+    contestants = draw_tournaments(len(population), mating_pool_size, tournament_size, generator)
+    best_from_last = np.argmin(position[contestants][:, ::-1], axis=1)
+    return contestants[np.arange(mating_pool_size), tournament_size - 1 - best_from_last]
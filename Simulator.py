@@ -0,0 +1,176 @@
+"""
+    Local stand-in for an external simulator, reached over a socket by AsyncEvaluation.py
+
+    The protocol is one JSON object per line each way:
+        request  {"columns": {name: [values]}, "egg": {"hla_profile": [...], "ideal_ph_range": [...]},
+                  "objective": name, "seed": [entropy]}
+        reply    {"objectives": [[...], ...]} or {"error": message}
+    The server scores the rows with the registered objective function, seeded like an Evaluator
+    chunk, so its results equal a SerialEvaluator's. Every request waits SIMULATOR_LATENCY plus
+    SIMULATOR_ROW_LATENCY per row first, as a slow simulator would, and a share
+    SIMULATOR_FAILURE_RATE of them is dropped or stalls, to exercise timeouts and retries.
+
+    python Simulator.py --port 8765 --latency 0.01
+"""
+
+import argparse
+import asyncio
+import json
+import threading
+
+import numpy as np
+
+import Config
+from Egg import Egg
+from Objectives import get_objective_function
+from Population import Population
+
+# Genome columns sent to the simulator, all an objective function may read
+GENOME_COLUMNS = ("genetic_resources", "biological_resources", "dfi", "motility", "morphology", "velocity",
+                  "ph_tolerance", "hla_mask")
+
+# Stalled requests never answer, the client times out first
+STALL_SECONDS = 3600
+
+
+def encode_request(rows, egg, objective, seed):
+    """ Request line for the rows of a Population, seed a np.random.SeedSequence """
+    request = {
+        "columns": {name: getattr(rows, name).tolist() for name in GENOME_COLUMNS},
+        "egg": {"hla_profile": list(egg.hla_profile), "ideal_ph_range": list(egg.ideal_ph_range)},
+        "objective": objective,
+        "seed": [int(value) for value in np.atleast_1d(seed.entropy)],
+    }
+    return (json.dumps(request) + "\n").encode()
+
+def decode_rows(columns):
+    rows = Population(len(columns["hla_mask"]))
+    for name in GENOME_COLUMNS:
+        getattr(rows, name)[:] = columns[name]
+
+    return rows
+
+
+class SimulatorServer:
+    """ Stand-in simulator, serving requests concurrently on one event loop """
+    def __init__(self, host="127.0.0.1", port=0, latency=None, row_latency=None, failure_rate=None, seed=0):
+        self.host = host
+        self.port = port
+        self.latency = latency if latency is not None else Config.SIMULATOR_LATENCY
+        self.row_latency = row_latency if row_latency is not None else Config.SIMULATOR_ROW_LATENCY
+        self.failure_rate = failure_rate if failure_rate is not None else Config.SIMULATOR_FAILURE_RATE
+        self.generator = np.random.default_rng(seed)
+
+        self.eggs = {}
+        self.handlers = set()
+        self.requests = 0
+        self.server = None
+
+    def egg(self, profile):
+        key = (tuple(profile["hla_profile"]), tuple(profile["ideal_ph_range"]))
+        if key not in self.eggs:
+            self.eggs[key] = Egg(*key)
+        return self.eggs[key]
+
+    def evaluate(self, request):
+        rows = decode_rows(request["columns"])
+        objective = get_objective_function(request["objective"])
+        rng = np.random.default_rng(np.random.SeedSequence(request["seed"]))
+        return np.asarray(objective.evaluate(rows, self.egg(request["egg"]), rng), dtype=float).tolist()
+
+    async def handle(self, reader, writer):
+        self.handlers.add(asyncio.current_task())
+        try:
+            while line := await reader.readline():
+                self.requests += 1
+                request = json.loads(line)
+
+                failure = self.generator.random()
+                if failure < self.failure_rate / 2:
+                    break
+                if failure < self.failure_rate:
+                    await asyncio.sleep(STALL_SECONDS)
+
+                await asyncio.sleep(self.latency + self.row_latency * len(request["columns"]["hla_mask"]))
+                try:
+                    reply = {"objectives": self.evaluate(request)}
+                except Exception as error:
+                    reply = {"error": f"{type(error).__name__}: {error}"}
+                writer.write((json.dumps(reply) + "\n").encode())
+                await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+            self.handlers.discard(asyncio.current_task())
+
+    async def start(self):
+        """ Listen on host:port, port 0 picks a free one and sets self.port """
+        self.server = await asyncio.start_server(self.handle, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        self.server.close()
+        for handler in list(self.handlers):
+            handler.cancel()
+        await self.server.wait_closed()
+
+    @property
+    def address(self):
+        return self.host, self.port
+
+# ==================================================================================================================================
+
+class BackgroundSimulator:
+    """
+        SimulatorServer on an event loop of its own thread, for benchmarks and scripts
+        with BackgroundSimulator(latency=0.01) as simulator: ... simulator.address
+    """
+    def __init__(self, **options):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        self.server = asyncio.run_coroutine_threadsafe(SimulatorServer(**options).start(), self.loop).result()
+
+    @property
+    def address(self):
+        return self.server.address
+
+    def close(self):
+        asyncio.run_coroutine_threadsafe(self.server.stop(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+async def serve(host, port, **options):
+    server = await SimulatorServer(host, port, **options).start()
+    print(f"Simulator listening on {server.host}:{server.port}")
+    async with server.server:
+        await server.server.serve_forever()
+
+def main():
+    host, port = Config.SIMULATOR_ADDRESS
+    parser = argparse.ArgumentParser(description="Local stand-in for the external simulator")
+    parser.add_argument("--host", default=host)
+    parser.add_argument("--port", type=int, default=port, help="0 picks a free port")
+    parser.add_argument("--latency", type=float, default=Config.SIMULATOR_LATENCY, help="seconds per request")
+    parser.add_argument("--row-latency", type=float, default=Config.SIMULATOR_ROW_LATENCY, help="seconds per row")
+    parser.add_argument("--failure-rate", type=float, default=Config.SIMULATOR_FAILURE_RATE,
+                        help="share of requests dropped or stalled")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(serve(args.host, args.port, latency=args.latency, row_latency=args.row_latency,
+                          failure_rate=args.failure_rate))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,333 @@
+"""
+    Non-dominated sorting engines
+
+    Every engine takes an (n, m) objective matrix and returns the fronts as a list of
+    index arrays. Indexes inside a front are in ascending order, so the fronts built from
+    them match the ones produced by Evaluate.get_nondominated_set exactly.
+"""
+
+import bisect
+
+import numpy as np
+
+import Config
+from Kernels import get_kernels
+
+# Upper bound for the (block x n) comparison matrices built by the fast sort
+DOMINATION_BLOCK_ELEMENTS = 4_000_000
+
+
+def objective_matrix(population):
+    """ Collect the objective values of the individuals into an (n, m) matrix """
+    objectives = np.empty((len(population), Config.OBJECTIVE_NUM), dtype=float)
+    for i, individual in enumerate(population):
+        objectives[i] = individual.objectives[:Config.OBJECTIVE_NUM]
+
+    return objectives
+
+def to_minimization(objectives, is_minimization=None):
+    """ Negate the maximization columns so that every engine can assume minimization """
+    if is_minimization is None:
+        is_minimization = Config.IS_MINIMIZATION_OBJECTIVE
+
+    objectives = np.asarray(objectives, dtype=float)
+    signs = np.array([1.0 if minimize else -1.0 for minimize in is_minimization[:objectives.shape[1]]])
+    return objectives * signs
+
+# ==================================================================================================================================
+
+def fast_nondominated_sort(objectives):
+    """
+        Deb's fast non-dominated sort with domination counts
+        The dominated sets are rebuilt block by block while peeling the fronts,
+        so memory stays O(block * n) instead of O(n^2)
+
+        O(n * block) space, n=population size
+        O(n^2 * m) time, n=pop_size  m=# of objectives
+    """
+    n = len(objectives)
+    if n == 0:
+        return []
+
+    block = max(1, DOMINATION_BLOCK_ELEMENTS // n)
+
+    def dominated_by(rows, targets):
+        # (len(rows), len(targets)) matrix, [a, b] is True when rows[a] dominates targets[b]
+        # Objectives are compared one column at a time, reducing over a short trailing axis is slow
+        candidates = objectives[rows]
+        others = objectives[targets]
+        no_worse = np.ones((len(rows), len(targets)), dtype=bool)
+        better = np.zeros((len(rows), len(targets)), dtype=bool)
+        for i in range(objectives.shape[1]):
+            column = others[:, i][None, :]
+            no_worse &= candidates[:, i][:, None] <= column
+            better |= candidates[:, i][:, None] < column
+        return no_worse & better
+
+    # Domination counts: how many individuals dominate each individual
+    everyone = np.arange(n)
+    domination_count = np.zeros(n, dtype=np.int64)
+    for start in range(0, n, block):
+        domination_count += dominated_by(everyone[start: start + block], everyone).sum(axis=0)
+
+    fronts = []
+    remaining = everyone
+    while len(remaining) > 0:
+        is_current = domination_count[remaining] == 0
+        current = remaining[is_current]
+        remaining = remaining[~is_current]
+        fronts.append(current)
+
+        # Members of the current front release the individuals they dominate
+        for start in range(0, len(current), block):
+            domination_count[remaining] -= dominated_by(current[start: start + block], remaining).sum(axis=0)
+
+    return fronts
+
+def sweep_2d_sort(objectives):
+    """
+        Non-dominated sorting specialised for two objectives
+        After a lexicographic sort, every front is a staircase, so the front of each
+        individual is found with a binary search over the last member of every front
+
+        O(n) space, n=population size
+        O(n log n) time, n=pop_size
+    """
+    n = len(objectives)
+    if n == 0:
+        return []
+
+    order = np.lexsort((objectives[:, 1], objectives[:, 0]))
+    f1_values = objectives[order, 0].tolist()
+    f2_values = objectives[order, 1].tolist()
+
+    # Last member of each front as (f2, f1), non-decreasing over the fronts.
+    # All previous individuals have f1 <= the current one, so front k dominates
+    # the current individual exactly when its last member is lexicographically smaller.
+    last_members = []
+    front_of = [0] * n
+
+    for position in range(n):
+        key = (f2_values[position], f1_values[position])
+        k = bisect.bisect_left(last_members, key)
+
+        if k == len(last_members):
+            last_members.append(key)
+        else:
+            last_members[k] = key
+        front_of[position] = k
+
+    front_of = np.array(front_of, dtype=np.int64)
+    sorted_positions = np.argsort(front_of, kind='stable')
+    boundaries = np.cumsum(np.bincount(front_of, minlength=len(last_members)))[:-1]
+
+    return [np.sort(order[positions]) for positions in np.split(sorted_positions, boundaries)]
+
+class FrontBuilder:
+    """
+        Fronts grown one individual at a time
+        The first front that does not dominate a new individual is found with a binary search,
+        which is valid as long as no individual added later dominates one added earlier
+    """
+    def __init__(self, objective_num):
+        self.objective_num = objective_num
+        self.members = []   # Row indexes of each front
+        self.values = []    # Objective rows of each front, grown on demand
+        self.sizes = []
+        self.is_dominated = get_kernels().is_dominated
+
+    def __len__(self):
+        return len(self.members)
+
+    def is_dominated_by_front(self, k, point):
+        return self.is_dominated(point, self.values[k][:self.sizes[k]])
+
+    def find_front(self, point):
+        low, high = 0, len(self.members)
+        while low < high:
+            middle = (low + high) // 2
+            if self.is_dominated_by_front(middle, point):
+                low = middle + 1
+            else:
+                high = middle
+
+        return low
+
+    def add(self, k, index, point):
+        while k >= len(self.members):
+            self.members.append([])
+            self.values.append(np.empty((16, self.objective_num), dtype=float))
+            self.sizes.append(0)
+
+        if self.sizes[k] == len(self.values[k]):
+            self.values[k] = np.concatenate((self.values[k], np.empty_like(self.values[k])))
+
+        self.values[k][self.sizes[k]] = point
+        self.sizes[k] += 1
+        self.members[k].append(index)
+
+    def insert(self, index, point):
+        """ Add the individual to its front and return the front index """
+        k = self.find_front(point)
+        self.add(k, index, point)
+        return k
+
+    def fronts(self):
+        return [np.sort(np.array(members, dtype=np.int64)) for members in self.members]
+
+def efficient_nondominated_sort(objectives):
+    """
+        Efficient non-dominated sort with binary search (ENS-BS) for any number of objectives
+        Individuals are visited in lexicographic order, so nobody can be dominated by a
+        later individual and every individual is compared only against the fronts on its
+        binary search path
+
+        O(n) space, n=population size
+        O(n log(F) * |front| * m) time, n=pop_size  F=# of fronts  m=# of objectives
+    """
+    n = len(objectives)
+    if n == 0:
+        return []
+
+    builder = FrontBuilder(objectives.shape[1])
+    for index in np.lexsort(objectives.T[::-1]).tolist():
+        builder.insert(index, objectives[index])
+
+    return builder.fronts()
+
+def dominated_by_any(points, candidates):
+    """
+        For every row of points, whether at least one candidate row dominates it (minimization)
+
+        O((n + c) log c) time for 2 objectives, O(n * c * m) otherwise, c=# of candidates
+    """
+    if len(points) == 0 or len(candidates) == 0:
+        return np.zeros(len(points), dtype=bool)
+
+    if candidates.shape[1] == 2:
+        # Lowest f2 among the candidates with f1 < x.f1 (left) and with f1 <= x.f1 (right)
+        order = np.argsort(candidates[:, 0], kind='stable')
+        f1_values = candidates[order, 0]
+        lowest_f2 = np.minimum.accumulate(candidates[order, 1])
+
+        left = np.searchsorted(f1_values, points[:, 0], side='left') - 1
+        right = np.searchsorted(f1_values, points[:, 0], side='right') - 1
+        better_f1 = (left >= 0) & (lowest_f2[np.maximum(left, 0)] <= points[:, 1])
+        better_f2 = (right >= 0) & (lowest_f2[np.maximum(right, 0)] < points[:, 1])
+        return better_f1 | better_f2
+
+    # Only the non-dominated candidates matter
+    candidates = candidates[get_sorting_engine("auto", candidates.shape[1])(candidates)[0]]
+
+    return get_kernels().any_dominates(points, candidates)
+
+def incremental_sort(objectives, ranks, inserted, removed=None):
+    """
+        Update an existing front structure instead of sorting from scratch
+
+        objectives: (n, m) matrix (minimization) of the current individuals
+        ranks: previous rank (1 = best) of every row, only read for rows that are not inserted
+        inserted: rows without a valid previous rank (new individuals or changed objectives)
+        removed: objective rows that were part of the previous ranking but are gone now
+
+        Rows that are dominated by an inserted or a removed individual are the only ones whose
+        rank can change, everybody else keeps its front. The moving rows are then added in
+        lexicographic order on top of the kept fronts, as in ENS-BS.
+        Returns the fronts as index arrays, and the set of front indexes that gained or lost members
+    """
+    n = len(objectives)
+    inserted = np.asarray(inserted, dtype=np.int64)
+    ranks = np.asarray(ranks, dtype=np.int64)
+
+    is_kept = np.ones(n, dtype=bool)
+    is_kept[inserted] = False
+    kept = np.flatnonzero(is_kept)
+
+    dominators = objectives[inserted]
+    if removed is not None and len(removed) > 0:
+        dominators = np.concatenate((dominators, removed))
+    affected = kept[dominated_by_any(objectives[kept], dominators)]
+    is_kept[affected] = False
+
+    touched = set((ranks[affected] - 1).tolist())
+
+    if objectives.shape[1] == 2:
+        return _incremental_sweep_2d(objectives, ranks, is_kept, touched)
+
+    builder = FrontBuilder(objectives.shape[1])
+    for index in np.flatnonzero(is_kept)[np.argsort(ranks[is_kept], kind='stable')].tolist():
+        builder.add(int(ranks[index]) - 1, index, objectives[index])
+
+    moving = np.concatenate((inserted, affected))
+    moving = moving[np.lexsort(objectives[moving].T[::-1])]
+    for index in moving.tolist():
+        touched.add(builder.insert(index, objectives[index]))
+
+    return builder.fronts(), touched
+
+def _incremental_sweep_2d(objectives, ranks, is_kept, touched):
+    """
+        sweep_2d_sort where the kept rows skip the binary search and reuse their previous front
+    """
+    if len(objectives) == 0:
+        return [], touched
+
+    order = np.lexsort((objectives[:, 1], objectives[:, 0]))
+    f1_values = objectives[order, 0].tolist()
+    f2_values = objectives[order, 1].tolist()
+    kept_fronts = np.where(is_kept, ranks - 1, -1)[order].tolist()
+
+    last_members = []
+    front_of = [0] * len(order)
+
+    for position in range(len(order)):
+        key = (f2_values[position], f1_values[position])
+        k = kept_fronts[position]
+        if k < 0:
+            k = bisect.bisect_left(last_members, key)
+            touched.add(k)
+
+        if k == len(last_members):
+            last_members.append(key)
+        else:
+            last_members[k] = key
+        front_of[position] = k
+
+    front_of = np.array(front_of, dtype=np.int64)
+    sorted_positions = np.argsort(front_of, kind='stable')
+    boundaries = np.cumsum(np.bincount(front_of, minlength=len(last_members)))[:-1]
+
+    return [np.sort(order[positions]) for positions in np.split(sorted_positions, boundaries)], touched
+
+# ==================================================================================================================================
+
+SORTING_ENGINES = {
+    "deb": fast_nondominated_sort,
+    "sweep2d": sweep_2d_sort,
+    "ens": efficient_nondominated_sort,
+}
+
+def get_sorting_engine(name=None, objective_num=None):
+    """ Resolve the engine configured by Config.SORTING_ENGINE ("auto" picks by the objective count) """
+    if name is None:
+        name = Config.SORTING_ENGINE
+    if objective_num is None:
+        objective_num = Config.OBJECTIVE_NUM
+
+    if name == "auto":
+        name = "sweep2d" if objective_num == 2 else "ens"
+
+    if name == "sweep2d" and objective_num != 2:
+        raise ValueError("The sweep2d sorting engine only supports 2 objectives")
+    if name not in SORTING_ENGINES:
+        raise ValueError(f"Unknown sorting engine: {name}")
+
+    return SORTING_ENGINES[name]
+
+def sort_fronts(objectives, engine=None, is_minimization=None):
+    """
+        Split the objective matrix into fronts
+        Returns a list of index arrays, best front first
+    """
+    objectives = to_minimization(objectives, is_minimization)
+    return get_sorting_engine(engine, objectives.shape[1])(objectives)
@@ -1,8 +1,10 @@
 import random
-import copy
+from collections import namedtuple
 
 from Config import *
+import Config
 import Egg
+import Hla
 
 """class Sperm:
     def __init__(self):
@@ -68,8 +70,19 @@ import Egg
 """
 
 
+def penalty_parameters(C=None, alpha=None, beta=None, constraint=None):
+    """ The dynamic penalty parameters, the Config values at call time for those not given """
+    return (Config.DYNAMIC_PENALTY_FACTOR_C if C is None else C,
+            Config.DYNAMIC_PENALTY_FACTOR_ALPHA if alpha is None else alpha,
+            Config.DYNAMIC_PENALTY_FACTOR_BETA if beta is None else beta,
+            Config.CONSTRAINT if constraint is None else constraint)
 
 class Sperm:
+    # Fixed layout, no per-instance __dict__
+    __slots__ = ("total_resources", "genetic_resources", "biological_resources", "hla_mask",
+                 "dfi", "motility", "morphology", "velocity", "ph_tolerance",
+                 "objectives", "rank", "crowding_distance", "raw_objectives", "needs_evaluation")
+
     def __init__(self):
         # Total resource budget (fixed)
         self.total_resources = 100
@@ -94,16 +107,63 @@ class Sperm:
         self.rank = 0
         self.crowding_distance = 0.0
 
-    def copy(self):
-        return copy.deepcopy(self)
+        # Unpenalized objectives, valid until Variation changes the genome
+        self.raw_objectives = [0.0, 0.0]
+        self.needs_evaluation = True
+
+    @property
+    def hla_profile(self):
+        # Stored as a bitmask over HLA_ALLELES, see Hla.py. The profile is a read-only tuple,
+        # sperm.hla_profile.append(...) fails instead of silently changing a copy: assign a new profile instead
+        return Hla.mask_to_profile(self.hla_mask)
 
-    def evaluate_objectives(self, egg: Egg, generation_number=0, C=DYNAMIC_PENALTY_FACTOR_C, alpha=DYNAMIC_PENALTY_FACTOR_ALPHA, beta=DYNAMIC_PENALTY_FACTOR_BETA):
+    @hla_profile.setter
+    def hla_profile(self, hla_profile):
+        self.hla_mask = Hla.profile_to_mask(hla_profile)
+
+    def copy(self):
+        # Every field is an immutable scalar except the two small objective lists
+        clone = Sperm.__new__(Sperm)
+        clone.total_resources = self.total_resources
+        clone.genetic_resources = self.genetic_resources
+        clone.biological_resources = self.biological_resources
+        clone.hla_mask = self.hla_mask
+        clone.dfi = self.dfi
+        clone.motility = self.motility
+        clone.morphology = self.morphology
+        clone.velocity = self.velocity
+        clone.ph_tolerance = self.ph_tolerance
+        clone.objectives = self.objectives[:]
+        clone.rank = self.rank
+        clone.crowding_distance = self.crowding_distance
+        clone.raw_objectives = self.raw_objectives[:]
+        clone.needs_evaluation = self.needs_evaluation
+        return clone
+
+    def snapshot(self):
+        return SpermSnapshot(self.genetic_resources, self.biological_resources, self.hla_mask,
+                             self.dfi, self.motility, self.morphology, self.velocity, self.ph_tolerance,
+                             tuple(self.objectives), self.rank, self.crowding_distance,
+                             tuple(self.raw_objectives), self.needs_evaluation)
+
+    def evaluate_objectives(self, egg: Egg, generation_number=0, C=None, alpha=None, beta=None, constraint=None):
+        # Objective functions are only recomputed when the genome changed
+        if self.needs_evaluation:
+            self.evaluate_raw_objectives(egg)
+
+        self.apply_penalty(generation_number, C, alpha, beta, constraint)
+
+    def evaluate_raw_objectives(self, egg: Egg):
         # Calculate objective functions
-        genetic_compat = self.genetic_compatibility(egg)
-        bio_quality = self.biological_quality()
+        self.raw_objectives = [self.genetic_compatibility(egg), self.biological_quality()]
+        self.needs_evaluation = False
+
+    def apply_penalty(self, generation_number=0, C=None, alpha=None, beta=None, constraint=None):
+        C, alpha, beta, constraint = penalty_parameters(C, alpha, beta, constraint)
+        genetic_compat, bio_quality = self.raw_objectives
 
         # Calculate penalty (g(x) = CONSTRAINT - genetic_compatibility)
-        g_violation = max(0.0, CONSTRAINT - genetic_compat)
+        g_violation = max(0.0, constraint - genetic_compat)
         penalty = (C * (generation_number ** alpha)) * (g_violation ** beta)
 
         # Penalzied fitness for objective 1
@@ -115,17 +175,12 @@ class Sperm:
 
     def genetic_compatibility(self, egg: Egg):
         # HLA match improves with more genetic resources
-        hla_match = len(set(self.hla_profile) & set(egg.hla_profile)) / len(egg.hla_profile)
+        hla_match = egg.evaluator.hla_match[self.hla_mask]
         
         resource_factor = self.genetic_resources / 100
         
         # pH compatibility
-        if egg.ideal_ph_range[0] <= self.ph_tolerance <= egg.ideal_ph_range[1]:
-            ph_score = 1.0
-        else:
-            dist = min(abs(self.ph_tolerance - egg.ideal_ph_range[0]),
-                       abs(self.ph_tolerance - egg.ideal_ph_range[1]))
-            ph_score = max(0.0, 1 - dist)
+        ph_score = egg.evaluator.ph_score(self.ph_tolerance)
         
         # Final score with resource influence
         score = (0.7 * hla_match + 0.3 * ph_score) * (0.3 + 0.7 * resource_factor)
@@ -151,4 +206,29 @@ class Sperm:
         
         # Apply resource constraint
         score = base_score * (0.2 + 0.8 * resource_factor)
-        return round(max(0, min(1, score)), 5)
\ No newline at end of file
+        return round(max(0, min(1, score)), 5)
+
+
+class SpermSnapshot(namedtuple("SpermSnapshot", ("genetic_resources", "biological_resources", "hla_mask",
+                                                 "dfi", "motility", "morphology", "velocity", "ph_tolerance",
+                                                 "objectives", "rank", "crowding_distance",
+                                                 "raw_objectives", "needs_evaluation"))):
+    """
+        Immutable record of a Sperm, used for the saved generation history
+        Reads like a Sperm, to_sperm() turns it back into one
+    """
+    __slots__ = ()
+    total_resources = 100
+
+    @property
+    def hla_profile(self):
+        return Hla.mask_to_profile(self.hla_mask)
+
+    def to_sperm(self):
+        sperm = Sperm.__new__(Sperm)
+        sperm.total_resources = self.total_resources
+        for name in self._fields:
+            setattr(sperm, name, getattr(self, name))
+        sperm.objectives = list(self.objectives)
+        sperm.raw_objectives = list(self.raw_objectives)
+        return sperm
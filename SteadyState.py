@@ -0,0 +1,252 @@
+"""
+    Steady-state (mu + 1) NSGA-II, Config.LOOP_MODE == "steady_state"
+
+    Instead of breeding and evaluating N offspring per generation, offspring are bred
+    STEADY_STATE_BATCH at a time (1 for mu + 1). Every offspring is inserted into the ranked
+    population as soon as its evaluation is back, and the worst individual (last front,
+    smallest crowding distance) is removed. With an evaluator running in other processes,
+    STEADY_STATE_IN_FLIGHT batches are evaluated at once and each one is replaced as soon as
+    it finishes, so the workers never wait for a whole generation.
+
+    A generation is POPULATION_SIZE insertions. The dynamic penalty, the on_generation hook,
+    telemetry and early stopping all work per generation, as in ga.run. A new generation's
+    penalty moves the infeasible objectives, and the population is then sorted once in full.
+
+    An insertion costs much less than a full sort from a few thousand individuals on (about 2x
+    less at 100, 15x at 10,000, see Benchmark.py steady_state). A generation still costs more
+    than a generational one, since every offspring is selected, varied and evaluated on its
+    own: with the built-in objectives, 20 generations of 100 take about 1s against 0.1s.
+    The mode pays off when evaluations are slow or remote, not for cheap in-process ones.
+"""
+
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, wait
+
+import numpy as np
+
+import Sorting
+from Evaluate import crowding_distances, population_crowding_distance_evaluation
+from Genotype import handle_duplicates, set_raw_objectives, stale_rows
+from Population import Population, apply_dynamic_penalty
+from RunConfig import resolve_config
+from Selection import tournament_winners
+from Telemetry import NULL_TELEMETRY
+from Variation import variation
+
+
+class SteadyStatePopulation:
+    """
+        Ranked Population of fixed size, every inserted offspring takes the row of the worst individual
+        The rank and crowding_distance columns stay up to date
+
+        Inserting a point p ranks it one front below its worst-ranked dominator. Only rows that p
+        dominates can move, each by one front: those in p's front, then those in the next front
+        dominated by a row that moved, and so on. Crowding distances are recomputed for the
+        fronts that changed only, for all of them when the objective bounds move.
+
+        O(n * m) time per insertion plus the crowding distances of the changed fronts
+    """
+    def __init__(self, population, is_minimization=None, config=None):
+        self.population = population
+        self.is_minimization = is_minimization
+        self.config = config
+        self.rank_all()
+
+    def rank_all(self):
+        """ Full sort, after the objectives of many rows changed """
+        population_crowding_distance_evaluation(self.population, self.config)
+        self.signs = Sorting.to_minimization(np.ones((1, self.population.objectives.shape[1])), self.is_minimization)[0]
+        self.points = self.population.objectives * self.signs
+        self.obj_mins = self.population.objectives.min(axis=0)
+        self.obj_maxes = self.population.objectives.max(axis=0)
+
+    def insert(self, offspring, row=0):
+        """ Add row `row` of an evaluated offspring Population, then remove the worst row, returns whether the offspring stayed """
+        population = self.population
+        points, rank = self.points, population.rank
+        objectives = offspring.objectives[row]
+        point = objectives * self.signs
+
+        not_worse, not_better = np.all(points <= point, axis=1), np.all(point <= points, axis=1)
+        dominators = not_worse & ~not_better
+        new_rank = int(rank[dominators].max()) + 1 if dominators.any() else 1
+
+        # Rows that move down one front, level by level, on the ranks before the insertion
+        dominated = not_better & ~not_worse
+        moved = np.flatnonzero(dominated & (rank == new_rank))
+        moves = []
+        level = new_rank
+        while len(moved) > 0:
+            moves.append(moved)
+            level += 1
+            candidates = np.flatnonzero(dominated & (rank == level))
+            moved = candidates[Sorting.dominated_by_any(points[candidates], points[moved])]
+
+        # Worst of the last front among the rows and the offspring (index len(population)),
+        # by crowding distance within the bounds of all of them, as a full sort would pick it
+        ranks = np.append(rank, new_rank)
+        for moved in moves:
+            ranks[moved] += 1
+        last_rank = int(ranks.max())
+        last_front = np.flatnonzero(ranks == last_rank)
+
+        if len(last_front) == 1:
+            worst = int(last_front[0])
+        elif (new_rank + len(moves) < last_rank and np.all(self.obj_mins <= objectives)
+              and np.all(objectives <= self.obj_maxes)):
+            # Neither the last front nor the bounds change, its crowding distances are up to date
+            worst = int(last_front[np.argmin(population.crowding_distance[last_front])])
+        else:
+            if last_front[-1] == len(population):
+                last_objectives = np.vstack((population.objectives[last_front[:-1]], objectives))
+            else:
+                last_objectives = population.objectives[last_front]
+            crowding_distance = np.zeros(len(last_front))
+            crowding_distances(last_objectives, [np.arange(len(last_front))], np.minimum(self.obj_mins, objectives),
+                               np.maximum(self.obj_maxes, objectives), crowding_distance)
+            worst = int(last_front[np.argmin(crowding_distance)])
+
+        if worst == len(population):
+            # The offspring was ranked last, so it dominates nobody and no rank moved
+            return False
+
+        # The worst row is in the last front, its removal moves no rank
+        removed = population.objectives[worst].copy()
+        rank[:] = ranks[:-1]
+        for name in ("genetic_resources", "biological_resources", "dfi", "motility", "morphology", "velocity",
+                     "ph_tolerance", "hla_mask", "objectives", "raw_objectives", "needs_evaluation"):
+            getattr(population, name)[worst] = getattr(offspring, name)[row]
+        rank[worst] = new_rank
+        points[worst] = point
+
+        # The bounds only need a scan when the removed row was on one of them
+        if np.any(removed == self.obj_mins) or np.any(removed == self.obj_maxes):
+            obj_mins, obj_maxes = population.objectives.min(axis=0), population.objectives.max(axis=0)
+        else:
+            obj_mins, obj_maxes = np.minimum(self.obj_mins, objectives), np.maximum(self.obj_maxes, objectives)
+
+        touched = set(range(new_rank, new_rank + len(moves) + 1))
+        touched.add(last_rank)
+        if not (np.array_equal(obj_mins, self.obj_mins) and np.array_equal(obj_maxes, self.obj_maxes)):
+            # Every distance is normalized by the bounds
+            touched = set(range(1, last_rank + 1))
+        self.obj_mins, self.obj_maxes = obj_mins, obj_maxes
+
+        fronts = [front for front in (np.flatnonzero(rank == k) for k in sorted(touched)) if len(front) > 0]
+        crowding_distances(population.objectives, fronts, obj_mins, obj_maxes, population.crowding_distance)
+        return True
+
+    def fronts(self):
+        """ The fronts as Populations sharing the columns of one reordered copy, as crowding_distance_evaluation returns them """
+        rank = self.population.rank
+        order = np.argsort(rank, kind='stable')
+        ordered = self.population.take(order)
+        ends = np.cumsum(np.bincount(rank[order])[1:]).tolist()
+        return [ordered.rows(start, end) for start, end in zip([0] + ends, ends)]
+
+# ==================================================================================================================================
+
+def breed(population, batch_size, config):
+    """ batch_size offspring of tournament winners, the first children of variation """
+    # Tournaments cost O(TOURNAMENT_SIZE) each, a batched selection would sort the whole population every time
+    pool_size = batch_size + batch_size % 2
+    M_t = population.take(tournament_winners(population, pool_size, config.CONSTRAINT, config.TOURNAMENT_SIZE))
+    # The children are new rows already, the first batch_size are used as they are
+    return variation(M_t, config=config).rows(0, batch_size)
+
+def in_flight_limit(evaluator, config):
+    if config.STEADY_STATE_IN_FLIGHT is not None:
+        return config.STEADY_STATE_IN_FLIGHT
+
+    return getattr(evaluator, "workers", 1)
+
+def apply_penalty(population, t, config):
+    """ Penalized objectives of generation t from the raw ones, returns whether any changed """
+    objectives = apply_dynamic_penalty(population.raw_objectives, t, config.DYNAMIC_PENALTY_FACTOR_C,
+                                       config.DYNAMIC_PENALTY_FACTOR_ALPHA, config.DYNAMIC_PENALTY_FACTOR_BETA,
+                                       config.CONSTRAINT)
+    changed = not np.array_equal(objectives, population.objectives)
+    population.objectives[:] = objectives
+    return changed
+
+def cancel_in_flight(in_flight):
+    """
+        Drop the batches still being evaluated when the run ends: cancel the ones not started,
+        wait for the running ones, so the evaluator can be closed with no work left behind
+    """
+    futures = [future for _, _, future in in_flight if future is not None]
+    for future in futures:
+        future.cancel()
+    wait(futures)
+    in_flight.clear()
+
+def steady_state_generations(P_t, egg, first_generation, generations, evaluator, finish_generation,
+                             telemetry=NULL_TELEMETRY, config=None):
+    """
+        Generations first_generation..generations of POPULATION_SIZE insertions each
+        finish_generation(t, P_t, fronts) closes every generation and returns a reason to stop or None
+        P_t is a list of Sperm or a Population, ranked, the result comes back the same way
+    """
+    config = resolve_config(config)
+    is_list = not isinstance(P_t, Population)
+    population = Population.from_sperms(P_t) if is_list else P_t.copy()
+    state = None
+
+    batch_size = config.STEADY_STATE_BATCH
+    limit = in_flight_limit(evaluator, config)
+    in_flight = deque()
+
+    for t in range(first_generation, generations + 1):
+        telemetry.begin_generation(t)
+        with telemetry.stage("sorting"):
+            if apply_penalty(population, t, config) or state is None:
+                state = SteadyStatePopulation(population, config.IS_MINIMIZATION_OBJECTIVE, config)
+
+        inserted = 0
+        while inserted < len(population):
+            while len(in_flight) < limit:
+                with telemetry.stage("variation"):
+                    offspring = breed(population, batch_size, config)
+                    if config.DUPLICATES != "keep":
+                        offspring, duplicates = handle_duplicates(offspring, population, config.DUPLICATES)
+                        telemetry.count("duplicates", duplicates)
+                with telemetry.stage("evaluation"):
+                    # Known genotypes are filled in right away, one row of every other one is evaluated
+                    genotypes = evaluator.genotypes
+                    stale = genotypes.reuse(offspring) if genotypes is not None else stale_rows(offspring)
+                    rows = offspring if len(stale) == len(offspring) else offspring.take(stale)
+                    future = evaluator.submit(rows) if len(stale) > 0 else None
+                    in_flight.append((offspring, stale, future))
+                    telemetry.count("evaluations", len(stale))
+
+            with telemetry.stage("evaluation"):
+                if in_flight[0][2] is not None and not in_flight[0][2].done():
+                    wait([future for _, _, future in in_flight if future is not None], return_when=FIRST_COMPLETED)
+
+            # Finished batches in submission order, an evaluator finishing out of order only changes the timing
+            while in_flight and (in_flight[0][2] is None or in_flight[0][2].done()) and inserted < len(population):
+                offspring, stale, future = in_flight.popleft()
+                if future is not None:
+                    set_raw_objectives(offspring, stale, future.result())
+                    if evaluator.genotypes is not None:
+                        evaluator.genotypes.add(offspring, stale)
+                        evaluator.genotypes.reuse(offspring)
+                apply_penalty(offspring, t, config)
+
+                with telemetry.stage("sorting"):
+                    for row in range(len(offspring)):
+                        telemetry.count("inserted", state.insert(offspring, row))
+                inserted += len(offspring)
+
+        with telemetry.stage("survival"):
+            fronts = state.fronts()
+            P_next = population.copy()
+            if is_list:
+                fronts = [front.to_sperms() for front in fronts]
+                P_next = [individual for front in fronts for individual in front]
+
+        if finish_generation(t, P_next, fronts) is not None:
+            break
+
+    cancel_in_flight(in_flight)
+    return P_next, fronts
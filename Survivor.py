@@ -1,6 +1,14 @@
+import numpy as np
+
 import Config
+from Population import Population
+
+def rank_filtering(fronts, size_of_population=None):
+    if size_of_population is None:
+        size_of_population = Config.POPULATION_SIZE
+    if len(fronts) > 0 and isinstance(fronts[0], Population):
+        return population_rank_filtering(fronts, size_of_population)
 
-def rank_filtering(fronts, size_of_population=Config.POPULATION_SIZE):
     P_t = []
     total_filtered_individuals = 0
 
@@ -12,11 +20,48 @@ def rank_filtering(fronts, size_of_population=Config.POPULATION_SIZE):
             missing_slots = size_of_population - total_filtered_individuals
             
             # we need to get N biggest crowding distanced elements from the current front
-            # Sort it and get the first N
-            front.sort(key=lambda individual: individual.crowding_distance, reverse=True)
-            P_t.extend(front[: missing_slots])
+            crowding_distance = np.array([individual.crowding_distance for individual in front])
+            P_t.extend(front[i] for i in largest_crowding_distances(crowding_distance, missing_slots).tolist())
             total_filtered_individuals += missing_slots
             break
     
     return P_t
 
+def population_rank_filtering(fronts, size_of_population=None):
+    """ rank_filtering for fronts given as Populations """
+    if size_of_population is None:
+        size_of_population = Config.POPULATION_SIZE
+    parts = []
+    total_filtered_individuals = 0
+
+    for front in fronts:
+        if total_filtered_individuals + len(front) <= size_of_population:
+            parts.append(front)
+            total_filtered_individuals += len(front)
+        else:
+            missing_slots = size_of_population - total_filtered_individuals
+            parts.append(front.take(largest_crowding_distances(front.crowding_distance, missing_slots)))
+            total_filtered_individuals += missing_slots
+            break
+
+    return Population.concatenate(parts)
+
+def largest_crowding_distances(crowding_distance, count):
+    """
+        Indexes of the count largest distances, largest first and equal distances in index order,
+        the first count of a stable descending sort
+
+        O(n + count log count) time, argpartition finds the cut-off and only the kept ones are sorted
+    """
+    negated = -np.asarray(crowding_distance, dtype=float)
+    if count >= len(negated):
+        return np.argsort(negated, kind='stable')
+    if count <= 0:
+        return np.zeros(0, dtype=np.int64)
+
+    cutoff = negated[np.argpartition(negated, count - 1)[count - 1]]
+    above = np.flatnonzero(negated < cutoff)
+    ties = np.flatnonzero(negated == cutoff)[: count - len(above)]
+    kept = np.concatenate((above, ties))
+
+    return kept[np.argsort(negated[kept], kind='stable')]
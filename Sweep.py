@@ -0,0 +1,301 @@
+"""
+    Parameter sweeps over Config values
+
+    A design is a list of cells, every cell a dict of Config overrides:
+        grid_design({"MUTATION_RATE": [0.05, 0.1, 0.2], "eta": [5, 15]})        every combination
+        random_design({"MUTATION_RATE": (0.01, 0.3), "eta": [5, 15, 30]}, 20)  uniform in ranges, drawn from lists
+    Every cell runs SWEEP_REPEATS times, run r of every cell seeded with (SWEEP_SEED, r), on the same egg.
+    Each run gets its own RunConfig and is scheduled on a pool of worker processes.
+
+    Every finished run is appended to the results file (JSON lines), which is also the cache:
+    a run whose key (all its configuration values, egg and seed) is already in the file with
+    status "ok" is not run again, so a sweep can be extended with new cells or repeats.
+    The table (CSV) has one row per cell, the mean and standard deviation of every metric.
+
+    python Sweep.py sweep.jsonl --grid MUTATION_RATE=0.05,0.1,0.2 --grid eta=5,15 --generations 200
+    python Sweep.py sweep.jsonl --random MUTATION_RATE=0.01:0.3 --random eta=5,15,30 --samples 20
+"""
+
+import argparse
+import ast
+import csv
+import hashlib
+import itertools
+import json
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from RunConfig import RunConfig, resolve_config
+
+# Settings of every sweep run: nothing written to disk, no process pool inside the pool workers
+SWEEP_FIXED = {
+    "TELEMETRY": None,
+    "HISTORY_PATH": None,
+    "HISTORY_RETENTION": "last",
+    "HISTORY_LAST_K": 1,
+    "CHECKPOINT_PATH": None,
+    "RESUME_FROM": None,
+    "EVALUATION_MODE": "serial",
+}
+
+# Per-run metrics, aggregated over the repeats of a cell in the table
+METRICS = ("hypervolume", "spread", "front_size", "generations", "seconds")
+
+
+def grid_design(space):
+    """ Every combination of space = {name: [values]}, in the order of the names """
+    names = list(space)
+    return [dict(zip(names, values)) for values in itertools.product(*(space[name] for name in names))]
+
+def random_design(space, samples, seed=None, config=None):
+    """
+        samples cells of space = {name: (low, high) or [values]}, seed defaults to config.SWEEP_SEED
+        Ranges are uniform, integer ones when both bounds are ints. Cells are drawn one after another,
+        a larger samples with the same seed starts with the same cells
+    """
+    if seed is None:
+        seed = resolve_config(config).SWEEP_SEED
+
+    generator = np.random.default_rng(seed)
+    design = []
+    for _ in range(samples):
+        cell = {}
+        for name, values in space.items():
+            if isinstance(values, tuple):
+                low, high = values
+                if isinstance(low, int) and isinstance(high, int):
+                    cell[name] = int(generator.integers(low, high + 1))
+                else:
+                    cell[name] = float(generator.uniform(low, high))
+            else:
+                cell[name] = values[int(generator.integers(len(values)))]
+        design.append(cell)
+
+    return design
+
+def cell_config(cell, base=None):
+    """ RunConfig of a cell over base, a POPULATION_SIZE alone sets MATING_POOL_SIZE too, as Run.py does """
+    overrides = dict(SWEEP_FIXED)
+    if "POPULATION_SIZE" in cell and "MATING_POOL_SIZE" not in cell:
+        overrides["MATING_POOL_SIZE"] = cell["POPULATION_SIZE"]
+    overrides.update(cell)
+
+    return RunConfig(base, **overrides)
+
+def run_key(config, egg_profile, seed):
+    """ Cache key of one run, any change to its configuration, egg or seed gives another key """
+    text = json.dumps({"config": config.key(), "egg": egg_profile, "seed": seed}, sort_keys=True)
+    return hashlib.sha1(text.encode()).hexdigest()
+
+def final_front(result):
+    """ Objective matrix of the archive, or of the first front without one """
+    from Population import get_column
+
+    if result.archive is not None:
+        return result.archive.objectives()
+
+    front = result.fronts[0]
+    return np.asarray(get_column(front, "objectives"), dtype=float).reshape(len(front), -1)
+
+def run_sweep_run(config, egg_profile, seed):
+    """ One run of a cell, in a pool worker. Never raises, failures are part of the result """
+    import ga
+    from Egg import Egg
+    from Metrics import hypervolume, spread
+    from Population import seed_generators
+
+    start = time.perf_counter()
+    result = {}
+    try:
+        seed_generators(np.random.SeedSequence(seed))
+        egg = Egg(egg_profile["hla_profile"], egg_profile["ideal_ph_range"])
+        run = ga.run_configured(egg, config=config)
+
+        objectives = final_front(run)
+        result["status"] = "ok"
+        result["hypervolume"] = hypervolume(objectives, config.HYPERVOLUME_REFERENCE, config.IS_MINIMIZATION_OBJECTIVE)
+        result["spread"] = spread(objectives)
+        result["front_size"] = len(objectives)
+        result["generations"] = run.generation
+        result["stop_reason"] = run.stop_reason
+    except Exception as error:
+        result["status"] = "failed"
+        result["error"] = f"{type(error).__name__}: {error}"
+        result["traceback"] = traceback.format_exc()
+
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+def read_results(path):
+    """ The runs of a results file, empty when it does not exist """
+    if not os.path.exists(path):
+        return []
+
+    with open(path) as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+def run_sweep(design, egg_profile, results_path, repeats=None, workers=None, seed=None, base=None):
+    """
+        Every run of the design that is not in results_path yet, appended to it as it finishes
+        Returns the runs of the design, cached or new
+        repeats, workers and seed default to SWEEP_REPEATS, SWEEP_WORKERS and SWEEP_SEED of base (a RunConfig, Config when None)
+    """
+    settings = resolve_config(base)
+    if repeats is None:
+        repeats = settings.SWEEP_REPEATS
+    if workers is None:
+        workers = settings.SWEEP_WORKERS
+    if seed is None:
+        seed = settings.SWEEP_SEED
+
+    cached = {record["key"]: record for record in read_results(results_path) if record.get("status") == "ok"}
+
+    runs, pending = [], []
+    for index, cell in enumerate(design):
+        config = cell_config(cell, base)
+        for repeat in range(repeats):
+            run_seed = [seed, repeat]
+            key = run_key(config, egg_profile, run_seed)
+            record = {"key": key, "cell_index": index, "cell": cell, "repeat": repeat, "seed": run_seed}
+            if key in cached:
+                runs.append(dict(cached[key], cell_index=index))
+            else:
+                pending.append((record, config))
+
+    print(f"{len(design)} cells x {repeats} repeats: {len(runs)} cached, {len(pending)} to run")
+    if not pending:
+        return runs
+
+    with ProcessPoolExecutor(max_workers=workers) as executor, open(results_path, "a") as output:
+        futures = {executor.submit(run_sweep_run, config, egg_profile, record["seed"]): record for record, config in pending}
+
+        for done, future in enumerate(as_completed(futures), start=1):
+            record = dict(futures[future], **future.result())
+            output.write(json.dumps(record) + "\n")
+            output.flush()
+            runs.append(record)
+
+            status = record["status"] if record["status"] != "ok" else f"hypervolume {record['hypervolume']:.4f}"
+            print(f"[{done}/{len(pending)}] {record['cell']} repeat {record['repeat']}: {status} in {record['seconds']:.2f}s")
+
+    return runs
+
+def summarize(design, runs):
+    """ One row per cell: its overrides, run counts and the mean and standard deviation of every metric """
+    rows = []
+    for index, cell in enumerate(design):
+        cell_runs = [run for run in runs if run["cell_index"] == index]
+        succeeded = [run for run in cell_runs if run["status"] == "ok"]
+
+        row = dict(cell)
+        row["runs"] = len(succeeded)
+        row["failed"] = len(cell_runs) - len(succeeded)
+        for metric in METRICS:
+            values = np.array([run[metric] for run in succeeded], dtype=float)
+            row[f"{metric}_mean"] = float(values.mean()) if len(values) > 0 else None
+            row[f"{metric}_std"] = float(values.std()) if len(values) > 0 else None
+        rows.append(row)
+
+    return rows
+
+def write_table(path, rows):
+    names = list(dict.fromkeys(name for row in rows for name in row))
+    with open(path, "w", newline="") as file:
+        writer = csv.DictWriter(file, names)
+        writer.writeheader()
+        writer.writerows(rows)
+
+def print_table(rows, top=10):
+    """ The cells with the highest mean hypervolume """
+    ranked = sorted((row for row in rows if row["runs"] > 0), key=lambda row: -row["hypervolume_mean"])
+    for row in ranked[:top]:
+        cell = {name: value for name, value in row.items() if name not in ("runs", "failed") and not name.endswith(("_mean", "_std"))}
+        print(f"hypervolume {row['hypervolume_mean']:.4f} +- {row['hypervolume_std']:.4f}  "
+              f"{row['seconds_mean']:.2f}s  {row['runs']} runs  {cell}")
+
+# ==================================================================================================================================
+
+def parse_values(text):
+    """ NAME=v1,v2,... to (NAME, [values]) or NAME=low:high to (NAME, (low, high)), values are Python literals """
+    name, separator, values = text.partition("=")
+    if not separator:
+        raise argparse.ArgumentTypeError(f"Expected NAME=VALUES, got {text!r}")
+
+    def literal(value):
+        try:
+            return ast.literal_eval(value.strip())
+        except (ValueError, SyntaxError):
+            return value.strip()
+
+    if ":" in values and "," not in values:
+        low, high = values.split(":", 1)
+        return name.strip(), (literal(low), literal(high))
+
+    return name.strip(), [literal(value) for value in values.split(",")]
+
+def read_egg_profile(path=None, seed=None, config=None):
+    """ Egg profile of a JSON file (as Run.py reads it), a random egg drawn with seed (config.SWEEP_SEED) without one """
+    from Egg import Egg
+    from Population import seed_generators
+
+    if path is not None:
+        with open(path) as file:
+            profile = json.load(file)
+        return {"hla_profile": list(profile["hla_profile"]), "ideal_ph_range": list(profile.get("ideal_ph_range", (7.2, 8.0)))}
+
+    seed_generators(seed if seed is not None else resolve_config(config).SWEEP_SEED)
+    egg = Egg()
+    return {"hla_profile": list(egg.hla_profile), "ideal_ph_range": list(egg.ideal_ph_range)}
+
+def main():
+    from Run import parse_override
+
+    parser = argparse.ArgumentParser(description="Sweep Config values, every cell of the design run several times")
+    parser.add_argument("results", help="runs, one JSON object per line, also the cache of finished runs")
+    parser.add_argument("--table", help="CSV table, one row per cell, results with .csv by default")
+    parser.add_argument("--grid", type=parse_values, action="append", default=[], metavar="NAME=V1,V2",
+                        help="every value of NAME, repeatable: the design is every combination")
+    parser.add_argument("--random", type=parse_values, action="append", default=[], metavar="NAME=LOW:HIGH",
+                        help="NAME uniform in [LOW, HIGH] (or drawn from V1,V2), repeatable: --samples random cells")
+    parser.add_argument("--samples", type=int, default=20, help="cells of a --random design")
+    parser.add_argument("--repeats", type=int, help="Config.SWEEP_REPEATS")
+    parser.add_argument("--workers", type=int, help="Config.SWEEP_WORKERS")
+    parser.add_argument("--seed", type=int, help="seed of the runs, the random design and the egg, Config.SWEEP_SEED")
+    parser.add_argument("--egg", help="JSON egg profile, a random egg drawn with --seed without it")
+    parser.add_argument("--generations", type=int, help="Config.NUM_OF_GENERATIONS of every run")
+    parser.add_argument("--set", dest="overrides", type=parse_override, action="append", default=[],
+                        metavar="NAME=VALUE", help="override a Config value for every run, repeatable")
+    args = parser.parse_args()
+
+    if bool(args.grid) == bool(args.random):
+        parser.error("Give either --grid or --random values")
+
+    overrides = dict(args.overrides)
+    if args.generations is not None:
+        overrides["NUM_OF_GENERATIONS"] = args.generations
+    try:
+        base = RunConfig(**overrides)
+        if args.grid:
+            design = grid_design(dict(args.grid))
+        else:
+            design = random_design(dict(args.random), args.samples, args.seed, base)
+        for cell in design:
+            cell_config(cell, base)
+    except ValueError as error:
+        parser.error(str(error))
+
+    start = time.perf_counter()
+    runs = run_sweep(design, read_egg_profile(args.egg, args.seed, base), args.results, args.repeats, args.workers, args.seed, base)
+    rows = summarize(design, runs)
+
+    table_path = args.table if args.table is not None else os.path.splitext(args.results)[0] + ".csv"
+    write_table(table_path, rows)
+    print(f"\n{len(rows)} cells in {time.perf_counter() - start:.1f}s, table in {table_path}")
+    print_table(rows)
+
+if __name__ == "__main__":
+    main()
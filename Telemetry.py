@@ -0,0 +1,184 @@
+"""
+    Per-generation telemetry of the ga loop
+
+    ga.run brackets every generation with begin_generation / end_generation and each of
+    its stages (selection, variation, evaluation, sorting, survival, and the snapshot of
+    ga.main) with stage(name). A MetricsTelemetry turns that into one record per generation:
+
+        {"generation": 12, "seconds": 0.0123, "evaluations": 100, "fronts": 9, "front_0": 31,
+         "stages": {"selection": {"seconds": 0.0011, "allocated_blocks": 12}, ...}}
+
+    allocated_blocks is the change in the interpreter's allocated memory blocks over the
+    stage. Records are kept in memory and passed to hooks, JsonLinesWriter is the hook
+    writing them as JSON lines. NULL_TELEMETRY, the disabled one, does nothing at all.
+"""
+
+import json
+import sys
+import time
+
+from RunConfig import resolve_config
+
+
+class _NullStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+_NULL_STAGE = _NullStage()
+
+class Telemetry:
+    """ Disabled telemetry, every hook is a no-op """
+    enabled = False
+
+    def begin_generation(self, t):
+        pass
+
+    def stage(self, name):
+        """ Context manager timing the stage `name` of the current generation """
+        return _NULL_STAGE
+
+    def count(self, name, value=1):
+        """ Add value to the counter `name` of the current generation """
+        pass
+
+    def set(self, name, value):
+        """ Record value as `name` in the current generation """
+        pass
+
+    def end_generation(self, t, fronts=None):
+        pass
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+NULL_TELEMETRY = Telemetry()
+
+class _Stage:
+    __slots__ = ("telemetry", "name", "start", "blocks")
+
+    def __init__(self, telemetry, name):
+        self.telemetry = telemetry
+        self.name = name
+
+    def __enter__(self):
+        self.blocks = sys.getallocatedblocks()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        seconds = time.perf_counter() - self.start
+        blocks = sys.getallocatedblocks() - self.blocks
+
+        # A stage entered several times in a generation adds up
+        stages = self.telemetry.record["stages"]
+        stage = stages.setdefault(self.name, {"seconds": 0.0, "allocated_blocks": 0})
+        stage["seconds"] += seconds
+        stage["allocated_blocks"] += blocks
+        return False
+
+class MetricsTelemetry(Telemetry):
+    """
+        Collects one record per generation, see the module docstring
+        hooks are called with every finished record, keep_records=False only passes them on
+    """
+    enabled = True
+
+    def __init__(self, hooks=(), keep_records=True):
+        self.hooks = list(hooks)
+        self.keep_records = keep_records
+        self.records = []
+        self.record = None
+        self.start = None
+
+    def add_hook(self, hook):
+        self.hooks.append(hook)
+
+    def begin_generation(self, t):
+        self.record = {"generation": t, "seconds": 0.0, "evaluations": 0, "stages": {}}
+        self.start = time.perf_counter()
+
+    def stage(self, name):
+        return _Stage(self, name)
+
+    def count(self, name, value=1):
+        self.record[name] = self.record.get(name, 0) + value
+
+    def set(self, name, value):
+        self.record[name] = value
+
+    def end_generation(self, t, fronts=None):
+        record = self.record
+        record["seconds"] = time.perf_counter() - self.start
+        if fronts is not None:
+            record["fronts"] = len(fronts)
+            record["front_0"] = len(fronts[0]) if len(fronts) > 0 else 0
+
+        if self.keep_records:
+            self.records.append(record)
+        for hook in self.hooks:
+            hook(record)
+        self.record = None
+
+    def close(self):
+        for hook in self.hooks:
+            if hasattr(hook, "close"):
+                hook.close()
+
+class JsonLinesWriter:
+    """
+        Hook writing every record as one JSON line to file (a path or an open text file)
+        Lines are buffered and written out at most every interval seconds, and on close
+    """
+    def __init__(self, file, interval=None, config=None):
+        self.owns_file = isinstance(file, str)
+        self.file = open(file, "a") if self.owns_file else file
+        self.interval = interval if interval is not None else resolve_config(config).TELEMETRY_INTERVAL
+        self.lines = []
+        self.last_write = time.perf_counter()
+
+    def __call__(self, record):
+        self.lines.append(json.dumps(record))
+        if time.perf_counter() - self.last_write >= self.interval:
+            self.flush()
+
+    def flush(self):
+        if self.lines:
+            self.file.write("\n".join(self.lines) + "\n")
+            self.file.flush()
+            self.lines = []
+        self.last_write = time.perf_counter()
+
+    def close(self):
+        self.flush()
+        if self.owns_file:
+            self.file.close()
+
+def create_telemetry(mode=None, path=None, interval=None, config=None):
+    """ Telemetry for config.TELEMETRY: None (disabled), "memory" or "jsonl" (to path, stderr when None) """
+    config = resolve_config(config)
+    if mode is None:
+        mode = config.TELEMETRY
+    if path is None:
+        path = config.TELEMETRY_PATH
+    if interval is None:
+        interval = config.TELEMETRY_INTERVAL
+
+    if mode is None or mode == "off":
+        return NULL_TELEMETRY
+    if mode == "memory":
+        return MetricsTelemetry()
+    if mode == "jsonl":
+        return MetricsTelemetry([JsonLinesWriter(path if path is not None else sys.stderr, interval)], keep_records=False)
+
+    raise ValueError(f"Unknown telemetry mode: {mode}")
@@ -1,5 +1,12 @@
 import random
+
+import numpy as np
+
 import Config
+import Hla
+from Kernels import get_kernels
+from Population import Population, TOTAL_RESOURCES, shared_generator
+from RunConfig import resolve_config
 
 def create_parent_pairs(mating_pool):
     # Shuffle the pool and pair the individuals
@@ -33,11 +40,23 @@ def sbx_calculate(p1, p2, min_val, max_val, eta):
         c2 = max(min(c2, max_val), min_val)
         return c1, c2
 
-def sbx_crossover(parent1, parent2, eta=Config.eta):
+def sbx_crossover(parent1, parent2, eta=None):
     # Create child sperm instances
     child1 = parent1.copy()
     child2 = parent2.copy()
 
+    sbx_recombine(child1, child2, parent1, parent2, eta)
+
+    return child1, child2
+
+def sbx_recombine(child1, child2, parent1, parent2, eta=None):
+    """SBX on children that start as copies of their parents"""
+    if eta is None:
+        eta = Config.eta
+
+    child1.needs_evaluation = True
+    child2.needs_evaluation = True
+
     # Apply SBX to resource allocation
     child1.genetic_resources, child2.genetic_resources = sbx_calculate(
         parent1.genetic_resources, parent2.genetic_resources, 10, 90, eta
@@ -58,8 +77,6 @@ def sbx_crossover(parent1, parent2, eta=Config.eta):
     crossover_hla_profiles(child1, parent1, parent2)
     crossover_hla_profiles(child2, parent2, parent1)
 
-    return child1, child2
-
 def recalculate_resource_dependent_parameters(sperm):
     """Recalculate biological parameters based on resource allocation"""
     resource_factor = sperm.biological_resources / 100
@@ -80,14 +97,14 @@ def crossover_hla_profiles(child, parent1, parent2):
     # Calculate max HLA size based on genetic resources
     max_hla = min(6, max(2, int(child.genetic_resources / 15)))
     
-    # Combine parent HLA profiles
-    combined_hla = list(set(parent1.hla_profile + parent2.hla_profile))
+    # Combine parent HLA profiles (union of the bitmasks)
+    combined_hla = parent1.hla_mask | parent2.hla_mask
     
-    if len(combined_hla) <= max_hla:
-        child.hla_profile = combined_hla
+    if len(Hla.MASK_BITS[combined_hla]) <= max_hla:
+        child.hla_mask = combined_hla
     else:
         # Randomly select from combined pool
-        child.hla_profile = random.sample(combined_hla, max_hla)
+        child.hla_mask = Hla.random_subset(combined_hla, max_hla)
 
 # ==================================================================================================================================
 
@@ -98,8 +115,12 @@ def mutate_value(value, min_val, max_val, delta, mutation_rate):
         return max(min(y, max_val), min_val)
     return value
 
-def modified_random_mutation(sperm, mutation_rate=Config.MUTATION_RATE, delta=Config.delta):
+def modified_random_mutation(sperm, mutation_rate=None, delta=None):
     """Mutation for resource-based sperm"""
+    if mutation_rate is None:
+        mutation_rate = Config.MUTATION_RATE
+    if delta is None:
+        delta = Config.delta
     
     # Mutate resource allocation
     old_genetic_resources = sperm.genetic_resources
@@ -109,28 +130,33 @@ def modified_random_mutation(sperm, mutation_rate=Config.MUTATION_RATE, delta=Co
     
     # If resources changed, update biological resources and dependent parameters
     if old_genetic_resources != sperm.genetic_resources:
+        sperm.needs_evaluation = True
         sperm.biological_resources = sperm.total_resources - sperm.genetic_resources
         recalculate_resource_dependent_parameters(sperm)
         
         # Adjust HLA profile size if needed
         max_hla = min(6, max(2, int(sperm.genetic_resources / 15)))
-        if len(sperm.hla_profile) > max_hla:
+        hla_size = len(Hla.MASK_BITS[sperm.hla_mask])
+        if hla_size > max_hla:
             # Remove excess alleles
-            sperm.hla_profile = random.sample(sperm.hla_profile, max_hla)
-        elif len(sperm.hla_profile) < max_hla and random.random() < mutation_rate:
+            sperm.hla_mask = Hla.random_subset(sperm.hla_mask, max_hla)
+        elif hla_size < max_hla and random.random() < mutation_rate:
             # Add new alleles if possible
-            possible_alleles = list(set(Config.HLA_ALLELES) - set(sperm.hla_profile))
-            if possible_alleles and len(sperm.hla_profile) < max_hla:
-                added = random.choice(possible_alleles)
-                sperm.hla_profile.append(added)
+            possible_alleles = Hla.FULL_MASK & ~sperm.hla_mask
+            if possible_alleles:
+                sperm.hla_mask |= random.choice(Hla.MASK_BITS[possible_alleles])
     
     # Mutate pH tolerance
+    old_ph_tolerance = sperm.ph_tolerance
     sperm.ph_tolerance = mutate_value(sperm.ph_tolerance, 6.5, 8.5, delta/40.0, mutation_rate)
+    if old_ph_tolerance != sperm.ph_tolerance:
+        sperm.needs_evaluation = True
     
     # Small mutations to biological parameters (within resource constraints)
     if random.random() < mutation_rate:
         noise_factor = 1 + (random.random() - 0.5) * 0.1  # +-5% noise
         resource_factor = sperm.biological_resources / 100
+        sperm.needs_evaluation = True
         
         sperm.dfi = max(0, min(50, sperm.dfi * noise_factor))
         sperm.motility = max(30 * resource_factor, min(100 * resource_factor, sperm.motility * noise_factor))
@@ -140,42 +166,229 @@ def modified_random_mutation(sperm, mutation_rate=Config.MUTATION_RATE, delta=Co
     # HLA mutation (within genetic resource constraints)
     if random.random() < mutation_rate:
         max_hla = min(6, max(2, int(sperm.genetic_resources / 15)))
+        hla_size = len(Hla.MASK_BITS[sperm.hla_mask])
         
-        if len(sperm.hla_profile) > 2 and random.random() < 0.5:
-            # Remove one allele
-            removed = random.choice(sperm.hla_profile)
-            sperm.hla_profile.remove(removed)
-        elif len(sperm.hla_profile) < max_hla:
+        if hla_size > 2 and random.random() < 0.5:
+            # Remove one allele (its bit is set, so XOR clears it)
+            sperm.hla_mask ^= random.choice(Hla.MASK_BITS[sperm.hla_mask])
+            sperm.needs_evaluation = True
+        elif hla_size < max_hla:
             # Add one new allele not already in profile
-            possible_alleles = list(set(Config.HLA_ALLELES) - set(sperm.hla_profile))
+            possible_alleles = Hla.FULL_MASK & ~sperm.hla_mask
             if possible_alleles:
-                added = random.choice(possible_alleles)
-                sperm.hla_profile.append(added)
+                sperm.hla_mask |= random.choice(Hla.MASK_BITS[possible_alleles])
+                sperm.needs_evaluation = True
 
 # ==================================================================================================================================
 
-def crossover_and_mutation(parent1, parent2, crossover_rate=Config.CROSSOVER_RATE, mutation_rate=Config.MUTATION_RATE):
+def crossover_and_mutation(parent1, parent2, crossover_rate=None, mutation_rate=None, eta=None, delta=None):
+    child1 = parent1.copy()
+    child2 = parent2.copy()
+    vary_children(child1, child2, parent1, parent2, crossover_rate, mutation_rate, eta, delta)
+
+    return child1, child2
+
+def vary_children(child1, child2, parent1, parent2, crossover_rate=None, mutation_rate=None, eta=None, delta=None):
+    """Crossover and mutation of children that start as copies of their parents"""
+    if crossover_rate is None:
+        crossover_rate = Config.CROSSOVER_RATE
 
     if random.random() < crossover_rate:
-        child1, child2 = sbx_crossover(parent1, parent2)
-        modified_random_mutation(child1, mutation_rate)
-        modified_random_mutation(child2, mutation_rate)
-    else:
-        child1 = parent1.copy()
-        child2 = parent2.copy()
-        modified_random_mutation(child1, mutation_rate)
-        modified_random_mutation(child2, mutation_rate)
+        sbx_recombine(child1, child2, parent1, parent2, eta)
 
-    return child1, child2
+    modified_random_mutation(child1, mutation_rate, delta)
+    modified_random_mutation(child2, mutation_rate, delta)
+
+def variation(mating_pool, crossover_rate=None, mutation_rate=None, config=None):
+    """ Mode, rates, eta and delta from config (a RunConfig), Config when None, the rates given override it """
+    config = resolve_config(config)
+    if crossover_rate is None:
+        crossover_rate = config.CROSSOVER_RATE
+    if mutation_rate is None:
+        mutation_rate = config.MUTATION_RATE
+    eta, delta = config.eta, config.delta
+
+    if config.VARIATION_MODE == "batched":
+        return batched_variation(mating_pool, crossover_rate, mutation_rate, eta=eta, delta=delta)
+
+    if isinstance(mating_pool, Population):
+        return population_variation(mating_pool, crossover_rate, mutation_rate, eta, delta)
 
-def variation(mating_pool, crossover_rate=Config.CROSSOVER_RATE, mutation_rate=Config.MUTATION_RATE):
     Q_t = []
     
     parent_pairs = create_parent_pairs(mating_pool)
 
     for parent1, parent2 in parent_pairs:
-        child1, child2 = crossover_and_mutation(parent1, parent2, crossover_rate, mutation_rate)
+        child1, child2 = crossover_and_mutation(parent1, parent2, crossover_rate, mutation_rate, eta, delta)
         Q_t.append(child1)
         Q_t.append(child2)
 
-    return Q_t
\ No newline at end of file
+    return Q_t
+
+def population_variation(mating_pool, crossover_rate=None, mutation_rate=None, eta=None, delta=None):
+    """
+        variation for a Population
+        The offspring rows start as copies of their parents and are varied in place through row views
+    """
+    parents = create_parent_pairs(list(range(len(mating_pool))))
+    parent_indexes = [index for pair in parents for index in pair]
+
+    Q_t = mating_pool.take(parent_indexes)
+
+    for k, (parent1, parent2) in enumerate(parents):
+        vary_children(Q_t.view(2 * k), Q_t.view(2 * k + 1),
+                      mating_pool.view(parent1), mating_pool.view(parent2),
+                      crossover_rate, mutation_rate, eta, delta)
+
+    return Q_t
+
+# ==================================================================================================================================
+# Batched variation: the operators above applied to whole columns of a Population at once.
+# Every draw is taken from the shared numpy generator, the offspring follow the same distribution.
+
+def max_hla_sizes(genetic_resources):
+    return np.minimum(6, np.maximum(2, (genetic_resources / 15).astype(np.int64)))
+
+def sbx_calculate_batch(p1, p2, min_val, max_val, eta, generator):
+    """ sbx_calculate over arrays of parent values """
+    low = np.minimum(p1, p2)
+    high = np.maximum(p1, p2)
+
+    k = generator.random(len(p1))
+    beta = np.where(k <= 0.5, (2.0 * k) ** (1.0 / (eta + 1.0)), (1.0 / (2.0 * (1.0 - k))) ** (1.0 / (eta + 1.0)))
+
+    c1 = np.clip(0.5 * ((low + high) - beta * (high - low)), min_val, max_val)
+    c2 = np.clip(0.5 * ((low + high) + beta * (high - low)), min_val, max_val)
+
+    same = np.abs(p1 - p2) < 1e-10
+    return np.where(same, p1, c1), np.where(same, p2, c2)
+
+def recalculate_resource_dependent_columns(population, rows, generator):
+    """ recalculate_resource_dependent_parameters for the given rows """
+    resource_factor = population.biological_resources[rows] / 100
+    size = len(rows)
+
+    population.dfi[rows] = generator.uniform(0, 50, size) * (2 - resource_factor)
+    population.motility[rows] = generator.uniform(30, 100, size) * resource_factor
+    population.morphology[rows] = generator.uniform(10, 100, size) * resource_factor
+    population.velocity[rows] = generator.uniform(10, 100, size) * resource_factor
+
+def add_random_alleles(masks, generator):
+    """ Every mask with one more allele, picked among those it does not have """
+    return masks | Hla.sample_masks(Hla.FULL_MASK & ~masks, np.ones(len(masks), dtype=np.int64), generator)
+
+def sbx_recombine_batch(children, rows1, rows2, eta, generator):
+    """ sbx_recombine for the child pairs (rows1[i], rows2[i]), which still hold copies of their parents """
+    children.needs_evaluation[rows1] = True
+    children.needs_evaluation[rows2] = True
+
+    combined_hla = children.hla_mask[rows1] | children.hla_mask[rows2]
+
+    children.genetic_resources[rows1], children.genetic_resources[rows2] = sbx_calculate_batch(
+        children.genetic_resources[rows1], children.genetic_resources[rows2], 10, 90, eta, generator
+    )
+    for rows in (rows1, rows2):
+        children.biological_resources[rows] = TOTAL_RESOURCES - children.genetic_resources[rows]
+
+    children.ph_tolerance[rows1], children.ph_tolerance[rows2] = sbx_calculate_batch(
+        children.ph_tolerance[rows1], children.ph_tolerance[rows2], 6.5, 8.5, eta, generator
+    )
+
+    for rows in (rows1, rows2):
+        recalculate_resource_dependent_columns(children, rows, generator)
+
+        # crossover_hla_profiles: the union of the parents, or a random subset of it when too large
+        max_hla = max_hla_sizes(children.genetic_resources[rows])
+        too_large = Hla.POPCOUNT[combined_hla] > max_hla
+        masks = combined_hla.copy()
+        masks[too_large] = Hla.sample_masks(combined_hla[too_large], max_hla[too_large], generator)
+        children.hla_mask[rows] = masks
+
+def mutate_values(values, min_val, max_val, delta, mutation_rate, generator):
+    """ mutate_value over an array, the branching runs in the kernel of Config.KERNEL_BACKEND """
+    draws = generator.random(len(values))
+    r = generator.random(len(values))
+    return get_kernels().mutate_values(values, draws, r, min_val, max_val, delta, mutation_rate)
+
+def mutate_batch(population, mutation_rate=None, delta=None, generator=None):
+    """ modified_random_mutation of every row """
+    if mutation_rate is None:
+        mutation_rate = Config.MUTATION_RATE
+    if delta is None:
+        delta = Config.delta
+    if generator is None:
+        generator = shared_generator()
+    size = len(population)
+
+    # Resource allocation
+    old_genetic_resources = population.genetic_resources.copy()
+    population.genetic_resources[:] = mutate_values(old_genetic_resources, 10, 90, delta, mutation_rate, generator)
+
+    changed = np.flatnonzero(population.genetic_resources != old_genetic_resources)
+    population.needs_evaluation[changed] = True
+    population.biological_resources[changed] = TOTAL_RESOURCES - population.genetic_resources[changed]
+    recalculate_resource_dependent_columns(population, changed, generator)
+
+    max_hla = max_hla_sizes(population.genetic_resources[changed])
+    masks = population.hla_mask[changed]
+    hla_sizes = Hla.POPCOUNT[masks]
+    shrink = hla_sizes > max_hla
+    grow = (hla_sizes < max_hla) & (generator.random(len(changed)) < mutation_rate)
+    masks[shrink] = Hla.sample_masks(masks[shrink], max_hla[shrink], generator)
+    masks[grow] = add_random_alleles(masks[grow], generator)
+    population.hla_mask[changed] = masks
+
+    # pH tolerance
+    old_ph_tolerance = population.ph_tolerance.copy()
+    population.ph_tolerance[:] = mutate_values(old_ph_tolerance, 6.5, 8.5, delta / 40.0, mutation_rate, generator)
+    population.needs_evaluation[population.ph_tolerance != old_ph_tolerance] = True
+
+    # Biological noise
+    noisy = np.flatnonzero(generator.random(size) < mutation_rate)
+    noise_factor = 1 + (generator.random(len(noisy)) - 0.5) * 0.1
+    resource_factor = population.biological_resources[noisy] / 100
+    population.needs_evaluation[noisy] = True
+
+    population.dfi[noisy] = np.clip(population.dfi[noisy] * noise_factor, 0, 50)
+    population.motility[noisy] = np.maximum(30 * resource_factor, np.minimum(100 * resource_factor, population.motility[noisy] * noise_factor))
+    population.morphology[noisy] = np.maximum(10 * resource_factor, np.minimum(100 * resource_factor, population.morphology[noisy] * noise_factor))
+    population.velocity[noisy] = np.maximum(10 * resource_factor, np.minimum(100 * resource_factor, population.velocity[noisy] * noise_factor))
+
+    # HLA mutation
+    mutated = np.flatnonzero(generator.random(size) < mutation_rate)
+    max_hla = max_hla_sizes(population.genetic_resources[mutated])
+    masks = population.hla_mask[mutated]
+    hla_sizes = Hla.POPCOUNT[masks]
+    remove = (hla_sizes > 2) & (generator.random(len(mutated)) < 0.5)
+    add = ~remove & (hla_sizes < max_hla)
+    masks[remove] = Hla.sample_masks(masks[remove], hla_sizes[remove] - 1, generator)
+    masks[add] = add_random_alleles(masks[add], generator)
+    population.hla_mask[mutated] = masks
+    population.needs_evaluation[mutated[remove | add]] = True
+
+def batched_variation(mating_pool, crossover_rate=None, mutation_rate=None, generator=None, eta=None, delta=None):
+    """
+        variation of the whole mating pool with array operations
+        A list of Sperm is converted to a Population and back
+    """
+    if not isinstance(mating_pool, Population):
+        return batched_variation(Population.from_sperms(mating_pool), crossover_rate, mutation_rate, generator,
+                                 eta, delta).to_sperms()
+
+    if crossover_rate is None:
+        crossover_rate = Config.CROSSOVER_RATE
+    if eta is None:
+        eta = Config.eta
+    if generator is None:
+        generator = shared_generator()
+
+    # Shuffled pairs, children start as copies of their parents: child1 on even rows, child2 on odd rows
+    pair_num = len(mating_pool) // 2
+    Q_t = mating_pool.take(generator.permutation(len(mating_pool))[: 2 * pair_num])
+
+    crossed = 2 * np.flatnonzero(generator.random(pair_num) < crossover_rate)
+    sbx_recombine_batch(Q_t, crossed, crossed + 1, eta, generator)
+
+    mutate_batch(Q_t, mutation_rate, delta, generator)
+
+    return Q_t
@@ -10,7 +10,7 @@ def plot_fronts(fronts, title=""):
     fig, ax = plt.subplots(figsize=(8, 7))
 
     num_fronts = len(fronts)
-    colormap = cm.get_cmap('nipy_spectral', num_fronts)
+    colormap = plt.get_cmap('nipy_spectral', num_fronts)
 
     for i, front in enumerate(fronts):
         x = [ind.objectives[0] for ind in front]
@@ -1,28 +1,93 @@
-import Config
 from Sperm import Sperm
+from Population import Population, get_column
 from Egg import Egg
-from Evaluate import evaluate_population
-from Visuals import plot_fronts
+from Evaluate import evaluate_population_objectives, crowding_distance_evaluation, IncrementalRanking
+from Objectives import create_evaluator
+from Checkpoint import CheckpointWriter, load_checkpoint, restore_generators
+from History import MemoryHistory, HistoryWriter, is_saved_generation, retained_count
+from Telemetry import NULL_TELEMETRY, create_telemetry
+from Metrics import create_stopping_rule
+from Archive import create_archive
+from Genotype import handle_duplicates
+from RunConfig import RunConfig, resolve_config
 from Selection import crowded_tournament_selection
+from SteadyState import steady_state_generations
 from Variation import variation
 from Survivor import rank_filtering
-import matplotlib.pyplot as plt
-import matplotlib.animation as animation
 import numpy as np
-import time
+from collections import namedtuple
+
+# matplotlib and Visuals are imported by the plotting functions only, a headless run never loads them
+
+# Outcome of run_configured, generation is the last one run and stop_reason why it was the last
+# quality is the last Metrics.FrontQuality record, None unless early stopping or IGD_REFERENCE_FRONT is set
+RunResult = namedtuple("RunResult", ("egg", "population", "fronts", "history", "evaluator", "generation", "stop_reason",
+                                     "archive", "quality"))
+
+def generate_population(size=None, config=None):
+    config = resolve_config(config)
+    if size is None:
+        size = config.POPULATION_SIZE
+
+    if config.POPULATION_BACKEND == "arrays":
+        return Population.random(size, config=config)
 
-def generate_population(size=Config.POPULATION_SIZE):
     P_t = []
     for _ in range(size):
         P_t.append(Sperm())
     
     return P_t
 
+def evaluate_and_sort(population, egg, t, evaluator=None, telemetry=NULL_TELEMETRY, config=None):
+    """ evaluate_population, with the evaluation and the sorting as separate telemetry stages """
+    with telemetry.stage("evaluation"):
+        telemetry.count("evaluations", evaluate_population_objectives(population, egg, t, evaluator, config))
+    with telemetry.stage("sorting"):
+        return crowding_distance_evaluation(population, config)
+
+def evolve_generation(P_t, egg, t, population_size=None, mating_pool_size=None, ranking=None, evaluator=None,
+                      telemetry=NULL_TELEMETRY, config=None):
+    """
+        One NSGA-II generation: selection, variation, ranking of Q_t + P_t and survivor selection
+        Offspring duplicating a genotype of P_t or of each other are handled as set in config.DUPLICATES
+        The operators read their parameters from config (a RunConfig), Config when None
+        Returns the next P_t and the fronts of Q_t + P_t
+    """
+    config = resolve_config(config)
+    if population_size is None:
+        population_size = config.POPULATION_SIZE
+    if mating_pool_size is None:
+        mating_pool_size = config.MATING_POOL_SIZE
+
+    with telemetry.stage("selection"):
+        M_t = crowded_tournament_selection(P_t, mating_pool_size, config)
+    with telemetry.stage("variation"):
+        Q_t = variation(M_t, config=config)
+        if config.DUPLICATES != "keep":
+            Q_t, duplicates = handle_duplicates(Q_t, P_t, config.DUPLICATES)
+            telemetry.count("duplicates", duplicates)
+    if ranking is not None:
+        fronts = ranking.evaluate(Q_t, P_t, egg, t, evaluator, telemetry, config)
+    else:
+        R_t = Q_t + P_t
+        fronts = evaluate_and_sort(R_t, egg, t, evaluator, telemetry, config)
+    with telemetry.stage("survival"):
+        P_t = rank_filtering(fronts, population_size)
+
+    return P_t, fronts
+
 def animate_population_evolution(saved_populations, generation_numbers):
     """
     Animate the evolution of populations with fixed axis limits
     Only includes objective space visualization with enlarged fonts
+    Frame data is extracted into arrays up front, see Render.py for writing it to files
     """
+    import matplotlib.pyplot as plt
+    import matplotlib.animation as animation
+    from Render import extract_frames
+
+    frames = extract_frames(saved_populations, generation_numbers, density_points=float("inf"))
+
     fig, ax1 = plt.subplots(figsize=(10, 10))
 
     # Set font sizes
@@ -42,7 +107,8 @@ def animate_population_evolution(saved_populations, generation_numbers):
     ax1.grid(True, alpha=0.3)
 
     # Scatter plot in objective space
-    scatter = ax1.scatter([], [], s=80, c=[], cmap='viridis', alpha=0.6, edgecolors='black')
+    scatter = ax1.scatter([], [], s=80, c=[], cmap='viridis', norm=plt.Normalize(vmin=10, vmax=90),
+                          alpha=0.6, edgecolors='black')
 
     # Generation text
     gen_text = ax1.text(0.02, 0.98, '', transform=ax1.transAxes,
@@ -55,22 +121,21 @@ def animate_population_evolution(saved_populations, generation_numbers):
     cbar.set_label('Genetic Resources', fontsize=cbar_fontsize)
     cbar.ax.tick_params(labelsize=tick_fontsize)
 
-    def update_plot(frame):
-        population = saved_populations[frame]
-        gen_num = generation_numbers[frame]
+    def init_plot():
+        scatter.set_offsets(np.zeros((0, 2)))
+        gen_text.set_text('')
 
-        x = [ind.objectives[0] for ind in population]
-        y = [ind.objectives[1] for ind in population]
-        colors = [ind.genetic_resources for ind in population]
+        return scatter, gen_text
 
-        scatter.set_offsets(np.c_[x, y])
-        scatter.set_array(np.array(colors))
-        gen_text.set_text(f'Generation: {gen_num}')
+    def update_plot(frame):
+        scatter.set_offsets(frames.data[frame])
+        scatter.set_array(frames.colors[frame])
+        gen_text.set_text(frames.labels[frame])
 
         return scatter, gen_text
 
-    ani = animation.FuncAnimation(fig, update_plot, frames=len(saved_populations),
-                                  interval=100, blit=False, repeat=True)
+    ani = animation.FuncAnimation(fig, update_plot, frames=len(frames.data), init_func=init_plot,
+                                  interval=100, blit=True, repeat=True)
 
     plt.tight_layout()
     plt.show()
@@ -176,57 +241,220 @@ def plot_objective_progression(pareto_front_history, generation_numbers):
             print(f"Correlation between objectives: {correlation:.3f}")
 """
 
-def main():
-    egg = Egg()
-    P_t = generate_population()
+def check_stopping(stopping, t, P_t, fronts, telemetry=NULL_TELEMETRY):
+    """ stopping(t, P_t, fronts), timed, with the front quality it tracked recorded in telemetry """
+    with telemetry.stage("metrics"):
+        reason = stopping(t, P_t, fronts)
+
+    quality = getattr(stopping, "quality", None)
+    if quality is not None and quality.records:
+        for name, value in quality.records[-1].items():
+            if name != "generation":
+                telemetry.set(name, value)
+    if reason is not None:
+        telemetry.set("stop_reason", reason)
+
+    return reason
+
+def run(egg, generations=None, population_size=None, mating_pool_size=None, evaluator=None, on_generation=None,
+        resume_from=None, telemetry=NULL_TELEMETRY, stopping=None, config=None):
+    """
+        Run NSGA-II against egg without plotting, returns the final P_t and fronts
+        config (a RunConfig, Config when None) supplies the sizes left None and the operator parameters
+        on_generation(t, P_t, fronts) is called after the initial evaluation (t=0) and every generation,
+        within the generation's telemetry record
+        resume_from=(t, P_t, fronts) continues after generation t instead of starting from a random population
+        stopping(t, P_t, fronts) is called after on_generation, the run ends early when it returns a reason
+        (see Metrics.HypervolumeStop)
+        With config.LOOP_MODE "steady_state" the generations after the initial one are steady-state ones (SteadyState.py)
+    """
+    config = resolve_config(config)
+    if generations is None:
+        generations = config.NUM_OF_GENERATIONS
+    if population_size is None:
+        population_size = config.POPULATION_SIZE
+    if mating_pool_size is None:
+        mating_pool_size = config.MATING_POOL_SIZE
+
+    own_evaluator = evaluator is None
+    if own_evaluator:
+        evaluator = create_evaluator(egg, config=config)
+
+    def finish_generation(t, P_t, fronts):
+        """ Hook, stopping rule and telemetry record of generation t, returns the reason to stop or None """
+        if on_generation is not None:
+            on_generation(t, P_t, fronts)
+        reason = check_stopping(stopping, t, P_t, fronts, telemetry) if stopping is not None else None
+        telemetry.end_generation(t, fronts)
+        return reason
+
+    if resume_from is None:
+        telemetry.begin_generation(0)
+        with telemetry.stage("initialization"):
+            P_t = generate_population(population_size, config)
+        fronts = evaluate_and_sort(P_t, egg, 1, evaluator, telemetry, config)
+        finish_generation(0, P_t, fronts)
+        first_generation = 1
+    else:
+        last_generation, P_t, fronts = resume_from
+        first_generation = last_generation + 1
+
+    if config.LOOP_MODE == "steady_state":
+        if first_generation <= generations:
+            P_t, fronts = steady_state_generations(P_t, egg, first_generation, generations, evaluator, finish_generation,
+                                                   telemetry, config)
+    else:
+        ranking = IncrementalRanking() if config.RANKING_MODE == "incremental" else None
+
+        for t in range(first_generation, generations + 1):
+            telemetry.begin_generation(t)
+            P_t, fronts = evolve_generation(P_t, egg, t, population_size, mating_pool_size, ranking, evaluator,
+                                            telemetry, config)
+            if finish_generation(t, P_t, fronts) is not None:
+                break
+
+    if own_evaluator:
+        evaluator.close()
+
+    return P_t, fronts
+
+def run_configured(egg=None, on_generation=None, config=None):
+    """
+        The run of ga.main without any plotting: resume, history, checkpoints, telemetry, early stopping and the
+        archive as set in config, a RunConfig of the current Config when None
+        config is applied to Config for the duration of the run, for the modules that read Config directly
+        egg defaults to a random one (or the checkpoint's when resuming)
+        The archive (None when ARCHIVE is off) continues on resume with the individuals saved in the checkpoint
+        Early stopping continues on resume with the front quality records saved in the checkpoint
+        on_generation(t, P_t, fronts) is called once generation t is recorded
+        Returns a RunResult, its evaluator is closed
+    """
+    if config is None:
+        config = RunConfig()
+
+    with config.applied():
+        return configured_run(egg, on_generation, config)
+
+def configured_run(egg, on_generation, config):
+    resume_from = None
+    if config.RESUME_FROM is not None:
+        checkpoint = load_checkpoint(config.RESUME_FROM)
+        egg = checkpoint.egg
+        evaluator = create_evaluator(egg, config=config)
+        restore_generators(checkpoint, evaluator)
+        resume_from = (checkpoint.generation, checkpoint.population, checkpoint.fronts)
+    else:
+        if egg is None:
+            egg = Egg()
+        evaluator = create_evaluator(egg, config=config)
     
     # Storage for Task 1 and Task 2
-    saved_populations = []
-    pareto_front_history = []
-    generation_numbers = []
-    
-    # Initial evaluation
-    fronts = evaluate_population(P_t, egg)
-    plot_fronts(fronts)
-    
-    # Save initial state
-    saved_populations.append([ind.copy() for ind in P_t])
-    pareto_front_history.append([ind.copy() for ind in fronts[0]])
-    generation_numbers.append(0)
-    
-    # Print initial resource distribution
-    print("\nInitial Population Resource Distribution:")
-    genetic_resources = [ind.genetic_resources for ind in P_t]
-    print(f"Genetic Resources - Min: {min(genetic_resources):.1f}, "
-          f"Max: {max(genetic_resources):.1f}, "
-          f"Mean: {np.mean(genetic_resources):.1f}")
-
-    for t in range(1, Config.NUM_OF_GENERATIONS + 1):
-        print(f"\nGeneration NO: {t}")
-
-        M_t = crowded_tournament_selection(P_t, Config.MATING_POOL_SIZE)
-        Q_t = variation(M_t, Config.CROSSOVER_RATE, Config.MUTATION_RATE)
-        R_t = Q_t + P_t
-        fronts = evaluate_population(R_t, egg, t)
-        P_t = rank_filtering(fronts, Config.POPULATION_SIZE)
-        
-        # Save populations and fronts at specified intervals
-        if t % Config.SAVE_EACH_N_GENERATION == 0 or t == 2 or t == 4 or t == 6 or t == 8 or t == 15 or t == 25 or t == 35 or t == 45:
-            saved_populations.append([ind.copy() for ind in P_t])
-            pareto_front_history.append([ind.copy() for ind in fronts[0]])
-            generation_numbers.append(t)
-            print(f"  -> Saved population and Pareto front at generation {t}")
+    if config.HISTORY_PATH is not None:
+        history = HistoryWriter(config.HISTORY_PATH, retained_count(config=config),
+                                checkpoint.generation if resume_from is not None else None, config=config)
+    elif resume_from is not None and checkpoint.history is not None:
+        history = MemoryHistory(retained_count(config=config), *checkpoint.history)
+    else:
+        history = MemoryHistory(retained_count(config=config))
+
+    checkpoints = CheckpointWriter(config.CHECKPOINT_PATH)
+
+    # Per-generation progress goes to the telemetry records, see Config.TELEMETRY
+    telemetry = create_telemetry(config=config)
+
+    # Non-dominated individuals of every generation, the final answer without rescanning the history
+    archive = create_archive(config=config) if config.ARCHIVE else None
+    if archive is not None and resume_from is not None:
+        if checkpoint.archive is not None:
+            archive.restore(checkpoint.archive)
+        else:
+            archive.update(checkpoint.fronts[0])
+
+    stopping = create_stopping_rule(config, checkpoint if resume_from is not None else None)
+
+    def record_generation(t, P_t, fronts):
+        if evaluator.genotypes is not None:
+            telemetry.set("evaluations_saved", evaluator.genotypes.saved)
+
+        if archive is not None:
+            with telemetry.stage("archive"):
+                telemetry.count("archived", archive.update(fronts[0]))
+            telemetry.set("archive_size", len(archive))
+
+        # Save populations and fronts following Config.HISTORY_RETENTION, the initial state always is
+        if is_saved_generation(t, config=config):
+            with telemetry.stage("snapshot"):
+                history.append(t, P_t, fronts[0])
+            telemetry.count("saved")
+
+        if config.CHECKPOINT_PATH is not None and t > 0 and t % config.CHECKPOINT_EVERY == 0:
+            # An on-disk history is already durable, HistoryWriter(resume_after=...) picks it up again
+            with telemetry.stage("snapshot"):
+                checkpoints.save(egg, t, P_t, fronts, evaluator,
+                                 history.as_tuple() if isinstance(history, MemoryHistory) else None,
+                                 stopping.quality.state() if stopping is not None else None,
+                                 archive.individuals() if archive is not None else None)
+            telemetry.count("checkpointed")
+
+        if on_generation is not None:
+            on_generation(t, P_t, fronts)
+
+    P_t, fronts = run(egg, evaluator=evaluator, on_generation=record_generation, resume_from=resume_from,
+                      telemetry=telemetry, stopping=stopping, config=config)
+    evaluator.close()
+    telemetry.close()
+
+    generation, stop_reason, quality = config.NUM_OF_GENERATIONS, None, None
+    if stopping is not None:
+        if stopping.reason is not None:
+            generation, stop_reason = stopping.generation, stopping.reason
+        quality = stopping.quality.records[-1] if stopping.quality.records else None
+
+    # Saved generations, read lazily from disk for an on-disk history
+    return RunResult(egg, P_t, fronts, history.read(), evaluator, generation, stop_reason, archive, quality)
+
+def main():
+    from Visuals import plot_fronts
+
+    def show_initial_population(t, P_t, fronts):
+        if t != 0:
+            return
+
+        plot_fronts(fronts)
 
+        # Print initial resource distribution
+        print("\nInitial Population Resource Distribution:")
+        genetic_resources = get_column(P_t, "genetic_resources")
+        print(f"Genetic Resources - Min: {min(genetic_resources):.1f}, "
+              f"Max: {max(genetic_resources):.1f}, "
+              f"Mean: {np.mean(genetic_resources):.1f}")
 
+    config = RunConfig()
+    if config.RESUME_FROM is not None:
+        print(f"Resuming {config.RESUME_FROM}")
+    result = run_configured(on_generation=show_initial_population, config=config)
+    fronts, saved = result.fronts, result.history
+    if result.stop_reason is not None:
+        print(f"Early stop: {result.stop_reason}")
+    if result.quality is not None:
+        print("Front 0 quality: " + ", ".join(f"{name} {value:.4g}" for name, value in result.quality.items()
+                                            if name != "generation"))
+    if result.archive is not None:
+        print(f"{len(result.archive)} non-dominated individuals archived over the run")
+    if result.evaluator.genotypes is not None:
+        print(f"{result.evaluator.genotypes.saved} evaluations of duplicate genotypes saved")
     
     # Task 1: Animate population evolution
-    ani = animate_population_evolution(saved_populations, generation_numbers)
+    ani = animate_population_evolution(saved.populations, saved.generation_numbers)
     
     # Task 2: Plot objective progression
-    #plot_objective_progression(pareto_front_history, generation_numbers)
+    #plot_objective_progression(saved.fronts, saved.generation_numbers)
     
-    # Final Pareto front visual
-    plot_fronts(fronts)
+    # Final Pareto front visual, the archive is the run's answer when there is one
+    if result.archive is not None:
+        plot_fronts([result.archive.individuals()], title="Archived non-dominated individuals")
+    else:
+        plot_fronts(fronts)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
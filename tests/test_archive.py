@@ -0,0 +1,50 @@
+"""
+    Pareto archives against a quadratic non-dominated filter
+"""
+
+import numpy as np
+import pytest
+
+from Archive import ParetoArchive2D, NDTreeArchive
+
+
+def archive_class(objective_num):
+    return ParetoArchive2D if objective_num == 2 else NDTreeArchive
+
+def quadratic_filter(points):
+    """ Minimization, a point is dropped when another one is nowhere worse, and for equal points all but the first """
+    weakly_dominated = np.all(points[:, None, :] <= points[None, :, :], axis=2)
+    is_equal = np.all(points[:, None, :] == points[None, :, :], axis=2)
+    dropped = (weakly_dominated & ~is_equal).any(axis=0) | np.triu(is_equal, 1).any(axis=0)
+    return sorted(map(tuple, points[~dropped].tolist()))
+
+@pytest.mark.parametrize("objective_num", [2, 3, 5])
+@pytest.mark.parametrize("seed", range(5))
+def test_archive_matches_quadratic_filter(objective_num, seed):
+    # Rounded random points, with many ties
+    points = np.round(np.random.default_rng(seed).random((500, objective_num)), 2)
+    archive = archive_class(objective_num)()
+    for point in points.tolist():
+        archive.add(tuple(point), lambda: None)
+
+    expected = quadratic_filter(points)
+    assert sorted(point for point, _ in archive.entries()) == expected
+    assert len(archive) == len(expected)
+
+@pytest.mark.parametrize("objective_num", [2, 3])
+def test_prune_does_not_depend_on_insertion_order(objective_num):
+    # Evenly spaced points on a line all have the same crowding distance, prune has to break the ties
+    generator = np.random.default_rng(0)
+    line = np.arange(300, dtype=float)
+    points = np.column_stack([line, line[::-1]] + [np.zeros(300)] * (objective_num - 2)).tolist()
+
+    kept = []
+    for order in (points, points[::-1], [points[i] for i in generator.permutation(len(points))]):
+        archive = archive_class(objective_num)()
+        for point in order:
+            archive.add(tuple(point), lambda: None)
+        archive.prune(50)
+        kept.append(sorted(point for point, _ in archive.entries()))
+
+    assert len(kept[0]) == 50
+    assert kept[0] == kept[1] == kept[2]
@@ -0,0 +1,36 @@
+"""
+    The simulator evaluator against the serial evaluator computing in process
+"""
+
+import numpy as np
+import pytest
+
+from Egg import Egg
+from Objectives import create_evaluator, SerialEvaluator
+from Population import Population, seed_generators
+from Simulator import BackgroundSimulator
+
+
+@pytest.fixture(scope="module")
+def population():
+    seed_generators(0)
+    return Population.random(200)
+
+@pytest.mark.parametrize("chunk_size, concurrency", [(1, 1), (64, 1), (1, 8), (16, 8)])
+def test_async_matches_serial(population, chunk_size, concurrency):
+    egg = Egg()
+    expected = SerialEvaluator(egg, chunk_size=chunk_size).evaluate(population)
+    with BackgroundSimulator(latency=0.0, row_latency=0.0) as simulator:
+        with create_evaluator(egg, "async", chunk_size=chunk_size, address=simulator.address,
+                              concurrency=concurrency) as evaluator:
+            assert np.array_equal(evaluator.evaluate(population), expected)
+
+def test_async_retries_failed_requests(population):
+    # Dropped and stalled requests are retried, every row still gets the objectives the serial path computes
+    egg = Egg()
+    expected = SerialEvaluator(egg, chunk_size=16).evaluate(population)
+    with BackgroundSimulator(latency=0.0, row_latency=0.0, failure_rate=0.3) as simulator:
+        with create_evaluator(egg, "async", chunk_size=16, address=simulator.address, concurrency=8,
+                              timeout=0.2, retries=10, retry_delay=0.0) as evaluator:
+            assert np.array_equal(evaluator.evaluate(population), expected)
+            assert evaluator.retried > 0
@@ -0,0 +1,82 @@
+"""
+    Genotype keys, the index of evaluated genotypes and duplicate offspring
+"""
+
+import numpy as np
+
+import Hla
+from Egg import Egg
+from Genotype import GenotypeIndex, duplicate_offspring, genotype_keys
+from Objectives import SerialEvaluator
+from Population import Population, seed_generators
+from RunConfig import RunConfig
+from Variation import population_variation
+
+
+def cached_evaluator(egg):
+    return SerialEvaluator(egg, config=RunConfig(GENOTYPE_CACHE=True, GENOTYPE_CACHE_SIZE=None))
+
+def test_index_drops_the_oldest_genotypes():
+    seed_generators(0)
+    population = Population.random(5)
+    population.raw_objectives[:] = np.arange(10).reshape(5, 2)
+    index = GenotypeIndex(max_size=3)
+
+    index.add(population, np.arange(2))
+    index.add(population, np.arange(2))
+    assert len(index) == 2
+    index.add(population, np.arange(5))
+    assert list(index.objectives) == genotype_keys(population, np.arange(2, 5))
+
+def test_no_crossover_pair_is_a_duplicate():
+    seed_generators(0)
+    egg = Egg()
+    parents = Population.random(2)
+    evaluator = cached_evaluator(egg)
+    evaluator.evaluate_raw_objectives(parents)
+
+    children = population_variation(parents, crossover_rate=0.0, mutation_rate=0.0)
+    assert duplicate_offspring(children, parents).all()
+    # Copies keep their parent's objectives, nothing is evaluated
+    assert not children.needs_evaluation.any()
+    assert evaluator.evaluate_raw_objectives(children) == 0
+
+    # Flagged stale, they are filled from the index
+    children.needs_evaluation[:] = True
+    assert evaluator.evaluate_raw_objectives(children) == 0
+    assert evaluator.genotypes.saved == 2
+    assert sorted(map(tuple, children.raw_objectives.tolist())) == sorted(map(tuple, parents.raw_objectives.tolist()))
+
+def test_hla_mutation_repeating_a_clone_is_reused():
+    seed_generators(0)
+    egg = Egg()
+    parent = Population.random(1)
+    evaluator = cached_evaluator(egg)
+    evaluator.evaluate_raw_objectives(parent)
+
+    # Two clones of the parent gain the same allele, the second one is not evaluated again
+    allele = Hla.MASK_BITS[Hla.FULL_MASK & ~int(parent.hla_mask[0])][0]
+    for evaluated in (1, 0):
+        clone = parent.copy()
+        clone.hla_mask[0] |= allele
+        clone.needs_evaluation[:] = True
+        assert evaluator.evaluate_raw_objectives(clone) == evaluated
+    assert evaluator.genotypes.saved == 1
+
+def test_sbx_of_identical_parents_is_a_new_genotype():
+    seed_generators(0)
+    egg = Egg()
+    parents = Population.random(1).take([0, 0])
+    evaluator = cached_evaluator(egg)
+    # Equal rows of one batch are evaluated once
+    assert evaluator.evaluate_raw_objectives(parents) == 1
+    assert evaluator.genotypes.saved == 1
+
+    children = population_variation(parents, crossover_rate=1.0, mutation_rate=0.0)
+    # SBX keeps the resources, pH and alleles of identical parents, and redraws the biological parameters
+    assert np.array_equal(children.genetic_resources, parents.genetic_resources)
+    assert np.array_equal(children.ph_tolerance, parents.ph_tolerance)
+    assert np.array_equal(children.hla_mask, parents.hla_mask)
+    assert not duplicate_offspring(children, parents).any()
+    assert evaluator.evaluate_raw_objectives(children) == 2
+    assert evaluator.genotypes.saved == 1
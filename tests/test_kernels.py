@@ -0,0 +1,150 @@
+"""
+    Kernel backends against straightforward Python versions of the same loops
+    The numba cases are skipped when numba is not installed
+"""
+
+import numpy as np
+import pytest
+
+import Config
+from Kernels import get_kernels
+
+
+@pytest.fixture(params=["numpy", "numba"])
+def kernels(request):
+    if request.param == "numba":
+        pytest.importorskip("numba")
+    return get_kernels(request.param)
+
+def tied_objectives(size, objective_num, seed=0):
+    """ Rounded random objectives, with many ties and duplicate rows """
+    return np.round(np.random.default_rng(seed).random((size, objective_num)), 1)
+
+def dominates(a, b):
+    return all(x <= y for x, y in zip(a, b)) and any(x < y for x, y in zip(a, b))
+
+def reference_crowding_distances(objectives, fronts, obj_mins, obj_maxes):
+    """ Every front sorted on its own with list.sort, as crowding_distance_evaluation used to """
+    crowding_distance = np.full(len(objectives), -1.0)
+    reordered = []
+    for front in fronts:
+        order = list(front)
+        if len(order) < 3:
+            crowding_distance[order] = float('inf')
+            reordered.append(order)
+            continue
+
+        crowding_distance[order] = 0.0
+        for i in range(objectives.shape[1]):
+            order.sort(key=lambda j: objectives[j, i])
+            crowding_distance[order[0]] = float('inf')
+            crowding_distance[order[-1]] = float('inf')
+            if obj_maxes[i] != obj_mins[i]:
+                for k in range(1, len(order) - 1):
+                    crowding_distance[order[k]] += (objectives[order[k + 1], i] - objectives[order[k - 1], i]) / (obj_maxes[i] - obj_mins[i])
+        reordered.append(order)
+
+    return crowding_distance, reordered
+
+def crowding_cases(size, objective_num, seed):
+    """ Objectives and fronts mixing large fronts with fronts of 1 and 2 rows """
+    objectives = tied_objectives(size, objective_num, seed)
+    rows = np.random.default_rng(seed).permutation(size)
+    sizes = [1, 2, size // 2, 1, size - size // 2 - 5, 2, 1]
+    fronts = np.split(rows, np.cumsum(sizes)[:-1])
+    return objectives, [front for front in fronts if len(front) > 0]
+
+# ==================================================================================================================================
+
+@pytest.mark.parametrize("objective_num", [2, 3, 5])
+def test_any_dominates(kernels, objective_num):
+    points = tied_objectives(200, objective_num)
+    candidates = tied_objectives(50, objective_num, seed=1)
+
+    expected = [any(dominates(c, p) for c in candidates) for p in points]
+    assert kernels.any_dominates(points, candidates).tolist() == expected
+
+def test_any_dominates_equal_rows(kernels):
+    points = np.array([[0.5, 0.5], [0.5, 0.6]])
+    assert kernels.any_dominates(points, points[:1]).tolist() == [False, True]
+
+def test_any_dominates_empty(kernels):
+    points = tied_objectives(4, 2)
+    assert kernels.any_dominates(points, np.empty((0, 2))).tolist() == [False] * 4
+    assert len(kernels.any_dominates(np.empty((0, 2)), points)) == 0
+
+@pytest.mark.parametrize("objective_num", [2, 3, 5])
+def test_is_dominated(kernels, objective_num):
+    points = tied_objectives(200, objective_num)
+    candidates = tied_objectives(50, objective_num, seed=1)
+
+    assert [bool(kernels.is_dominated(p, candidates)) for p in points] == kernels.any_dominates(points, candidates).tolist()
+    assert not kernels.is_dominated(points[0], points[:0])
+
+@pytest.mark.parametrize("objective_num", [2, 3, 5])
+@pytest.mark.parametrize("seed", range(3))
+def test_crowding_distances(kernels, objective_num, seed):
+    # Every column counts, whatever Config.OBJECTIVE_NUM (2) says
+    objectives, fronts = crowding_cases(60, objective_num, seed)
+    if seed == 2:
+        # A constant objective has no range, it adds nothing to the distances
+        objectives[:, 0] = 0.5
+    obj_mins, obj_maxes = objectives.min(axis=0), objectives.max(axis=0)
+
+    crowding_distance = np.full(len(objectives), -1.0)
+    reordered = kernels.crowding_distances(objectives, fronts, obj_mins, obj_maxes, crowding_distance)
+    expected, expected_order = reference_crowding_distances(objectives, fronts, obj_mins, obj_maxes)
+
+    assert np.array_equal(crowding_distance, expected)
+    assert [front.tolist() for front in reordered] == expected_order
+
+@pytest.mark.parametrize("size", [1, 2])
+def test_crowding_distances_small_fronts(kernels, size):
+    objectives = np.array([[0.3, 0.1], [0.1, 0.3]])[:size]
+    front = np.arange(size)[::-1]
+
+    crowding_distance = np.zeros(size)
+    reordered = kernels.crowding_distances(objectives, [front], objectives.min(axis=0), objectives.max(axis=0), crowding_distance)
+
+    assert np.all(np.isinf(crowding_distance))
+    assert reordered[0].tolist() == front.tolist()
+
+def test_crowding_distances_no_fronts(kernels):
+    assert len(kernels.crowding_distances(np.empty((0, 2)), [], [], [], np.empty(0))) == 0
+
+def test_mutate_values(kernels):
+    generator = np.random.default_rng(0)
+    values = generator.uniform(10, 90, 1000)
+    values[:10] = [10, 90] * 5
+    draws, r = generator.random(1000), generator.random(1000)
+
+    expected = [min(max(v + 40 * (x - 0.5), 10), 90) if d < 0.3 else v for v, d, x in zip(values, draws, r)]
+    mutated = kernels.mutate_values(values, draws, r, 10, 90, 40, 0.3)
+
+    assert mutated.tolist() == expected
+    assert mutated is not values
+
+def test_backends_agree():
+    """ numba returns exactly what numpy does, bit for bit """
+    pytest.importorskip("numba")
+    numpy_kernels, numba_kernels = get_kernels("numpy"), get_kernels("numba")
+
+    objectives, fronts = crowding_cases(300, 3, seed=4)
+    obj_mins, obj_maxes = objectives.min(axis=0), objectives.max(axis=0)
+    distances = []
+    for kernels in (numpy_kernels, numba_kernels):
+        crowding_distance = np.zeros(len(objectives))
+        order = np.concatenate(kernels.crowding_distances(objectives, fronts, obj_mins, obj_maxes, crowding_distance))
+        distances.append((crowding_distance, order))
+
+    assert np.array_equal(distances[0][0], distances[1][0])
+    assert np.array_equal(distances[0][1], distances[1][1])
+    assert np.array_equal(numpy_kernels.any_dominates(objectives, objectives[fronts[2]]),
+                          numba_kernels.any_dominates(objectives, objectives[fronts[2]]))
+    assert [bool(numpy_kernels.is_dominated(point, objectives[fronts[2]])) for point in objectives] == \
+        [bool(numba_kernels.is_dominated(point, objectives[fronts[2]])) for point in objectives]
+
+    generator = np.random.default_rng(4)
+    values, draws, r = generator.uniform(10, 90, 1000), generator.random(1000), generator.random(1000)
+    assert np.array_equal(numpy_kernels.mutate_values(values, draws, r, 10, 90, Config.delta, 0.3),
+                          numba_kernels.mutate_values(values, draws, r, 10, 90, Config.delta, 0.3))
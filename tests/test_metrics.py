@@ -0,0 +1,54 @@
+"""
+    Front quality metrics: the incremental 2-objective hypervolume and the IGD of a configured run
+"""
+
+import numpy as np
+import pytest
+
+import ga
+import Sorting
+from Egg import Egg
+from Metrics import FrontQuality, Hypervolume2D, hypervolume, hypervolume_2d
+from Population import seed_generators
+from RunConfig import RunConfig
+
+
+def non_dominated(points):
+    return points[Sorting.sort_fronts(points, "ens", [True, True])[0]]
+
+@pytest.mark.parametrize("seed", range(5))
+def test_hypervolume_2d_updates_match_sweep(seed):
+    generator = np.random.default_rng(seed)
+    reference = np.array([1.0, 1.0])
+    tracker = Hypervolume2D(reference)
+    points = non_dominated(np.round(generator.random((30, 2)), 2))
+    tracker.reset(points)
+
+    for _ in range(50):
+        # A few new points, some outside the reference box, some repeated, replace the ones they dominate
+        offspring = np.round(generator.random((generator.integers(1, 6), 2)) * 1.1, 2)
+        points = non_dominated(np.vstack((points, offspring, points[:2])))
+        assert tracker.update(points) == pytest.approx(hypervolume_2d(points, reference), rel=1e-12, abs=1e-15)
+
+def test_front_quality_matches_hypervolume():
+    generator = np.random.default_rng(0)
+    quality = FrontQuality(is_minimization=[False, False])
+    points = np.empty((0, 2))
+    for t in range(20):
+        points = -non_dominated(-np.vstack((points, generator.random((5, 2)))))
+        record = quality.update(t, [type("Individual", (), {"objectives": row})() for row in points])
+        assert record["hypervolume"] == pytest.approx(hypervolume(points, is_minimization=[False, False]), rel=1e-12)
+
+def test_igd_is_reported(tmp_path):
+    seed_generators(0)
+    reference_front = np.column_stack((np.linspace(0, 1, 11), np.linspace(1, 0, 11)))
+    path = tmp_path / "reference.txt"
+    np.savetxt(path, reference_front)
+
+    config = RunConfig(NUM_OF_GENERATIONS=5, POPULATION_SIZE=20, MATING_POOL_SIZE=20, TELEMETRY=None,
+                       IGD_REFERENCE_FRONT=str(path))
+    result = ga.run_configured(Egg(), config=config)
+
+    assert result.stop_reason is None
+    assert result.quality["generation"] == 5
+    assert 0 < result.quality["igd"] < np.inf
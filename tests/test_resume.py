@@ -0,0 +1,57 @@
+"""
+    A run resumed from a checkpoint against the same run left uninterrupted
+"""
+
+import numpy as np
+import pytest
+
+import ga
+from Egg import Egg
+from Population import COLUMNS, Population, seed_generators
+from RunConfig import RunConfig
+
+GENERATIONS = 150
+CHECKPOINT_GENERATION = 60
+
+
+def columns(P_t):
+    population = P_t if isinstance(P_t, Population) else Population.from_sperms(P_t)
+    return {name: getattr(population, name) for name in COLUMNS}
+
+def seeded_run(config, seed=3):
+    seed_generators(seed)
+    return ga.run_configured(Egg(), config=config)
+
+@pytest.mark.parametrize("backend", ["objects", "arrays"])
+def test_resumed_run_stops_like_uninterrupted(tmp_path, backend):
+    config = RunConfig(NUM_OF_GENERATIONS=GENERATIONS, POPULATION_SIZE=40, MATING_POOL_SIZE=40, POPULATION_BACKEND=backend,
+                       TELEMETRY=None, STOP_EPSILON=1e-3, STOP_WINDOW=10, STOP_MIN_GENERATIONS=20)
+    checkpoint_path = str(tmp_path / "checkpoint.npz")
+
+    uninterrupted = seeded_run(config)
+    assert CHECKPOINT_GENERATION < uninterrupted.generation < GENERATIONS
+
+    seeded_run(config.replace(NUM_OF_GENERATIONS=CHECKPOINT_GENERATION, CHECKPOINT_PATH=checkpoint_path,
+                              CHECKPOINT_EVERY=CHECKPOINT_GENERATION))
+    resumed = ga.run_configured(config=config.replace(RESUME_FROM=checkpoint_path))
+
+    assert resumed.generation == uninterrupted.generation
+    assert resumed.stop_reason == uninterrupted.stop_reason
+    expected = columns(uninterrupted.population)
+    for name, values in columns(resumed.population).items():
+        assert np.array_equal(values, expected[name]), name
+
+def test_resumed_archive_matches_uninterrupted(tmp_path):
+    # A small ARCHIVE_MAX_SIZE prunes before and after the checkpoint
+    config = RunConfig(NUM_OF_GENERATIONS=30, POPULATION_SIZE=20, MATING_POOL_SIZE=20, TELEMETRY=None,
+                       ARCHIVE=True, ARCHIVE_MAX_SIZE=10)
+    checkpoint_path = str(tmp_path / "checkpoint.npz")
+
+    uninterrupted = seeded_run(config)
+
+    seeded_run(config.replace(NUM_OF_GENERATIONS=15, CHECKPOINT_PATH=checkpoint_path, CHECKPOINT_EVERY=15))
+    resumed = ga.run_configured(config=config.replace(RESUME_FROM=checkpoint_path))
+
+    expected = uninterrupted.archive.objectives()
+    assert len(expected) == 10
+    assert np.array_equal(np.unique(resumed.archive.objectives(), axis=0), np.unique(expected, axis=0))
@@ -0,0 +1,39 @@
+"""
+    Loop and batched crowded tournament selection, binary and k-way
+"""
+
+from math import comb
+
+import numpy as np
+import pytest
+
+from Population import Population, seed_generators
+from RunConfig import RunConfig
+from Selection import crowded_tournament_selection
+
+
+def ranked_population(size):
+    """ Feasible individuals, row i ranked i + 1 """
+    population = Population(size)
+    population.objectives[:] = 1.0
+    population.rank[:] = np.arange(1, size + 1)
+    return population
+
+@pytest.mark.parametrize("mode", ["loop", "batched"])
+@pytest.mark.parametrize("tournament_size", [2, 3, 5])
+def test_winner_frequencies(mode, tournament_size, size=10, draws=20_000):
+    # Row i wins when it is drawn with tournament_size - 1 of the worse rows
+    seed_generators(0)
+    config = RunConfig(SELECTION_MODE=mode, TOURNAMENT_SIZE=tournament_size)
+    winners = crowded_tournament_selection(ranked_population(size), draws, config).rank - 1
+
+    expected = [comb(size - 1 - i, tournament_size - 1) / comb(size, tournament_size) for i in range(size)]
+    assert np.allclose(np.bincount(winners, minlength=size) / draws, expected, atol=0.015)
+
+@pytest.mark.parametrize("mode", ["loop", "batched"])
+def test_tournament_of_the_whole_population(mode):
+    seed_generators(0)
+    config = RunConfig(SELECTION_MODE=mode, TOURNAMENT_SIZE=6)
+    assert crowded_tournament_selection(ranked_population(6), 50, config).rank.tolist() == [1] * 50
+    with pytest.raises(ValueError):
+        crowded_tournament_selection(ranked_population(5), 50, config)
@@ -0,0 +1,44 @@
+"""
+    Sorting engines against the naive front peeling of Evaluate.naive_nondominated_sorting
+"""
+
+import numpy as np
+import pytest
+
+import Sorting
+from Evaluate import naive_nondominated_sorting
+
+
+class Individual:
+    """ Minimal stand-in exposing only what the naive sort reads """
+    def __init__(self, objectives):
+        self.objectives = objectives
+        self.rank = 0
+
+def naive_fronts(objectives):
+    population = [Individual(row) for row in objectives.tolist()]
+    index_of = {id(individual): i for i, individual in enumerate(population)}
+    return [sorted(index_of[id(individual)] for individual in front) for front in naive_nondominated_sorting(population)]
+
+@pytest.mark.parametrize("engine", ["deb", "ens", "sweep2d"])
+@pytest.mark.parametrize("decimals", [1, 2, 5])
+@pytest.mark.parametrize("seed", range(3))
+def test_engine_matches_naive_sort(engine, decimals, seed):
+    # Few decimals give many ties and duplicate rows
+    objectives = np.round(np.random.default_rng(seed).random((300, 2)), decimals)
+    fronts = Sorting.sort_fronts(objectives, engine)
+    assert [front.tolist() for front in fronts] == naive_fronts(objectives)
+
+@pytest.mark.parametrize("engine", ["deb", "ens"])
+@pytest.mark.parametrize("objective_num", [3, 5])
+def test_engine_matches_naive_sort_many_objectives(monkeypatch, engine, objective_num):
+    # The naive sort reads the objective count and directions from Config
+    monkeypatch.setattr(Sorting.Config, "OBJECTIVE_NUM", objective_num)
+    monkeypatch.setattr(Sorting.Config, "IS_MINIMIZATION_OBJECTIVE", [False] * objective_num)
+    objectives = np.round(np.random.default_rng(objective_num).random((200, objective_num)), 1)
+    fronts = Sorting.sort_fronts(objectives, engine)
+    assert [front.tolist() for front in fronts] == naive_fronts(objectives)
+
+def test_single_and_empty_population():
+    assert [front.tolist() for front in Sorting.sort_fronts(np.array([[0.5, 0.5]]), "ens")] == [[0]]
+    assert Sorting.sort_fronts(np.empty((0, 2)), "ens") == []
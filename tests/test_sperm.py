@@ -0,0 +1,32 @@
+"""
+    Sperm clones, snapshots and the HLA profile stored as a bitmask
+"""
+
+import pytest
+
+from Population import Population, seed_generators
+from Sperm import Sperm
+
+
+def test_hla_profile_is_read_only():
+    seed_generators(0)
+    sperm = Sperm()
+    profile = sperm.hla_profile
+    with pytest.raises(AttributeError):
+        profile.append("A*01:01")
+
+    sperm.hla_profile = ["A*01:01", "B*08:01"]
+    assert sperm.hla_profile == ("A*01:01", "B*08:01")
+    assert sperm.snapshot().hla_profile == sperm.hla_profile
+    assert Population.from_sperms([sperm])[0].hla_profile == sperm.hla_profile
+
+def test_copy_and_snapshot_round_trip():
+    seed_generators(0)
+    sperm = Sperm()
+    snapshot = sperm.snapshot()
+    assert snapshot.to_sperm().snapshot() == snapshot
+
+    clone = sperm.copy()
+    clone.objectives[0] = 1.0
+    assert sperm.objectives[0] != 1.0
+    assert clone.snapshot()._replace(objectives=snapshot.objectives) == snapshot
@@ -0,0 +1,86 @@
+"""
+    Steady-state insertion against a full sort after every insertion
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+import ga
+from Egg import Egg
+from Evaluate import population_crowding_distance_evaluation
+from Objectives import SerialEvaluator, evaluate_chunk
+from Population import Population, seed_generators
+from RunConfig import RunConfig
+from SteadyState import SteadyStatePopulation
+
+
+def objective_population(objectives):
+    """ Population holding only the given objectives, evaluated """
+    population = Population(len(objectives), objectives.shape[1])
+    population.objectives[:] = objectives
+    population.raw_objectives[:] = objectives
+    population.needs_evaluation[:] = False
+    return population
+
+def sorted_rows(objectives):
+    return objectives[np.lexsort(objectives.T[::-1])]
+
+@pytest.mark.parametrize("seed", range(3))
+def test_insertion_matches_full_sort(seed, size=200, insertions=500):
+    # Rounded points with many ties
+    generator = np.random.default_rng(seed)
+    population = objective_population(np.round(generator.random((size, 2)), 2))
+    state = SteadyStatePopulation(population)
+
+    for i in range(insertions):
+        # Offspring drifting towards better values, as in a run, so the bounds move too
+        offspring = np.round(generator.random((1, 2)) * 0.5 + 0.5 * i / insertions, 2)
+
+        # A full sort of the rows and the offspring removes the least crowded row of the last front
+        combined = population + objective_population(offspring)
+        population_crowding_distance_evaluation(combined)
+        last_front = np.flatnonzero(combined.rank == combined.rank.max())
+        worst = last_front[np.argmin(combined.crowding_distance[last_front])]
+        expected = np.delete(combined.objectives, worst, axis=0)
+
+        state.insert(objective_population(offspring))
+        assert np.array_equal(sorted_rows(population.objectives), sorted_rows(expected)), f"rows after insertion {i}"
+
+        reference = population.copy()
+        population_crowding_distance_evaluation(reference)
+        assert np.array_equal(reference.rank, population.rank), f"ranks after insertion {i}"
+        assert np.allclose(reference.crowding_distance, population.crowding_distance), f"crowding after insertion {i}"
+
+class ThreadEvaluator(SerialEvaluator):
+    """ Evaluates every submitted batch on a thread after a delay, and keeps the futures """
+    workers = 4
+
+    def __init__(self, egg, delay):
+        super().__init__(egg)
+        self.delay = delay
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.futures = []
+
+    def submit(self, population):
+        seed = self.next_seed()
+        future = self.executor.submit(self.evaluate_later, population, seed)
+        self.futures.append(future)
+        return future
+
+    def evaluate_later(self, population, seed):
+        time.sleep(self.delay)
+        return evaluate_chunk(self.objective, self.egg, population, seed)
+
+def test_in_flight_batches_are_finished_or_cancelled():
+    seed_generators(0)
+    egg = Egg()
+    config = RunConfig(NUM_OF_GENERATIONS=2, POPULATION_SIZE=10, MATING_POOL_SIZE=10, LOOP_MODE="steady_state")
+    evaluator = ThreadEvaluator(egg, delay=0.01)
+    ga.run(egg, evaluator=evaluator, config=config)
+
+    assert all(future.done() for future in evaluator.futures)
+    assert any(future.cancelled() for future in evaluator.futures)
+    evaluator.executor.shutdown()
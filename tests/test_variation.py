@@ -0,0 +1,40 @@
+"""
+    Batched variation against the scalar one: offspring of the same mating pool must follow the same distributions
+"""
+
+import numpy as np
+import pytest
+
+import Config
+import Hla
+from Population import Population, TOTAL_RESOURCES, seed_generators
+from Variation import population_variation, batched_variation
+
+COLUMNS = ("genetic_resources", "dfi", "motility", "morphology", "velocity", "ph_tolerance", "hla_mask")
+
+
+def ks_statistic(a, b):
+    """ Two-sample Kolmogorov-Smirnov statistic, the largest gap between the empirical CDFs """
+    a = np.sort(a)
+    b = np.sort(b)
+    values = np.concatenate((a, b))
+    return np.abs(np.searchsorted(a, values, side='right') / len(a) - np.searchsorted(b, values, side='right') / len(b)).max()
+
+@pytest.mark.parametrize("mutation_rate", [Config.MUTATION_RATE, 0.5])
+def test_batched_variation_matches_scalar_distribution(mutation_rate, pool_size=200, repeats=100, alpha=0.001):
+    seed_generators(0)
+    pool = Population.random(pool_size)
+    scalar = Population.concatenate([population_variation(pool, mutation_rate=mutation_rate) for _ in range(repeats)])
+    batched = Population.concatenate([batched_variation(pool, mutation_rate=mutation_rate) for _ in range(repeats)])
+
+    samples = {name: (getattr(scalar, name), getattr(batched, name)) for name in COLUMNS}
+    samples["hla_size"] = (Hla.POPCOUNT[scalar.hla_mask], Hla.POPCOUNT[batched.hla_mask])
+    samples["needs_evaluation"] = (scalar.needs_evaluation, batched.needs_evaluation)
+
+    n, m = len(scalar), len(batched)
+    critical = np.sqrt(-np.log(alpha / 2) * (n + m) / (2 * n * m))
+    for name, (a, b) in samples.items():
+        assert ks_statistic(a.astype(float), b.astype(float)) <= critical, name
+
+    assert np.allclose(scalar.genetic_resources + scalar.biological_resources, TOTAL_RESOURCES)
+    assert np.allclose(batched.genetic_resources + batched.biological_resources, TOTAL_RESOURCES)